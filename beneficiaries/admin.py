@@ -1,8 +1,9 @@
 from django.contrib import admin
+from core.bulk import BulkOperationAdminMixin
 from .models import Beneficiary
 
 @admin.register(Beneficiary)
-class BeneficiaryAdmin(admin.ModelAdmin):
+class BeneficiaryAdmin(BulkOperationAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'type', 'contact_person')
 
 
@@ -10,5 +11,5 @@ from django.contrib import admin
 from .models import PlantingSite
 
 @admin.register(PlantingSite)
-class PlantingSiteAdmin(admin.ModelAdmin):
+class PlantingSiteAdmin(BulkOperationAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'beneficiary', 'address')
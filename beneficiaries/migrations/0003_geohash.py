@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beneficiaries', '0002_alter_plantingsite_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiary',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='plantingsite',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+    ]
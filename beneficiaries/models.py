@@ -1,4 +1,5 @@
 from django.db import models
+from core.geo import GeoQuerySet, encode as geohash_encode
 
 class Beneficiary(models.Model):
     BENEFICIARY_TYPE = [
@@ -14,10 +15,18 @@ class Beneficiary(models.Model):
     address = models.CharField(max_length=255, blank=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # maintained from latitude/longitude for index-backed spatial lookups (core.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+
+    objects = GeoQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
 
 class PlantingSite(models.Model):
     """A physical planting site that can belong to a beneficiary (e.g., school compound)."""
@@ -27,9 +36,17 @@ class PlantingSite(models.Model):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     notes = models.TextField(blank=True)
+    # maintained from latitude/longitude for index-backed spatial lookups (core.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+
+    objects = GeoQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name or self.beneficiary.name}"
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
     
     class Meta:
         # Custom permission to control who may manage planting sites (create/edit/delete)
@@ -4,11 +4,11 @@ from .models import Beneficiary
 class BeneficiarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Beneficiary
-        fields = '__all__'
+        exclude = ('geohash',)
 
 from .models import PlantingSite
 
 class PlantingSiteSerializer(serializers.ModelSerializer):
     class Meta:
         model = PlantingSite
-        fields = '__all__'
+        exclude = ('geohash',)
@@ -1,4 +1,5 @@
 from rest_framework import viewsets, permissions
+from core.bulk import bulk_operation
 from .models import Beneficiary
 from .serializers import BeneficiarySerializer
 
@@ -7,6 +8,11 @@ class BeneficiaryViewSet(viewsets.ModelViewSet):
     serializer_class = BeneficiarySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def perform_destroy(self, instance):
+        # the delete cascades to every tree of the beneficiary
+        with bulk_operation():
+            instance.delete()
+
 from .models import PlantingSite
 from .serializers import PlantingSiteSerializer
 
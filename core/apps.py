@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     path = Path(__file__).resolve().parent
+
+    def ready(self):
+        # record changes for the delta sync feed (core.sync)
+        import core.signals  # noqa: F401
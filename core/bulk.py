@@ -0,0 +1,100 @@
+"""Coalesce per-row signal side effects during bulk operations.
+
+Receivers hand their side effects to ``defer`` instead of running them.
+Outside a ``bulk_operation()`` block they run straight away, as before.
+Inside one they are collected and each runs once when the block exits,
+from ``transaction.on_commit``. So a batch of saves and deletes (an admin
+action, a cascading delete, a data fix) clears the dashboard cache once and
+deletes the removed files in one pass, rather than once per row::
+
+    with bulk_operation():
+        for tree in trees:
+            tree.save()
+
+Effects are keyed by their function: ``defer(func)`` runs ``func()`` once,
+and ``defer(func, items)`` runs ``func(items)`` once with the items of every
+call, de-duplicated in order. Nested blocks join the outermost one. If the
+block raises, the collected effects are dropped, as its rows are rolled back.
+A failing effect is logged and does not stop the others.
+
+``bulk_operation`` also works as a decorator.
+"""
+import contextlib
+import contextvars
+
+from django.db import transaction
+
+
+_pending = contextvars.ContextVar('core_bulk_pending', default=None)
+
+
+def _run(func, items):
+    if items is None:
+        func()
+    else:
+        func(list(items))
+
+
+def _effect(func, items):
+    # a named function, so a failure is logged as the deferred one
+    def run():
+        _run(func, items)
+    run.__qualname__ = getattr(func, '__qualname__', repr(func))
+    return run
+
+
+def defer(func, items=None):
+    """Run ``func()`` (or ``func(items)``) now, or once per bulk block."""
+    pending = _pending.get()
+    if pending is None:
+        _run(func, items)
+        return
+    batch = pending.setdefault(func, None if items is None else {})
+    if items is not None:
+        # keep insertion order, drop repeats
+        batch.update(dict.fromkeys(items))
+
+
+@contextlib.contextmanager
+def bulk_operation():
+    """Collect deferred side effects and run each once when the transaction commits."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    # only reached when the block didn't raise
+    for func, items in pending.items():
+        transaction.on_commit(_effect(func, items), robust=True)
+
+
+def delete_files(files):
+    """Delete ``(storage, name)`` pairs from storage; missing files and storage errors are ignored."""
+    for storage, name in files:
+        try:
+            storage.delete(name)
+        except Exception:
+            pass
+
+
+class BulkOperationAdminMixin:
+    """Run changelist actions and list edits of a ModelAdmin as one bulk operation."""
+
+    def response_action(self, request, queryset):
+        with bulk_operation():
+            return super().response_action(request, queryset)
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST':
+            return super().changelist_view(request, extra_context)
+        with bulk_operation():
+            return super().changelist_view(request, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        # deleting one object can cascade to many (a beneficiary's trees)
+        with bulk_operation():
+            return super().delete_view(request, object_id, extra_context)
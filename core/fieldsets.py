@@ -0,0 +1,101 @@
+"""Sparse fieldsets and expansions for read endpoints.
+
+Clients pass ``?fields=id,tree_id,status`` to pick top-level fields and
+``?expand=species,beneficiary`` to nest related objects instead of their
+ids. The serializer mixin trims/expands its fields from that request and the
+viewset mixin derives the matching ``only()``/``select_related()``/
+``prefetch_related()`` plan, so payloads and query counts follow what was
+asked for. Without parameters the output is unchanged.
+
+Serializers describe their options in ``Meta``::
+
+    expandable = {'species': (TreeSpeciesSerializer, 'species')}
+    prefetch = {'updates': ['updates', 'updates__media']}
+
+``expandable`` maps a field to ``(serializer class, select_related path)``;
+``prefetch`` maps a field to the lookups it needs when it is included.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+def _param_set(value):
+    return {v.strip() for v in value.split(',') if v.strip()} if value else set()
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer side: apply ``fields``/``expand`` from the serializer context."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = getattr(self, '_context', {}) or {}
+        expand = context.get('expand') or set()
+        for name, (serializer_class, _) in getattr(self.Meta, 'expandable', {}).items():
+            if name in expand:
+                self.fields[name] = serializer_class(read_only=True)
+        wanted = context.get('fields')
+        if wanted:
+            for name in list(self.fields):
+                if name not in wanted and name not in expand:
+                    self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """ViewSet side: parse ``?fields=``/``?expand=`` and plan the queryset.
+
+    Only applies to reads (list/retrieve); writes use the full serializer.
+    """
+
+    def _sparse_params(self):
+        if getattr(self, '_sparse', None) is None:
+            request = self.request
+            if request is None or request.method not in ('GET', 'HEAD'):
+                self._sparse = (None, set())
+            else:
+                fields = _param_set(request.query_params.get('fields')) or None
+                expand = _param_set(request.query_params.get('expand'))
+                self._validate_sparse(fields, expand)
+                self._sparse = (fields, expand)
+        return self._sparse
+
+    def _validate_sparse(self, fields, expand):
+        serializer_class = self.get_serializer_class()
+        meta = serializer_class.Meta
+        expandable = set(getattr(meta, 'expandable', {}))
+        known = set(serializer_class().fields) | expandable
+        unknown = sorted((fields or set()) - known)
+        if unknown:
+            raise ValidationError({'fields': f'unknown fields: {", ".join(unknown)}'})
+        unknown = sorted(expand - expandable - set(getattr(meta, 'prefetch', {})))
+        if unknown:
+            raise ValidationError({'expand': f'cannot expand: {", ".join(unknown)}'})
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self._sparse_params()
+        context['fields'] = fields
+        context['expand'] = expand
+        return context
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        fields, expand = self._sparse_params()
+        meta = self.get_serializer_class().Meta
+        included = (fields | expand) if fields else None
+
+        def wanted(name):
+            return included is None or name in included
+
+        model = qs.model
+        concrete = {f.name for f in model._meta.concrete_fields}
+        related = [path for name, (_, path) in getattr(meta, 'expandable', {}).items() if name in expand and wanted(name)]
+        if related:
+            qs = qs.select_related(*related)
+        lookups = [l for name, paths in getattr(meta, 'prefetch', {}).items() if wanted(name) for l in paths]
+        if lookups:
+            qs = qs.prefetch_related(*lookups)
+        if included is not None:
+            columns = {model._meta.pk.name} | (included & concrete)
+            # select_related relations must stay loaded
+            columns |= {path.split('__')[0] for path in related}
+            qs = qs.only(*columns)
+        return qs
@@ -0,0 +1,292 @@
+"""Geohash spatial indexing for plain latitude/longitude columns.
+
+Models with ``latitude``/``longitude`` floats also keep an indexed
+``geohash`` column (maintained on save and by ``GeoQuerySet.update`` and
+``bulk_update``, backfilled by the ``backfill_geohash`` command). Because nearby points share geohash prefixes,
+a bounding box can be covered by a handful of prefixes, and each prefix is a
+contiguous range of the index: ``GeoQuerySet.within_bbox`` turns the box
+into a few ``geohash >= a AND geohash < b`` ranges before the exact
+coordinate filter, so spatial lookups stay index scans without PostGIS.
+"""
+import math
+
+from django.db import models
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional; haversine_km falls back to plain Python
+    np = None
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# ~5m cells; enough to tell trees apart
+GEOHASH_PRECISION = 9
+GEOHASH_LENGTH = 12
+# upper bound on prefixes used to cover a bounding box
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point, or '' if a coordinate is missing."""
+    if latitude is None or longitude is None:
+        return ''
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return ``(lat_height, lon_width)`` in degrees of a cell at ``precision``."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _cells(bbox, precision):
+    west, south, east, north = bbox
+    height, width = cell_size(precision)
+    rows = math.floor((north + 90) / height) - math.floor((south + 90) / height) + 1
+    cols = math.floor((east + 180) / width) - math.floor((west + 180) / width) + 1
+    return rows, cols, height, width
+
+
+def cover(bbox, max_cells=MAX_COVER_CELLS):
+    """Return the geohash prefixes covering ``bbox`` (west, south, east, north).
+
+    Picks the longest prefix length whose cover needs at most ``max_cells``
+    cells. A box crossing the antimeridian (west > east) is split in two.
+    """
+    west, south, east, north = bbox
+    if west > east:
+        return cover((west, south, 180.0, north), max_cells) + cover((-180.0, south, east, north), max_cells)
+    precision = 1
+    for p in range(1, GEOHASH_PRECISION + 1):
+        rows, cols, _, _ = _cells(bbox, p)
+        if rows * cols > max_cells:
+            break
+        precision = p
+    rows, cols, height, width = _cells(bbox, precision)
+    if rows * cols > max_cells:
+        # even single characters are too fine (the box spans most of the globe)
+        return ['']
+    first_row = math.floor((south + 90) / height)
+    first_col = math.floor((west + 180) / width)
+    prefixes = set()
+    for r in range(rows):
+        lat = min(-90 + (first_row + r + 0.5) * height, 90.0)
+        for c in range(cols):
+            lon = min(-180 + (first_col + c + 0.5) * width, 180.0)
+            prefixes.add(encode(lat, lon, precision))
+    return sorted(prefixes)
+
+
+def _successor(prefix):
+    """The smallest string greater than every string starting with ``prefix``."""
+    chars = list(prefix)
+    while chars:
+        i = BASE32.index(chars[-1])
+        if i + 1 < len(BASE32):
+            chars[-1] = BASE32[i + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def prefix_ranges(prefixes):
+    """Merge prefixes into ``[(start, end)]`` ranges (``end`` None = unbounded)."""
+    ranges = []
+    for prefix in sorted(prefixes):
+        end = _successor(prefix)
+        if ranges and ranges[-1][1] is not None and ranges[-1][1] >= prefix:
+            start, last = ranges[-1]
+            ranges[-1] = (start, None if end is None else max(last, end))
+        else:
+            ranges.append((prefix, end))
+    return ranges
+
+
+def neighbors(latitude, longitude, precision):
+    """Geohashes of the point's cell and the eight cells around it (fewer near the poles)."""
+    if latitude is None or longitude is None:
+        return []
+    height, width = cell_size(precision)
+    cells = []
+    for dlat in (-height, 0.0, height):
+        lat = latitude + dlat
+        if not -90.0 <= lat <= 90.0:
+            continue
+        for dlon in (-width, 0.0, width):
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            cell = encode(lat, lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Bounding box (west, south, east, north) of a circle around a point."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if south <= -90.0 or north >= 90.0:
+        return -180.0, south, 180.0, north
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    if dlon >= 180:
+        return -180.0, south, 180.0, north
+    west, east = longitude - dlon, longitude + dlon
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return west, south, east, north
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km from one point to many, in one vectorized pass.
+
+    Returns a list of floats; uses numpy when it is installed.
+    """
+    if np is not None:
+        lat1 = np.radians(np.asarray(latitudes, dtype=float))
+        dlat = lat1 - math.radians(latitude)
+        dlon = np.radians(np.asarray(longitudes, dtype=float)) - math.radians(longitude)
+        a = np.sin(dlat / 2) ** 2 + math.cos(math.radians(latitude)) * np.cos(lat1) * np.sin(dlon / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+    lat0 = math.radians(latitude)
+    cos0 = math.cos(lat0)
+    distances = []
+    for lat, lon in zip(latitudes, longitudes):
+        lat1 = math.radians(lat)
+        a = math.sin((lat1 - lat0) / 2) ** 2 + cos0 * math.cos(lat1) * math.sin(math.radians(lon - longitude) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return distances
+
+
+def backfill_geohash(model, chunk_size=2000, recompute=False, dry_run=False):
+    """Fill ``model.geohash`` from latitude/longitude in pk-ordered chunks; returns rows changed.
+
+    Only rows with an empty geohash unless ``recompute``. The data migrations
+    carry their own frozen copy of this and ``encode``.
+    """
+    qs = model.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    if not recompute:
+        qs = qs.filter(geohash='')
+    return _fill_geohash(qs, chunk_size, dry_run)
+
+
+def refresh_geohash(queryset, chunk_size=2000):
+    """Recompute the geohash of the rows in ``queryset``; returns rows changed."""
+    return _fill_geohash(queryset, chunk_size)
+
+
+def _fill_geohash(qs, chunk_size, dry_run=False):
+    model = qs.model
+    updated = 0
+    last_pk = None
+    while True:
+        # keyset pagination: each chunk is an index range scan on the pk
+        chunk = qs.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', 'latitude', 'longitude', 'geohash')[:chunk_size])
+        if not rows:
+            return updated
+        last_pk = rows[-1][0]
+        changed = []
+        for pk, lat, lon, current in rows:
+            value = encode(lat, lon)
+            if value != current:
+                changed.append(model(pk=pk, geohash=value))
+        if changed and not dry_run:
+            model._base_manager.bulk_update(changed, ['geohash'])
+        updated += len(changed)
+
+
+class GeoQuerySet(models.QuerySet):
+    """QuerySet helpers for models with latitude/longitude/geohash columns.
+
+    ``update`` and ``bulk_update`` of the coordinates also refresh the
+    geohash, which ``save()`` keeps for single rows; writes that bypass both
+    (raw SQL, another queryset class) must call ``refresh_geohash``.
+    """
+
+    def update(self, **kwargs):
+        if 'geohash' in kwargs or not {'latitude', 'longitude'} & kwargs.keys():
+            return super().update(**kwargs)
+        lat, lon = kwargs.get('latitude'), kwargs.get('longitude')
+        if 'latitude' in kwargs and 'longitude' in kwargs and not any(
+                hasattr(v, 'resolve_expression') for v in (lat, lon)):
+            return super().update(geohash=encode(lat, lon), **kwargs)
+        # one coordinate or an expression: recompute from the stored values;
+        # the rows are taken first since the filter may match on the old ones
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        refresh_geohash(self.model._base_manager.filter(pk__in=pks))
+        return rows
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        fields = list(fields)
+        if 'geohash' in fields or not {'latitude', 'longitude'} & set(fields):
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        if 'latitude' in fields and 'longitude' in fields:
+            for obj in objs:
+                obj.geohash = encode(obj.latitude, obj.longitude)
+            return super().bulk_update(objs, fields + ['geohash'], batch_size=batch_size)
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        refresh_geohash(self.model._base_manager.filter(pk__in=[obj.pk for obj in objs]))
+        return rows
+
+    bulk_update.alters_data = True
+
+    def within_bbox(self, west, south, east, north):
+        """Rows inside the box; uses geohash prefix ranges, then exact bounds."""
+        q = Q()
+        for start, end in prefix_ranges(cover((west, south, east, north))):
+            if not start and end is None:
+                q = Q()
+                break
+            q |= Q(geohash__gte=start, geohash__lt=end) if end else Q(geohash__gte=start)
+        qs = self.filter(q).filter(latitude__gte=south, latitude__lte=north)
+        if west <= east:
+            return qs.filter(longitude__gte=west, longitude__lte=east)
+        return qs.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Rows within ``radius_km`` of a point, annotated with ``distance_km``."""
+        qs = self.within_bbox(*radius_bbox(latitude, longitude, radius_km))
+        lat0, lon0 = math.radians(latitude), math.radians(longitude)
+        half_dlat = (Radians(F('latitude')) - Value(lat0, output_field=FloatField())) / 2
+        half_dlon = (Radians(F('longitude')) - Value(lon0, output_field=FloatField())) / 2
+        a = Power(Sin(half_dlat), 2) + Value(math.cos(lat0), output_field=FloatField()) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlon), 2)
+        distance = Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Sqrt(a))
+        return qs.annotate(distance_km=distance).filter(distance_km__lte=radius_km)
@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.geo import backfill_geohash
+
+
+GEOHASH_MODELS = ('trees.Tree', 'media_app.Media', 'beneficiaries.Beneficiary', 'beneficiaries.PlantingSite')
+
+
+class Command(BaseCommand):
+    help = 'Populate the geohash column from latitude/longitude in primary-key ordered chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=GEOHASH_MODELS,
+                            help='Only backfill this model (may be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every row with coordinates, not just rows missing a geohash')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would change')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        for label in options['model'] or GEOHASH_MODELS:
+            model = apps.get_model(label)
+            updated = backfill_geohash(model, chunk_size, recompute=options['all'], dry_run=options['dry_run'])
+            verb = 'would update' if options['dry_run'] else 'updated'
+            self.stdout.write(f'{label}: {verb} {updated} rows')
+        self.stdout.write(self.style.SUCCESS('Geohash backfill complete'))
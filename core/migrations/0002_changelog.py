@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+SYNCED_MODELS = ('trees.tree', 'trees.treeupdate', 'beneficiaries.plantingsite', 'trees.treespecies')
+
+
+def log_existing_objects(apps, schema_editor):
+    # every existing object enters the sync feed as an upsert
+    ChangeLog = apps.get_model('core', 'ChangeLog')
+    now = timezone.now()
+    for label in SYNCED_MODELS:
+        ids = apps.get_model(label).objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000)
+        batch = []
+        for pk in ids:
+            batch.append(ChangeLog(model=label, object_id=pk, changed_at=now))
+            if len(batch) >= 5000:
+                ChangeLog.objects.bulk_create(batch)
+                batch = []
+        ChangeLog.objects.bulk_create(batch)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('beneficiaries', '0003_geohash'),
+        ('trees', '0010_campaign_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=64)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted', 'changed_at'], name='core_change_deleted_e8dfe1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id'), name='core_changelog_object')],
+            },
+        ),
+        migrations.RunPython(log_existing_objects, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class ActivityLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
@@ -43,3 +44,30 @@ class SiteConfiguration(models.Model):
 
     def __str__(self):
         return self.site_name
+
+
+class ChangeLog(models.Model):
+    """Latest change of every object served by the delta sync feed (core.sync).
+
+    The auto-increment ``id`` is the change sequence: recording a change
+    replaces the object's row with a new one, so each object appears once,
+    at the position of its most recent change. Rows with ``deleted`` set are
+    tombstones, kept for ``SYNC_TOMBSTONE_DAYS``.
+    """
+    id = models.BigAutoField(primary_key=True)
+    # model label, e.g. "trees.tree"
+    model = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id'], name='core_changelog_object'),
+        ]
+        indexes = [
+            models.Index(fields=['deleted', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model}:{self.object_id}{' deleted' if self.deleted else ''}"
@@ -0,0 +1,53 @@
+"""Cache entries grouped in namespaces that are invalidated in O(1).
+
+Each namespace (``dashboard``, ``reports``) has a version number stored in
+the cache itself, and its entries are read and written under that version
+(Django's ``version=`` cache argument). ``invalidate`` increments the
+version with an atomic ``incr``, so every entry of the namespace is missed
+from then on, in all processes sharing the cache, and expires on its own
+TTL. It works the same on LocMem, Redis and Memcached; nothing scans keys.
+
+A version that was evicted restarts from the current time in microseconds,
+so it does not fall back to a number whose entries may still be cached.
+"""
+import time
+
+from django.core.cache import cache
+
+
+DASHBOARD = 'dashboard'
+REPORTS = 'reports'
+VERSION_KEY = 'nscache:version:{}'
+
+
+def _fresh_version():
+    return time.time_ns() // 1000
+
+
+def version(namespace):
+    """The namespace's current version, created on first use."""
+    key = VERSION_KEY.format(namespace)
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, _fresh_version(), None)
+        current = cache.get(key)
+    return current
+
+
+def get(namespace, key, default=None):
+    return cache.get(f'{namespace}:{key}', default, version=version(namespace))
+
+
+def set(namespace, key, value, timeout):
+    cache.set(f'{namespace}:{key}', value, timeout, version=version(namespace))
+
+
+def invalidate(namespaces):
+    """Expire every entry of ``namespaces`` at once."""
+    for namespace in dict.fromkeys(namespaces):
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # never used or evicted: nothing cached under a fresh version yet
+            cache.add(key, _fresh_version(), None)
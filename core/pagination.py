@@ -0,0 +1,135 @@
+"""Page-number pagination with an opt-in keyset (cursor) mode.
+
+``?page=N`` keeps working as before. Passing ``?cursor=`` (empty to start)
+or ``?pagination=cursor`` switches to keyset pagination over the view's
+``cursor_ordering``: each page is a ``WHERE (a, b) > (last_a, last_b)``
+range read off an index, with no ``COUNT(*)`` and no OFFSET, so walking a
+large list costs the same per page at any depth.
+
+The ordering must end in a unique field (normally ``id``) and its fields
+must be non-null. Views opt in with ``pagination_class =
+SelectablePagination``; other endpoints keep the default
+``PageNumberPagination``.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPaginator:
+    """Keyset pagination over ``ordering`` (e.g. ``('-created_at', '-id')``)."""
+
+    cursor_query_param = 'cursor'
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    @staticmethod
+    def _split(term):
+        return (term[1:], True) if term.startswith('-') else (term, False)
+
+    def _encode(self, obj, reverse):
+        values = []
+        for term in self.ordering:
+            name, _ = self._split(term)
+            value = getattr(obj, 'pk' if name == 'pk' else name)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps({'v': values, 'r': reverse}, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _decode(self, token, model):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            data = json.loads(raw)
+            values = data['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            decoded = []
+            for term, value in zip(self.ordering, values):
+                name, _ = self._split(term)
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+                decoded.append(field.to_python(value))
+            return decoded, bool(data.get('r'))
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+    def _after(self, values, reverse):
+        """Q for rows strictly after ``values`` in the (possibly reversed) ordering."""
+        q = Q()
+        equal = Q()
+        for term, value in zip(self.ordering, values):
+            name, desc = self._split(term)
+            lookup = 'lt' if desc != reverse else 'gt'
+            q |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return q
+
+    def paginate(self, queryset, token):
+        reverse = False
+        values = None
+        if token:
+            values, reverse = self._decode(token, queryset.model)
+        order = self.ordering
+        if reverse:
+            order = tuple(t[1:] if t.startswith('-') else f'-{t}' for t in order)
+        qs = queryset.order_by(*order)
+        names, deferred = qs.query.deferred_loading
+        if names and not deferred:
+            # only() in use: the cursor needs the ordering columns loaded too
+            qs = qs.only(*names, *(self._split(t)[0] for t in self.ordering))
+        if values is not None:
+            qs = qs.filter(self._after(values, reverse))
+        rows = list(qs[:self.page_size + 1])
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if more or reverse:
+                self.next_cursor = self._encode(rows[-1], False)
+            if values is not None and (more or not reverse):
+                self.previous_cursor = self._encode(rows[0], True)
+        return rows
+
+
+class SelectablePagination(PageNumberPagination):
+    """``PageNumberPagination`` unless the request asks for cursor pagination.
+
+    Views opt in to cursor mode by defining ``cursor_ordering``. Anything that
+    isn't a QuerySet (e.g. a list ranked in Python) is always page-numbered.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        params = request.query_params
+        self.keyset = None
+        keyset = isinstance(queryset, QuerySet) and ('cursor' in params or params.get('pagination') == 'cursor')
+        if ordering and keyset:
+            self.request = request
+            self.keyset = KeysetPaginator(ordering, self.get_page_size(request))
+            return self.keyset.paginate(queryset, params.get('cursor'))
+        return super().paginate_queryset(queryset, request, view)
+
+    def _cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'pagination')
+        return replace_query_param(url, KeysetPaginator.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self._cursor_link(self.keyset.next_cursor),
+            'previous': self._cursor_link(self.keyset.previous_cursor),
+            'results': data,
+        })
@@ -0,0 +1,36 @@
+"""Record changes of the synced models for the delta sync feed (core.sync)."""
+from django.db.models import SET_NULL
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from . import sync
+
+
+def record_saved(sender, instance, raw=False, **kwargs):
+    sync.record(sender, [instance.pk])
+
+
+def record_deleted(sender, instance, **kwargs):
+    sync.record(sender, [instance.pk], deleted=True)
+
+
+def record_nulled_references(sender, instance, **kwargs):
+    """Objects whose FK to ``instance`` is about to be set to NULL change without a save."""
+    for model, attname in sync.set_null_dependents(sender):
+        ids = list(model.objects.filter(**{attname: instance.pk}).values_list('pk', flat=True))
+        if ids:
+            sync.record(model, ids)
+
+
+def connect():
+    targets = set()
+    for model in sync.synced_models():
+        post_save.connect(record_saved, sender=model, dispatch_uid=f'core.sync.save.{model._meta.label_lower}')
+        post_delete.connect(record_deleted, sender=model, dispatch_uid=f'core.sync.delete.{model._meta.label_lower}')
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.remote_field.on_delete is SET_NULL:
+                targets.add(field.remote_field.model)
+    for model in targets:
+        pre_delete.connect(record_nulled_references, sender=model, dispatch_uid=f'core.sync.nulled.{model._meta.label_lower}')
+
+
+connect()
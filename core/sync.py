@@ -0,0 +1,155 @@
+"""Delta sync feed for offline field apps.
+
+Every create, update and delete of a synced model is recorded in
+``ChangeLog`` (see core.signals; bulk writers such as trees.importer call
+``record`` themselves). A device keeps the opaque token from its last sync
+and asks for what changed after it. Each page lists the changed objects of
+each model as compact columnar rows plus the ids of deleted ones, and
+carries a new token. Without a token the feed is a full download of the
+current objects (no tombstones).
+
+Tokens are signed ``{'seq': <last ChangeLog id served>}`` values. A token
+older than ``SYNC_TOMBSTONE_DAYS`` is rejected (``TokenExpired``) because
+tombstones it had not seen may have been pruned; the device then resyncs
+from scratch.
+
+Change ids are allocated before their transaction commits, so a slow
+transaction can make a lower id visible after a higher one was served.
+Pages therefore stop at changes younger than ``SYNC_SETTLE_SECONDS``.
+"""
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import SET_NULL
+from django.utils import timezone
+
+from .models import ChangeLog
+
+
+# feed key -> (model label, fields sent to devices)
+SYNCED = {
+    'trees': ('trees.tree', (
+        'id', 'tree_id', 'species_id', 'planting_date', 'beneficiary_id', 'campaign_id', 'number_of_seedlings',
+        'status', 'latitude', 'longitude', 'cause_of_death', 'replaced_by_id', 'replaced_date',
+    )),
+    'tree_updates': ('trees.treeupdate', (
+        'id', 'tree_id', 'date', 'status', 'height_cm', 'canopy_cm', 'diameter_cm', 'notes',
+    )),
+    'planting_sites': ('beneficiaries.plantingsite', (
+        'id', 'beneficiary_id', 'name', 'address', 'latitude', 'longitude', 'notes',
+    )),
+    'species': ('trees.treespecies', ('id', 'name', 'co2_estimate_kg_per_year')),
+}
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+BATCH_SIZE = 500
+TOKEN_SALT = 'core.sync'
+
+
+class InvalidToken(ValueError):
+    """The sync token was not issued by this server."""
+
+
+class TokenExpired(InvalidToken):
+    """The sync token predates the tombstone retention; resync from scratch."""
+
+
+def synced_models():
+    return [apps.get_model(label) for label, _ in SYNCED.values()]
+
+
+def set_null_dependents(model):
+    """``(synced model, fk attname)`` pairs whose FK to ``model`` is nulled on delete."""
+    found = []
+    for synced in synced_models():
+        for field in synced._meta.concrete_fields:
+            if field.is_relation and field.remote_field.model is model and field.remote_field.on_delete is SET_NULL:
+                found.append((synced, field.attname))
+    return found
+
+
+def record(model, ids, deleted=False):
+    """Record that objects of ``model`` changed (or were deleted), moving them to the end of the feed."""
+    label = model._meta.label_lower
+    ids = list(dict.fromkeys(ids))
+    now = timezone.now()
+    for i in range(0, len(ids), BATCH_SIZE):
+        batch = ids[i:i + BATCH_SIZE]
+        rows = [ChangeLog(model=label, object_id=pk, deleted=deleted, changed_at=now) for pk in batch]
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    ChangeLog.objects.filter(model=label, object_id__in=batch).delete()
+                    ChangeLog.objects.bulk_create(rows)
+                break
+            except IntegrityError:
+                # a concurrent change of the same object inserted first; retry once
+                if attempt:
+                    raise
+                for row in rows:
+                    row.pk = None
+
+
+def make_token(seq):
+    return signing.dumps({'seq': seq}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    max_age = datetime.timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+    try:
+        return int(signing.loads(token, salt=TOKEN_SALT, max_age=max_age)['seq'])
+    except signing.SignatureExpired:
+        raise TokenExpired('sync token expired')
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('invalid sync token')
+
+
+def changes(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """One page of the feed after ``token``; see the module docstring.
+
+    Returns ``{'token', 'more', 'changed': {key: {'fields', 'rows'}},
+    'deleted': {key: [ids]}}``, listing only models with changes.
+    """
+    seq = read_token(token) if token else 0
+    settled = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+    entries = ChangeLog.objects.filter(pk__gt=seq).order_by('pk')
+    if not token:
+        entries = entries.filter(deleted=False)
+    entries = list(entries.values_list('pk', 'model', 'object_id', 'deleted', 'changed_at')[:page_size + 1])
+    more = len(entries) > page_size
+    entries = entries[:page_size]
+    for i, entry in enumerate(entries):
+        if entry[4] > settled:
+            # the rest is picked up by the next sync
+            entries, more = entries[:i], False
+            break
+
+    by_label = {label: key for key, (label, _) in SYNCED.items()}
+    upserts, deleted = {}, {}
+    for _, label, object_id, is_deleted, _ in entries:
+        key = by_label.get(label)
+        if key is not None:
+            (deleted if is_deleted else upserts).setdefault(key, []).append(object_id)
+
+    changed = {}
+    for key, ids in upserts.items():
+        label, fields = SYNCED[key]
+        rows = apps.get_model(label).objects.filter(pk__in=ids).order_by('pk').values_list(*fields)
+        changed[key] = {'fields': list(fields), 'rows': [list(row) for row in rows]}
+    return {
+        'token': make_token(entries[-1][0] if entries else seq),
+        'more': more,
+        'changed': changed,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(days=None):
+    """Delete tombstones older than the retention; returns how many."""
+    days = days if days is not None else getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = ChangeLog.objects.filter(deleted=True, changed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+
+@shared_task
+def prune_sync_tombstones():
+    """Drop delta sync tombstones older than ``SYNC_TOMBSTONE_DAYS`` (core.sync)."""
+    from .sync import prune_tombstones
+    return {'pruned': prune_tombstones()}
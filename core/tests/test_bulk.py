@@ -0,0 +1,90 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from beneficiaries.models import Beneficiary
+from core.bulk import bulk_operation, defer
+from trees.models import Tree
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BulkOperationTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Bulk School', type='school')
+
+    def plant(self, count, prefix='T'):
+        return [Tree.objects.create(tree_id=f'{prefix}{i}', planting_date='2024-01-10', beneficiary=self.ben)
+                for i in range(count)]
+
+    def test_defer_runs_immediately_outside_a_block(self):
+        calls = []
+        defer(lambda: calls.append('once'))
+        defer(calls.extend, ['a', 'b'])
+        self.assertEqual(calls, ['once', 'a', 'b'])
+
+    def test_effects_run_once_at_commit(self):
+        calls = []
+        clear = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic(), bulk_operation():
+                for item in ('a', 'b', 'a'):
+                    defer(clear)
+                    with bulk_operation():
+                        defer(calls.extend, [item, 'c'])
+                self.assertEqual(calls, [])
+        self.assertEqual(len(callbacks), 2)
+        clear.assert_called_once_with()
+        self.assertEqual(calls, ['a', 'c', 'b'])
+
+    def test_effects_are_dropped_when_the_block_fails(self):
+        clear = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), bulk_operation():
+                defer(clear)
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        clear.assert_not_called()
+
+    def test_failing_effect_does_not_stop_the_others(self):
+        after = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            with bulk_operation():
+                defer(mock.Mock(side_effect=RuntimeError))
+                defer(after)
+        after.assert_called_once_with()
+
+    def test_tree_saves_clear_the_dashboard_and_queue_qr_once(self):
+        with mock.patch('core.nscache.invalidate') as clear, \
+                mock.patch('qrcodes.tasks.queue_qr_render') as queue:
+            self.plant(2, 'SINGLE')
+            self.assertEqual((clear.call_count, queue.call_count), (2, 2))
+            clear.reset_mock()
+            queue.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                with bulk_operation():
+                    trees = self.plant(20)
+                    for tree in trees:
+                        tree.status = 'dead'
+                        tree.save()
+            self.assertEqual((clear.call_count, queue.call_count), (1, 1))
+
+    def test_cascading_delete_removes_files_in_one_pass_after_commit(self):
+        trees = self.plant(3)
+        for tree in trees:
+            tree.qr_image.save(f'{tree.tree_id}.png', ContentFile(b'png'))
+        names = [tree.qr_image.name for tree in trees]
+        user = get_user_model().objects.create_user('bulk', 'b@example.com', 'pass')
+        self.client.force_login(user)
+        with mock.patch('core.nscache.invalidate') as clear, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resp = self.client.delete(f'/api/beneficiaries/{self.ben.pk}/')
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(Tree.objects.exists())
+        self.assertEqual(len(callbacks), 2)
+        clear.assert_called_once_with(['dashboard', 'reports'])
+        self.assertFalse(any(default_storage.exists(name) for name in names))
@@ -0,0 +1,17 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from tawi_project.celery import require_shared_media
+
+
+class WorkerMediaStorageTest(SimpleTestCase):
+    @override_settings(DEBUG=False, USE_S3=False, MEDIA_SHARED_FILESYSTEM=False)
+    def test_production_worker_needs_shared_media(self):
+        with self.assertRaises(ImproperlyConfigured):
+            require_shared_media()
+
+    def test_shared_storage_or_debug_is_enough(self):
+        for flags in ({'USE_S3': True}, {'MEDIA_SHARED_FILESYSTEM': True}, {'DEBUG': True}):
+            settings = {'DEBUG': False, 'USE_S3': False, 'MEDIA_SHARED_FILESYSTEM': False, **flags}
+            with self.subTest(**flags), override_settings(**settings):
+                require_shared_media()
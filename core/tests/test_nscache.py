@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from core import nscache
+from trees.importer import import_rows
+from trees.models import Tree
+
+
+class NamespacedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ben = Beneficiary.objects.create(name='Cache School', type='school')
+
+    def test_invalidate_expires_only_its_namespace(self):
+        nscache.set(nscache.DASHBOARD, 'summary', {'trees': 1}, 60)
+        nscache.set(nscache.REPORTS, 'summary', {'reports': 2}, 60)
+        cache.set('unrelated', 3)
+        self.assertEqual(nscache.get(nscache.DASHBOARD, 'summary'), {'trees': 1})
+
+        before = nscache.version(nscache.DASHBOARD)
+        nscache.invalidate([nscache.DASHBOARD])
+        self.assertEqual(nscache.version(nscache.DASHBOARD), before + 1)
+        self.assertIsNone(nscache.get(nscache.DASHBOARD, 'summary'))
+        self.assertEqual(nscache.get(nscache.REPORTS, 'summary'), {'reports': 2})
+        self.assertEqual(cache.get('unrelated'), 3)
+
+    def test_evicted_version_does_not_resurrect_old_entries(self):
+        nscache.set(nscache.DASHBOARD, 'summary', 'old', 60)
+        cache.delete(nscache.VERSION_KEY.format(nscache.DASHBOARD))
+        self.assertIsNone(nscache.get(nscache.DASHBOARD, 'summary'))
+        cache.delete(nscache.VERSION_KEY.format(nscache.REPORTS))
+        nscache.invalidate([nscache.REPORTS])
+        self.assertIsNotNone(cache.get(nscache.VERSION_KEY.format(nscache.REPORTS)))
+
+    def test_tree_changes_and_imports_invalidate_dashboards_and_reports(self):
+        nscache.set(nscache.DASHBOARD, 'summary', 'stale', 60)
+        nscache.set(nscache.REPORTS, 'cohorts:x', 'stale', 60)
+        Tree.objects.create(tree_id='C1', planting_date='2024-01-10', beneficiary=self.ben)
+        self.assertIsNone(nscache.get(nscache.DASHBOARD, 'summary'))
+        self.assertIsNone(nscache.get(nscache.REPORTS, 'cohorts:x'))
+
+        nscache.set(nscache.DASHBOARD, 'summary', 'stale', 60)
+        import_rows([{'tree_id': 'C2', 'planting_date': '2024-01-10', 'beneficiary': self.ben.pk}])
+        self.assertIsNone(nscache.get(nscache.DASHBOARD, 'summary'))
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from beneficiaries.models import Beneficiary, PlantingSite
+from core import sync
+from core.models import ChangeLog
+from trees import importer
+from trees.models import Tree, TreeCampaign, TreeSpecies, TreeUpdate
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Sync School', type='school')
+        self.neem = TreeSpecies.objects.create(name='Neem')
+        self.trees = [Tree.objects.create(tree_id=f'S{i}', planting_date='2024-01-10', beneficiary=self.ben,
+                                          species=self.neem) for i in range(3)]
+        self.site = PlantingSite.objects.create(beneficiary=self.ben, name='Compound')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('officer', 'o@example.com', 'pass'))
+
+    def rows(self, page, key):
+        feed = page['changed'].get(key)
+        return [dict(zip(feed['fields'], row)) for row in feed['rows']] if feed else []
+
+    def sync_all(self, token=None, page_size=100):
+        pages = []
+        while True:
+            page = sync.changes(token, page_size)
+            pages.append(page)
+            token = page['token']
+            if not page['more']:
+                return pages, token
+
+    def test_full_download_then_only_changes(self):
+        pages, token = self.sync_all(page_size=2)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(r['tree_id'] for p in pages for r in self.rows(p, 'trees')), ['S0', 'S1', 'S2'])
+        self.assertEqual(sum(len(self.rows(p, 'species')) + len(self.rows(p, 'planting_sites')) for p in pages), 2)
+
+        self.assertEqual(sync.changes(token), {'token': token, 'more': False, 'changed': {}, 'deleted': {}})
+
+        self.trees[0].status = 'dead'
+        self.trees[0].save()
+        TreeUpdate.objects.create(tree=self.trees[1], status='alive', height_cm=40)
+        deleted_pk = self.trees[2].pk
+        self.trees[2].delete()
+        page = sync.changes(token)
+        self.assertEqual([(r['tree_id'], r['status']) for r in self.rows(page, 'trees')], [('S0', 'dead')])
+        self.assertEqual([r['height_cm'] for r in self.rows(page, 'tree_updates')], [40])
+        self.assertEqual(page['deleted'], {'trees': [deleted_pk]})
+        # each object appears once, at its latest change
+        self.assertEqual(ChangeLog.objects.filter(model='trees.tree', object_id=self.trees[0].pk).count(), 1)
+
+    def test_nulled_references_and_bulk_imports_are_recorded(self):
+        _, token = self.sync_all()
+        campaign = TreeCampaign.objects.create(name='Spring')
+        Tree.objects.filter(pk=self.trees[0].pk).update(campaign=campaign)
+        campaign.delete()
+        species_pk = self.neem.pk
+        self.neem.delete()
+        page = sync.changes(token)
+        trees = self.rows(page, 'trees')
+        self.assertEqual(len(trees), 3)
+        self.assertEqual({(r['species_id'], r['campaign_id']) for r in trees}, {(None, None)})
+        self.assertEqual(page['deleted'], {'species': [species_pk]})
+
+        rows = [{'tree_id': f'I{i}', 'planting_date': '2024-03-05', 'beneficiary': str(self.ben.pk)} for i in range(4)]
+        importer.import_rows(rows, finalize=False)
+        page = sync.changes(page['token'])
+        self.assertEqual(sorted(r['tree_id'] for r in self.rows(page, 'trees')), ['I0', 'I1', 'I2', 'I3'])
+
+    def test_api_tokens(self):
+        resp = self.client.get('/api/sync/', {'page_size': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['more'])
+        again = self.client.get('/api/sync/', {'token': resp.json()['token'], 'page_size': 100}).json()
+        self.assertFalse(again['more'])
+        self.assertEqual(self.client.get('/api/sync/', {'token': 'forged'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'page_size': '0'}).status_code, 400)
+        with override_settings(SYNC_TOMBSTONE_DAYS=0):
+            expired = signing.dumps({'seq': 1}, salt=sync.TOKEN_SALT, compress=True)
+            resp = self.client.get('/api/sync/', {'token': expired})
+        self.assertEqual(resp.status_code, 410)
+        self.assertIn(APIClient().get('/api/sync/').status_code, (401, 403))
+
+    def test_prune_keeps_recent_tombstones(self):
+        self.trees[0].delete()
+        self.assertEqual(sync.prune_tombstones(), 0)
+        self.assertEqual(sync.prune_tombstones(days=-1), 1)
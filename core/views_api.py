@@ -1,4 +1,7 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from . import sync
 from .models import Post, SiteConfiguration
 from .serializers import PostSerializer, SiteConfigSerializer
 
@@ -11,3 +14,26 @@ class SiteConfigViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SiteConfiguration.objects.all()
     serializer_class = SiteConfigSerializer
     permission_classes = [permissions.AllowAny]
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_changes(request):
+    """Delta sync for offline apps: what changed since ``token`` (see core.sync).
+
+    Omit ``token`` for a full download; keep requesting with the returned
+    token while ``more`` is true. ``page_size`` caps the changes per page.
+    An expired token answers 410 and the device must resync from scratch.
+    """
+    try:
+        page_size = int(request.query_params.get('page_size', sync.DEFAULT_PAGE_SIZE))
+        if not 1 <= page_size <= sync.MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return Response({'detail': f'page_size must be 1-{sync.MAX_PAGE_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(sync.changes(request.query_params.get('token') or None, page_size))
+    except sync.TokenExpired as exc:
+        return Response({'detail': str(exc), 'reset': True}, status=status.HTTP_410_GONE)
+    except sync.InvalidToken as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.cache import cache
+from core import nscache
 from .services.dashboard_service import get_dashboard_summary
 from .serializers import (
     DashboardSummarySerializer,
@@ -16,10 +16,10 @@ class DashboardSummaryAPIView(APIView):
 
     def get(self, request):
         cache_key = f"dashboard_summary_{request.user.id}"
-        data = cache.get(cache_key)
+        data = nscache.get(nscache.DASHBOARD, cache_key)
         if data is None:
             data = get_dashboard_summary(user=request.user)
-            cache.set(cache_key, data, 60 * 5)  # cache 5 minutes
+            nscache.set(nscache.DASHBOARD, cache_key, data, 60 * 5)  # cache 5 minutes
 
         serializer = DashboardSummarySerializer(data)
         return Response({'status': 'success', 'data': serializer.data})
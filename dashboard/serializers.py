@@ -16,6 +16,8 @@ class DashboardSummarySerializer(serializers.Serializer):
     monthly_trends = serializers.ListField()
     species_distribution = serializers.ListField()
     top_regions = serializers.ListField()
+    co2_kg = serializers.FloatField()
+    projected_co2_kg = serializers.FloatField()
 
 
 class MonthlyTrendSerializer(serializers.Serializer):
@@ -1,15 +1,14 @@
 from typing import Dict, List, Any
-from django.db.models import Sum
-from django.db.models.functions import TruncMonth
+from django.db.models import F, Sum
 from django.db import OperationalError
 
 try:
-    from trees.models import Tree
+    from trees.models import TreeStatsRollup
     from beneficiaries.models import PlantingSite, Beneficiary
 except Exception:
     # If migrations haven't run or apps are missing, importing models will fail.
     # Defer raising and handle OperationalError in query execution below.
-    Tree = None
+    TreeStatsRollup = None
     PlantingSite = None
     Beneficiary = None
 
@@ -22,11 +21,12 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
     """Aggregate key dashboard metrics.
 
     Returns a dict with total_trees, avg_survival_rate, total_sites, total_beneficiaries,
-    monthly_trends, species_distribution, top_regions.
+    monthly_trends, species_distribution, top_regions, co2_kg, projected_co2_kg.
     Applies simple role-based filtering when `user` is provided (field officers see their county).
+    Tree figures come from the per-group TreeStatsRollup table, not a scan of every tree.
     """
     # If Tree model isn't available (e.g. migrations not applied), return safe defaults.
-    if Tree is None:
+    if TreeStatsRollup is None:
         return {
             'total_trees': 0,
             'alive': 0,
@@ -37,18 +37,21 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
             'monthly_trends': [],
             'species_distribution': [],
             'top_regions': [],
+            'co2_kg': 0.0,
+            'projected_co2_kg': 0.0,
         }
 
-    qs = Tree.objects.select_related('species', 'beneficiary')
+    qs = TreeStatsRollup.objects.filter(tree_count__gt=0)
 
     # role-based filtering (simple): if user is field_officer, filter by profile.county
+    county = None
     if user is not None and hasattr(user, 'role') and user.role == 'field_officer':
         county = getattr(getattr(user, 'profile', None), 'county', None)
         if county:
             qs = qs.filter(beneficiary__address__icontains=county)
 
     try:
-        total_trees = qs.aggregate(total=Sum('number_of_seedlings'))['total'] or 0
+        by_status = dict(qs.values_list('status').annotate(count=Sum('seedling_count')).order_by())
     except OperationalError:
         # Database schema not ready; return safe defaults so dashboard views don't 500.
         return {
@@ -61,11 +64,13 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
             'monthly_trends': [],
             'species_distribution': [],
             'top_regions': [],
+            'co2_kg': 0.0,
+            'projected_co2_kg': 0.0,
         }
 
-    # survival from latest TreeUpdate status if available, otherwise tree.status
-    alive = qs.filter(status='alive').aggregate(total=Sum('number_of_seedlings'))['total'] or 0
-    dead = qs.filter(status='dead').aggregate(total=Sum('number_of_seedlings'))['total'] or 0
+    total_trees = sum(c or 0 for c in by_status.values())
+    alive = by_status.get('alive') or 0
+    dead = by_status.get('dead') or 0
     avg_survival_rate = 0.0
     if total_trees:
         avg_survival_rate = round((alive / total_trees) * 100, 2)
@@ -81,9 +86,8 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
 
     # monthly planting trends (last 12 months)
     trends_qs = (
-        qs.annotate(month=TruncMonth('planting_date'))
-        .values('month')
-        .annotate(count=Sum('number_of_seedlings'))
+        qs.values(month=F('planting_month'))
+        .annotate(count=Sum('seedling_count'))
         .order_by('month')
     )
     monthly_trends: List[Dict[str, Any]] = []
@@ -93,7 +97,7 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
     # species distribution
     species_qs = (
         qs.values('species__name')
-        .annotate(count=Sum('number_of_seedlings'))
+        .annotate(count=Sum('seedling_count'))
         .order_by('-count')
     )
     species_distribution = [
@@ -103,11 +107,22 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
     # top regions: heuristically use beneficiary.address -> county
     regions_qs = (
         qs.values('beneficiary__address')
-        .annotate(count=Sum('number_of_seedlings'))
+        .annotate(count=Sum('seedling_count'))
         .order_by('-count')[:5]
     )
     top_regions = [{'region': r['beneficiary__address'] or 'Unknown', 'count': r['count'] or 0} for r in regions_qs]
 
+    # CO2 estimate from the latest stored snapshot (trees.carbon)
+    co2 = {'co2_kg': 0.0, 'projected_co2_kg': 0.0}
+    try:
+        from trees import carbon
+        snapshot = carbon.current_snapshot()
+        if snapshot is not None:
+            regions = (lambda label: county.lower() in label.lower()) if county else None
+            co2 = carbon.summary(snapshot, regions=regions)
+    except Exception:
+        pass
+
     return {
         'total_trees': total_trees,
         'alive': alive,
@@ -118,4 +133,6 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
         'monthly_trends': monthly_trends,
         'species_distribution': species_distribution,
         'top_regions': top_regions,
+        'co2_kg': co2['co2_kg'],
+        'projected_co2_kg': co2['projected_co2_kg'],
     }
@@ -12,9 +12,9 @@ def recompute_dashboard_aggregates():
     # Example: call service and store in cache
     try:
         from .services.dashboard_service import get_dashboard_summary
-        from django.core.cache import cache
+        from core import nscache
         data = get_dashboard_summary()
-        cache.set('dashboard_summary_background', data, 60 * 60)
+        nscache.set(nscache.DASHBOARD, 'dashboard_summary_background', data, 60 * 60)
     except Exception:
         # in real task log the exception
         pass
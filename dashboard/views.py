@@ -5,7 +5,7 @@ from django.contrib.auth.views import redirect_to_login
 from django.conf import settings
 from django.http import HttpResponseForbidden
 from functools import wraps
-from django.core.cache import cache
+from core import nscache
 from .services.dashboard_service import get_dashboard_summary
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -267,13 +267,13 @@ def _build_summary_context(request):
     consistent variable names like `total_trees` and `total_volunteers`.
     """
     cache_key = f"dashboard_summary_view_{request.user.id if request.user.is_authenticated else 'anon'}"
-    summary = cache.get(cache_key)
+    summary = nscache.get(nscache.DASHBOARD, cache_key)
     if summary is None:
         try:
             summary = get_dashboard_summary(user=request.user if request.user.is_authenticated else None)
         except Exception:
             summary = {}
-        cache.set(cache_key, summary, 60 * 5)
+        nscache.set(nscache.DASHBOARD, cache_key, summary, 60 * 5)
 
     def _get(k, default=0):
         if not summary:
@@ -287,6 +287,7 @@ def _build_summary_context(request):
         'total_volunteers': _get('total_volunteers', 0),
         'total_sites': _get('total_sites', 0),
         'alive': _get('alive', 0),
+        'co2_tonnes': round((_get('co2_kg', 0.0) or 0.0) / 1000, 2),
         'summary': summary,
     }
 
@@ -379,13 +380,13 @@ def dashboard_guest(request):
     or when optional models (Event, Notification) are not present.
     """
     cache_key = f"dashboard_guest_view_{request.user.id if request.user.is_authenticated else 'anon'}"
-    summary = cache.get(cache_key)
+    summary = nscache.get(nscache.DASHBOARD, cache_key)
     if summary is None:
         try:
             summary = get_dashboard_summary(user=request.user if request.user.is_authenticated else None)
         except Exception:
             summary = {}
-        cache.set(cache_key, summary, 60 * 2)
+        nscache.set(nscache.DASHBOARD, cache_key, summary, 60 * 2)
 
     # Helper to read both dict-like and object-like summary
     def get_summary_field(key, default=0):
@@ -452,13 +453,13 @@ def insights_dashboard(request):
     to provide sensible defaults for the template variables.
     """
     cache_key = f"insights_summary_view_{request.user.id if request.user.is_authenticated else 'anon'}"
-    summary = cache.get(cache_key)
+    summary = nscache.get(nscache.DASHBOARD, cache_key)
     if summary is None:
         try:
             summary = get_dashboard_summary(user=request.user if request.user.is_authenticated else None)
         except Exception:
             summary = {}
-        cache.set(cache_key, summary, 60 * 5)
+        nscache.set(nscache.DASHBOARD, cache_key, summary, 60 * 5)
 
     # Provide template-friendly defaults
     context = {
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_app', '0002_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['uploaded_at', 'id'], name='media_app_m_uploade_adb057_idx'),
+        ),
+    ]
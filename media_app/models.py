@@ -3,6 +3,7 @@ from django.conf import settings
 from django.utils import timezone
 from beneficiaries.models import PlantingSite
 from trees.models import Tree
+from core.geo import GeoQuerySet, encode as geohash_encode
 from io import BytesIO
 try:
     # Pillow is optional for image processing; import locally in _process_image to
@@ -47,9 +48,16 @@ class Media(models.Model):
     latitude = models.FloatField(null=True, blank=True, db_index=True)
     longitude = models.FloatField(null=True, blank=True, db_index=True)
     taken_at = models.DateTimeField(null=True, blank=True)
+    # maintained from latitude/longitude for index-backed spatial lookups (core.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+
+    objects = GeoQuerySet.as_manager()
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['uploaded_at', 'id']),
+        ]
 
     def __str__(self):
         return f"Media {self.id} - {self.title or os.path.basename(self.file.name)}"
@@ -63,6 +71,7 @@ class Media(models.Model):
             self.file_type = 'video'
         else:
             self.file_type = 'document'
+        self.geohash = geohash_encode(self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
 
@@ -111,6 +120,7 @@ class Media(models.Model):
                 lon = _deg(gps[4]) * (-1 if gps[3] == 'W' else 1)
                 self.latitude = lat
                 self.longitude = lon
+                self.geohash = geohash_encode(lat, lon)
             except Exception:
                 pass
 
@@ -146,4 +156,4 @@ class Media(models.Model):
             pass
 
         buf.close()
-        super().save(update_fields=['file', 'thumbnail', 'latitude', 'longitude', 'taken_at'])
+        super().save(update_fields=['file', 'thumbnail', 'latitude', 'longitude', 'geohash', 'taken_at'])
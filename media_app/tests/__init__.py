@@ -0,0 +1 @@
+# tests package for media_app
@@ -0,0 +1,50 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from media_app.models import Media
+
+
+class MediaByLocationTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = get_user_model().objects.create_user(username='officer', email='o@example.com', password='secret')
+        points = [('here', -1.2921, 36.8219), ('close', -1.2950, 36.8250), ('town', -1.3200, 36.8500), ('coast', -4.0435, 39.6682)]
+        for title, lat, lon in points:
+            Media.objects.create(uploader=self.user, title=title, latitude=lat, longitude=lon,
+                                 file=SimpleUploadedFile(f'{title}.pdf', b'%PDF-1.4'))
+        Media.objects.create(uploader=self.user, title='nowhere', file=SimpleUploadedFile('nowhere.pdf', b'%PDF-1.4'))
+        self.client.force_login(self.user)
+        self.url = reverse('api_media:media-by-location')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_nearest_first_within_radius(self):
+        resp = self.client.get(self.url, {'lat': -1.2921, 'lon': 36.8219, 'radius': 5})
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()['results']
+        self.assertEqual([r['title'] for r in results], ['here', 'close', 'town'])
+        self.assertEqual(results[0]['distance_km'], 0.0)
+        self.assertLess(results[1]['distance_km'], results[2]['distance_km'])
+
+    def test_default_radius_and_pagination(self):
+        resp = self.client.get(self.url, {'lat': -1.2921, 'lon': 36.8219})
+        self.assertEqual([r['title'] for r in resp.json()['results']], ['here', 'close'])
+        resp = self.client.get(self.url, {'lat': -1.2921, 'lon': 36.8219, 'radius': 5, 'page': 2})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_cursor_param_falls_back_to_page_numbers(self):
+        resp = self.client.get(self.url, {'lat': -1.2921, 'lon': 36.8219, 'radius': 5, 'cursor': ''})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r['title'] for r in resp.json()['results']], ['here', 'close', 'town'])
+
+    def test_requires_coordinates(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': 'x', 'lon': 1}).status_code, 400)
@@ -13,14 +13,14 @@ class MediaCrudTests(TestCase):
         self.staff = self.User.objects.create_user(username='staff', email='s@example.com', password='secret', is_staff=True)
 
     def test_upload_requires_login(self):
-        url = reverse('media_upload')
+        url = reverse('media_app:media_upload')
         # anonymous users should be redirected to login
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 302)
 
     def test_create_and_edit_and_delete_by_uploader(self):
         self.client.login(username='u1', password='secret')
-        upload_url = reverse('media_upload')
+        upload_url = reverse('media_app:media_upload')
         f = SimpleUploadedFile('test.jpg', b'filecontent', content_type='image/jpeg')
         resp = self.client.post(upload_url, {'title': 'x', 'file': f})
         self.assertIn(resp.status_code, (200, 302))
@@ -29,14 +29,14 @@ class MediaCrudTests(TestCase):
         self.assertIsNotNone(m)
 
         # edit
-        edit_url = reverse('media_edit', args=[m.id])
+        edit_url = reverse('media_app:media_edit', args=[m.id])
         resp = self.client.post(edit_url, {'title': 'new'})
         self.assertEqual(resp.status_code, 200)
         m.refresh_from_db()
         self.assertEqual(m.title, 'new')
 
         # delete
-        delete_url = reverse('media_delete', args=[m.id])
+        delete_url = reverse('media_app:media_delete', args=[m.id])
         resp = self.client.post(delete_url)
         self.assertIn(resp.status_code, (302, 200))
         self.assertFalse(Media.objects.filter(id=m.id).exists())
@@ -45,11 +45,11 @@ class MediaCrudTests(TestCase):
         # create media by u1
         self.client.login(username='u1', password='secret')
         f = SimpleUploadedFile('test.jpg', b'filecontent', content_type='image/jpeg')
-        self.client.post(reverse('media_upload'), {'title': 'x', 'file': f})
+        self.client.post(reverse('media_app:media_upload'), {'title': 'x', 'file': f})
         m = Media.objects.first()
         self.client.logout()
 
         # attempt edit as other user
         self.client.login(username='staff', password='secret')
-        resp = self.client.post(reverse('media_edit', args=[m.id]), {'title': 'bad'})
+        resp = self.client.post(reverse('media_app:media_edit', args=[m.id]), {'title': 'bad'})
         self.assertIn(resp.status_code, (200, 403))
@@ -7,6 +7,6 @@ class MediaViewsTests(TestCase):
         self.client = Client()
 
     def test_media_list_page(self):
-        url = reverse('media_list')
+        url = reverse('media_app:media_list')
         resp = self.client.get(url)
         self.assertEqual(resp.status_code, 200)
@@ -2,6 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters import rest_framework as filters
+from core import geo
+from core.pagination import SelectablePagination
 from .models import Media
 from .serializers import MediaSerializer
 from django.shortcuts import render, redirect
@@ -9,6 +11,10 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 
 
+DEFAULT_RADIUS_KM = 1.0
+MAX_RADIUS_KM = 50.0
+
+
 class IsUploaderOrAdmin:
     def has_object_permission(self, request, view, obj):
         user = request.user
@@ -26,6 +32,8 @@ class MediaViewSet(viewsets.ModelViewSet):
     queryset = Media.objects.select_related('uploader').all().order_by('-uploaded_at')
     serializer_class = MediaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-uploaded_at', '-id')
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_fields = ['uploader__id', 'tree__tree_id', 'site__id']
 
@@ -46,22 +54,48 @@ class MediaViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
     @action(detail=False, methods=['get'])
-    def by_location(self, request, lat=None, lon=None):
-        qs = self.get_queryset().filter(latitude__isnull=False, longitude__isnull=False)
-        # simple proximity filter: within ~0.01 degrees
+    def by_location(self, request):
+        """Media taken near a point, nearest first.
+
+        Query params: ``lat``, ``lon`` and ``radius`` (km, default 1, at most
+        50). Candidates come from an indexed bounding-box query (geohash
+        prefix ranges plus the latitude/longitude columns); only their
+        coordinates are loaded, ranked by haversine distance in one vectorized
+        pass, and just the requested page is fetched as full rows.
+        """
         try:
-            latf = float(lat); lonf = float(lon)
-            qs = qs.filter(latitude__gte=latf-0.01, latitude__lte=latf+0.01, longitude__gte=lonf-0.01, longitude__lte=lonf+0.01)
-        except Exception:
-            qs = qs.none()
-        page = self.paginate_queryset(qs)
+            latf = float(request.query_params['lat'])
+            lonf = float(request.query_params['lon'])
+            radius = float(request.query_params.get('radius', DEFAULT_RADIUS_KM))
+            if not (-90 <= latf <= 90 and -180 <= lonf <= 180 and radius > 0):
+                raise ValueError
+        except (KeyError, ValueError):
+            return Response({'detail': 'lat, lon and a positive radius (km) are required'}, status=status.HTTP_400_BAD_REQUEST)
+        radius = min(radius, MAX_RADIUS_KM)
+
+        candidates = self.filter_queryset(self.get_queryset()).filter(latitude__isnull=False, longitude__isnull=False)
+        candidates = candidates.within_bbox(*geo.radius_bbox(latf, lonf, radius))
+        pks, lats, lons = [], [], []
+        for pk, lat, lon in candidates.order_by().values_list('pk', 'latitude', 'longitude'):
+            pks.append(pk)
+            lats.append(lat)
+            lons.append(lon)
+        distances = geo.haversine_km(latf, lonf, lats, lons) if pks else []
+        ranked = sorted((d, pk) for pk, d in zip(pks, distances) if d <= radius)
+
+        page = self.paginate_queryset(ranked)
+        rows = page if page is not None else ranked
+        objs = self.get_queryset().in_bulk([pk for _, pk in rows])
+        data = []
+        for distance, pk in rows:
+            item = self.get_serializer(objs[pk]).data
+            item['distance_km'] = round(distance, 3)
+            data.append(item)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qs, many=True)
-        return Response({'status':'success','data':serializer.data})
+            return self.get_paginated_response(data)
+        return Response({'status': 'success', 'data': data})
+
 
-    
 # Template-based views for the media app
 def media_list_view(request):
     qs = Media.objects.all().order_by('-uploaded_at')[:200]
@@ -182,5 +216,5 @@ def media_delete_view(request, pk):
 
     if request.method == 'POST':
         m.delete()
-        return redirect('media_list')
+        return redirect('media_app:media_list')
     return render(request, 'media_app/media_confirm_delete.html', {'media': m})
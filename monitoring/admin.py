@@ -1,8 +1,9 @@
 from django.contrib import admin
+from core.bulk import BulkOperationAdminMixin
 from .models import FollowUp
 
 @admin.register(FollowUp)
-class FollowUpAdmin(admin.ModelAdmin):
+class FollowUpAdmin(BulkOperationAdminMixin, admin.ModelAdmin):
     list_display = ('tree', 'type', 'scheduled_date', 'completed')
 
 
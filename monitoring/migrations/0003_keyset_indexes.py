@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_monitoringreport'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='monitoringreport',
+            index=models.Index(fields=['created_at', 'id'], name='monitoring__created_407135_idx'),
+        ),
+    ]
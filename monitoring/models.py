@@ -43,6 +43,9 @@ class MonitoringReport(models.Model):
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     @property
     def survival_rate(self):
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Avg, Count, F
 from django.shortcuts import render, get_object_or_404, redirect
+from core.pagination import SelectablePagination
 from .models import FollowUp, MonitoringReport
 from .serializers import FollowUpSerializer, MonitoringReportSerializer, MonitoringStatsSerializer
 
@@ -17,6 +18,8 @@ class MonitoringReportViewSet(viewsets.ModelViewSet):
     queryset = MonitoringReport.objects.select_related('site', 'tree', 'reporter').prefetch_related('media').all()
     serializer_class = MonitoringReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(reporter=self.request.user)
@@ -20,6 +20,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def mark_read(self):
         if self.unread:
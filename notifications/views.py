@@ -10,12 +10,15 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.http import JsonResponse, HttpResponseBadRequest
+from core.pagination import SelectablePagination
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all().select_related('recipient','actor')
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         # users only see their notifications unless they have notification admin perms
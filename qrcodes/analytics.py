@@ -0,0 +1,165 @@
+"""Scan event log and time-bucketed scan analytics.
+
+Scans buffered by ``qrcodes.counters.record_scan`` are batch-inserted into
+``QRScanEvent`` and folded into hourly and daily ``QRScanBucket`` rows in the
+same transaction. Without a shared cache (``counters.buffering``) each scan
+is a single INSERT by ``record_event``, and the periodic ``flush_scan_events``
+rolls those events up and adds them to the codes' ``scan_count``. Read APIs
+only look at the buckets; raw events past the retention window are pruned
+once they have been rolled up.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .counters import EVENT_LOG, FLUSH_CHUNK, _latest, buffering, drain_slots
+from .models import QRCode, QRScanBucket, QRScanEvent, QRScanRollupState
+
+
+ROLLUP_STATE = 'scan-events'
+GRANULARITIES = {'hour': TruncHour, 'day': TruncDay}
+DEFAULT_RETENTION_DAYS = 30
+# events inserted directly are not serialized by the rollup lock, so a lower
+# id may commit after a higher one; events younger than this wait for the
+# next rollup so the high-water mark never passes an uncommitted row
+SETTLE_SECONDS = 10
+
+
+def _locked_state():
+    QRScanRollupState.objects.get_or_create(name=ROLLUP_STATE)
+    return QRScanRollupState.objects.select_for_update().get(name=ROLLUP_STATE)
+
+
+def _rollup(state, before=None, counts=False):
+    """Fold events newer than the high-water mark (and scanned before ``before``) into buckets.
+
+    With ``counts`` the events are also added to ``QRCode.scan_count``.
+    """
+    new = QRScanEvent.objects.filter(id__gt=state.last_event_id)
+    settled = new if before is None else new.filter(scanned_at__lt=before)
+    max_id = settled.aggregate(m=Max('id'))['m']
+    if max_id is None:
+        return 0
+    window = new.filter(id__lte=max_id)
+    if counts:
+        for row in window.values('qrcode_id').annotate(n=Count('id'), last=Max('scanned_at')).order_by():
+            QRCode.objects.filter(pk=row['qrcode_id']).update(
+                scan_count=F('scan_count') + row['n'], last_scanned=_latest(row['last']),
+            )
+    for granularity, trunc in GRANULARITIES.items():
+        rows = window.annotate(bucket=trunc('scanned_at')).values('qrcode_id', 'bucket').annotate(n=Count('id'))
+        deltas = {(r['qrcode_id'], r['bucket']): r['n'] for r in rows}
+        existing = QRScanBucket.objects.filter(
+            granularity=granularity,
+            qrcode_id__in={k[0] for k in deltas},
+            bucket_start__in={k[1] for k in deltas},
+        )
+        changed = []
+        for bucket in existing:
+            delta = deltas.pop((bucket.qrcode_id, bucket.bucket_start), None)
+            if delta:
+                bucket.count += delta
+                changed.append(bucket)
+        QRScanBucket.objects.bulk_update(changed, ['count'], batch_size=FLUSH_CHUNK)
+        QRScanBucket.objects.bulk_create(
+            [QRScanBucket(qrcode_id=q, granularity=granularity, bucket_start=b, count=n) for (q, b), n in deltas.items()],
+            batch_size=FLUSH_CHUNK,
+        )
+    rolled = window.count()
+    state.last_event_id = max_id
+    state.save(update_fields=['last_event_id'])
+    return rolled
+
+
+def rollup_scan_events():
+    """Fold any events not yet in the buckets; returns the number folded."""
+    with transaction.atomic():
+        return _rollup(_locked_state())
+
+
+def record_event(pk, when, user_agent=''):
+    """Insert one scan event; ``flush_scan_events`` rolls it up and counts it."""
+    QRScanEvent.objects.create(qrcode_id=pk, scanned_at=when, user_agent=(user_agent or '')[:255])
+
+
+def flush_scan_events():
+    """Insert buffered scan events in batches and roll them up.
+
+    Without buffering there is nothing to insert: the events ``record_event``
+    stored are rolled up and added to the scan counts instead.
+    """
+    if not buffering():
+        with transaction.atomic():
+            _rollup(_locked_state(), before=timezone.now() - timedelta(seconds=SETTLE_SECONDS), counts=True)
+        return 0
+    inserted = 0
+    for values in drain_slots(EVENT_LOG):
+        pks = {v[0] for v in values}
+        known = {str(pk) for pk in QRCode.objects.filter(pk__in=pks).values_list('pk', flat=True)}
+        events = [
+            QRScanEvent(qrcode_id=pk, scanned_at=datetime.fromisoformat(ts), user_agent=ua)
+            for pk, ts, ua in values if pk in known
+        ]
+        # inserting under the rollup lock keeps event ids in commit order, so
+        # the high-water mark never skips a row
+        with transaction.atomic():
+            state = _locked_state()
+            QRScanEvent.objects.bulk_create(events, batch_size=FLUSH_CHUNK)
+            _rollup(state)
+        inserted += len(events)
+    return inserted
+
+
+def prune_scan_events(retention_days=None, batch_size=5000):
+    """Delete rolled-up raw events older than the retention window."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'QR_SCAN_EVENT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    state = QRScanRollupState.objects.filter(name=ROLLUP_STATE).first()
+    if state is None:
+        return 0
+    deleted = 0
+    while True:
+        ids = list(QRScanEvent.objects.filter(id__lte=state.last_event_id, scanned_at__lt=cutoff)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += QRScanEvent.objects.filter(id__in=ids).delete()[0]
+
+
+def scan_series(qrcode_id, granularity='day', since=None, until=None):
+    """Return ``[{'bucket', 'count'}]`` for one code from the rollups."""
+    qs = QRScanBucket.objects.filter(qrcode_id=qrcode_id, granularity=granularity)
+    if since is not None:
+        qs = qs.filter(bucket_start__gte=since)
+    if until is not None:
+        qs = qs.filter(bucket_start__lt=until)
+    return [{'bucket': b, 'count': n} for b, n in qs.order_by('bucket_start').values_list('bucket_start', 'count')]
+
+
+def top_scanned(since=None, until=None, limit=10):
+    """Return the most scanned codes over a window, from the daily rollups."""
+    qs = QRScanBucket.objects.filter(granularity='day')
+    if since is not None:
+        qs = qs.filter(bucket_start__gte=since)
+    if until is not None:
+        qs = qs.filter(bucket_start__lt=until)
+    rows = (
+        qs.values('qrcode_id', 'qrcode__label', 'qrcode__tree__tree_id', 'qrcode__site_id')
+        .annotate(scans=Sum('count'))
+        .order_by('-scans')[:limit]
+    )
+    return [
+        {
+            'qrcode': r['qrcode_id'],
+            'label': r['qrcode__label'],
+            'tree_id': r['qrcode__tree__tree_id'],
+            'site': r['qrcode__site_id'],
+            'scans': r['scans'],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,167 @@
+"""Cache-buffered QR scan counting and event logging.
+
+Public scans only touch the cache: each scan atomically increments a
+per-code counter, appends the raw scan to an event log and, on the first
+scan since the last flush, registers the code in a numbered slot.
+``flush_scan_counts`` (run periodically by Celery beat) walks the new slots
+and applies one aggregated UPDATE per scanned code, so hot codes no longer
+serialize on their row during busy events. The buffered events are drained
+by ``qrcodes.analytics.flush_scan_events``.
+
+Only ``add``/``incr``/``decr``/``get_many`` are used, which every Django
+cache backend implements atomically enough for this (Redis, Memcached,
+LocMem for a single process).
+
+Buffering needs a cache shared by the web workers and the Celery worker
+that flushes it. With a process-local cache (LocMem, the default without
+``REDIS_URL``) each scan is inserted as a ``QRScanEvent`` instead, and
+``qrcodes.analytics.flush_scan_events`` adds the events to the counts; see
+``buffering``.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import QRCode
+
+
+COUNT_KEY = 'qrcodes:scans:count:{}'
+LAST_KEY = 'qrcodes:scans:last:{}'
+PENDING_KEY = 'qrcodes:scans:pending:{}'
+
+# slot logs: '<prefix>:seq' hands out slot numbers, '<prefix>:slot:<n>' holds
+# the value and '<prefix>:flushed' is the last slot drained
+SCAN_LOG = 'qrcodes:scans'
+EVENT_LOG = 'qrcodes:events'
+
+FLUSH_CHUNK = 1000
+# a few flush intervals (beat runs flush_scan_counts every minute): if the
+# code's slot is lost, the flag expires and the next scan registers it again
+PENDING_TIMEOUT = 5 * 60
+
+# caches private to one process: the flush task would never see their buffer
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def buffering():
+    """Whether scans go through the cache buffer (``QR_SCAN_BUFFER``, default: the cache is shared)."""
+    setting = getattr(settings, 'QR_SCAN_BUFFER', None)
+    if setting is not None:
+        return setting
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _latest(when):
+    # never move last_scanned backwards (flushes and direct writes may interleave)
+    return Coalesce(Greatest(F('last_scanned'), Value(when)), Value(when))
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # evicted between add and incr
+        cache.set(key, delta, None)
+        return delta
+
+
+def append_slot(log, value):
+    """Append ``value`` to the slot log ``log``."""
+    n = _incr(f'{log}:seq')
+    cache.set(f'{log}:slot:{n}', value, None)
+
+
+def drain_slots(log, chunk=FLUSH_CHUNK):
+    """Yield the values appended to ``log`` since the last drain, in chunks.
+
+    A slot is only consumed once the caller asks for the next chunk, so a
+    crash mid-chunk replays it. A missing slot stops the drain once (its
+    writer may sit between taking the number and storing the value); if it
+    is still missing on the next drain it is treated as lost and skipped.
+    """
+    seq_key, flushed_key, hole_key = f'{log}:seq', f'{log}:flushed', f'{log}:hole'
+    upto = cache.get(seq_key) or 0
+    done = cache.get(flushed_key) or 0
+    hole = cache.get(hole_key)
+    while done < upto:
+        numbers = list(range(done + 1, min(done + chunk, upto) + 1))
+        found = cache.get_many([f'{log}:slot:{n}' for n in numbers])
+        values = []
+        last = done
+        for n in numbers:
+            key = f'{log}:slot:{n}'
+            if key not in found:
+                if n != hole:
+                    cache.set(hole_key, n, None)
+                    upto = n - 1
+                    break
+            else:
+                values.append(found[key])
+            last = n
+        if values:
+            yield values
+        cache.delete_many([f'{log}:slot:{n}' for n in range(done + 1, last + 1)])
+        cache.set(flushed_key, last, None)
+        done = last
+
+
+def record_scan(pk, when, user_agent=''):
+    """Count one scan of QRCode ``pk`` at ``when``; only touches the cache when buffering."""
+    pk = str(pk)
+    if not buffering():
+        from .analytics import record_event
+        record_event(pk, when, user_agent)
+        return
+    _incr(COUNT_KEY.format(pk))
+    cache.set(LAST_KEY.format(pk), when.isoformat(), None)
+    if cache.add(PENDING_KEY.format(pk), 1, PENDING_TIMEOUT):
+        append_slot(SCAN_LOG, pk)
+    append_slot(EVENT_LOG, (pk, when.isoformat(), (user_agent or '')[:255]))
+
+
+def pending_scans(pk):
+    """Scans of ``pk`` recorded in the cache but not flushed yet."""
+    return cache.get(COUNT_KEY.format(pk)) or 0
+
+
+def _claim(pk):
+    """Take the buffered count for ``pk``; returns ``(count, last_scanned)``."""
+    # drop the pending flag first: a scan arriving after this point registers
+    # the code again and is picked up by the next flush
+    cache.delete(PENDING_KEY.format(pk))
+    count = cache.get(COUNT_KEY.format(pk)) or 0
+    if count:
+        cache.decr(COUNT_KEY.format(pk), count)
+    last = cache.get(LAST_KEY.format(pk))
+    return count, (datetime.fromisoformat(last) if last else None)
+
+
+def flush_scan_counts():
+    """Apply buffered scan counts to ``QRCode.scan_count``/``last_scanned``."""
+    codes = scans = 0
+    for pks in drain_slots(SCAN_LOG):
+        for pk in set(pks):
+            count, last = _claim(pk)
+            if not count:
+                continue
+            updates = {'scan_count': F('scan_count') + count}
+            if last is not None:
+                updates['last_scanned'] = _latest(last)
+            try:
+                QRCode.objects.filter(pk=pk).update(**updates)
+            except Exception:
+                # put the claimed scans back so the next flush retries them
+                _incr(COUNT_KEY.format(pk), count)
+                if cache.add(PENDING_KEY.format(pk), 1, PENDING_TIMEOUT):
+                    append_slot(SCAN_LOG, pk)
+                continue
+            codes += 1
+            scans += count
+    return {'codes': codes, 'scans': scans}
@@ -0,0 +1,104 @@
+"""Printable PDF sheets of QR labels.
+
+QR matrices are computed one chunk of labels at a time and placed as tiny
+module bitmaps, so a sheet of thousands of labels never holds every matrix or
+a full-resolution image per label in memory.
+"""
+from .models import QRCode
+from .rendering import qr_matrix, qr_target
+
+
+DEFAULT_COLUMNS = 4
+DEFAULT_ROWS = 6
+# labels whose matrices are computed together; a multiple of most page sizes
+RENDER_CHUNK = 480
+
+
+def label_qrcodes(tree_ids=None, campaign=None, beneficiary=None):
+    """Return ``[(QRCode, caption)]`` for the selected trees, ordered by tree_id.
+
+    Trees without a QRCode row get one created (a tree has at most one, see
+    the ``uniq_qrcode_tree`` constraint).
+    """
+    from trees.models import Tree
+
+    trees = Tree.objects.all()
+    if tree_ids:
+        trees = trees.filter(tree_id__in=tree_ids)
+    if campaign:
+        trees = trees.filter(campaign_id=campaign)
+    if beneficiary:
+        trees = trees.filter(beneficiary_id=beneficiary)
+    trees = dict(trees.values_list('pk', 'tree_id'))
+    if not trees:
+        return []
+
+    have_qr = set(QRCode.objects.filter(tree_id__in=trees).values_list('tree_id', flat=True))
+    QRCode.objects.bulk_create([QRCode(tree_id=pk, label=str(tid)) for pk, tid in trees.items() if pk not in have_qr],
+                              ignore_conflicts=True)
+
+    chosen = {}
+    for qr in QRCode.objects.filter(tree_id__in=trees).order_by('created_at').only('pk', 'tree_id', 'label'):
+        chosen.setdefault(qr.tree_id, qr)
+    return sorted(((qr, trees[pk]) for pk, qr in chosen.items()), key=lambda item: item[1])
+
+
+def _matrix_image(matrix):
+    """Return a one-pixel-per-module bitmap of ``matrix``.
+
+    Placed scaled up in the PDF this prints as crisp as vector modules (PDF
+    images are not interpolated by default) at a fraction of the drawing cost.
+    """
+    from PIL import Image
+
+    n = len(matrix)
+    pixels = bytes(0 if cell == '1' else 255 for row in matrix for cell in row)
+    return Image.frombytes('L', (n, n), pixels).convert('1')
+
+
+def write_label_sheet(out, labels, columns=DEFAULT_COLUMNS, rows=DEFAULT_ROWS, base_url=None, title=None):
+    """Write a PDF of ``labels`` (``[(QRCode, caption)]``) to the file ``out``.
+
+    Returns the number of pages written.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    page_w, page_h = A4
+    margin = 10 * mm
+    caption_h = 5 * mm
+    cell_w = (page_w - 2 * margin) / columns
+    cell_h = (page_h - 2 * margin) / rows
+    qr_size = min(cell_w, cell_h - caption_h) - 4 * mm
+    font_size = max(6, min(10, qr_size / 10))
+
+    c = pdf_canvas.Canvas(out, pagesize=A4, pageCompression=1)
+    if title:
+        c.setTitle(title)
+    per_page = columns * rows
+    pages = 0
+    slot = 0
+    for start in range(0, len(labels), RENDER_CHUNK):
+        chunk = labels[start:start + RENDER_CHUNK]
+        matrices = [qr_matrix(qr_target(qr.get_scan_path(), base_url)) for qr, _ in chunk]
+        for (qr, caption), matrix in zip(chunk, matrices):
+            if slot == 0:
+                pages += 1
+                c.setFont('Helvetica', font_size)
+            col, row = slot % columns, slot // columns
+            x = margin + col * cell_w
+            y = page_h - margin - (row + 1) * cell_h
+            c.drawImage(ImageReader(_matrix_image(matrix)), x + (cell_w - qr_size) / 2,
+                        y + caption_h + (cell_h - caption_h - qr_size) / 2, qr_size, qr_size)
+            c.drawCentredString(x + cell_w / 2, y + caption_h / 2, str(caption or qr.label or qr.pk))
+            slot += 1
+            if slot == per_page:
+                c.showPage()
+                slot = 0
+    if slot or not pages:
+        c.showPage()
+        pages = pages or 1
+    c.save()
+    return pages
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrcodes', '0002_alter_qrcode_id_alter_qrcode_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRScanRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QRScanBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('qrcode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_buckets', to='qrcodes.qrcode')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='qrcodes_qrs_granula_a4ff9a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('qrcode', 'granularity', 'bucket_start'), name='uniq_qrscanbucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QRScanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scanned_at', models.DateTimeField()),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('qrcode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_events', to='qrcodes.qrcode')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scanned_at'], name='qrcodes_qrs_scanned_3943aa_idx')],
+            },
+        ),
+    ]
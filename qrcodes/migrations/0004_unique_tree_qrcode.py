@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:53
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+
+def unlink_extra_tree_codes(apps, schema_editor):
+    # keep the oldest code of each tree (the one labels print); later
+    # duplicates stay as unlinked codes rather than being deleted. Signs
+    # printed with an unlinked code stop resolving to their tree, so each one
+    # is written to the activity log for relinking or reprinting.
+    QRCode = apps.get_model('qrcodes', 'QRCode')
+    ActivityLog = apps.get_model('core', 'ActivityLog')
+    shared = (QRCode.objects.filter(tree__isnull=False).values('tree_id')
+              .annotate(n=Count('pk')).filter(n__gt=1).values_list('tree_id', flat=True))
+    entries = []
+    for tree_id in list(shared):
+        codes = list(QRCode.objects.filter(tree_id=tree_id).order_by('created_at', 'pk')
+                     .values_list('pk', 'tree__tree_id'))
+        (kept, label), extra = codes[0], [pk for pk, _ in codes[1:]]
+        QRCode.objects.filter(pk__in=extra).update(tree=None)
+        entries += [ActivityLog(action=f'Unlinked duplicate QR code {pk} from tree {label} (kept {kept})')
+                    for pk in extra]
+    if entries:
+        entries.append(ActivityLog(action=f'qrcodes.0004_unique_tree_qrcode unlinked {len(entries)} duplicate tree QR codes'))
+        ActivityLog.objects.bulk_create(entries)
+        logger.warning('Unlinked %d duplicate tree QR codes; see the activity log', len(entries) - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('qrcodes', '0003_scan_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(unlink_extra_tree_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='qrcode',
+            constraint=models.UniqueConstraint(condition=models.Q(('tree__isnull', False)), fields=('tree',), name='uniq_qrcode_tree'),
+        ),
+    ]
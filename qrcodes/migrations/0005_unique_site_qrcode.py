@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:32
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+
+def unlink_extra_site_codes(apps, schema_editor):
+    # same as 0004 for site codes: keep the oldest, unlink and log the rest
+    QRCode = apps.get_model('qrcodes', 'QRCode')
+    ActivityLog = apps.get_model('core', 'ActivityLog')
+    shared = (QRCode.objects.filter(site__isnull=False, tree__isnull=True).values('site_id')
+              .annotate(n=Count('pk')).filter(n__gt=1).values_list('site_id', flat=True))
+    entries = []
+    for site_id in list(shared):
+        codes = list(QRCode.objects.filter(site_id=site_id, tree__isnull=True).order_by('created_at', 'pk')
+                     .values_list('pk', flat=True))
+        QRCode.objects.filter(pk__in=codes[1:]).update(site=None)
+        entries += [ActivityLog(action=f'Unlinked duplicate QR code {pk} from planting site {site_id} (kept {codes[0]})')
+                    for pk in codes[1:]]
+    if entries:
+        entries.append(ActivityLog(action=f'qrcodes.0005_unique_site_qrcode unlinked {len(entries)} duplicate site QR codes'))
+        ActivityLog.objects.bulk_create(entries)
+        logger.warning('Unlinked %d duplicate site QR codes; see the activity log', len(entries) - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrcodes', '0004_unique_tree_qrcode'),
+    ]
+
+    operations = [
+        migrations.RunPython(unlink_extra_site_codes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='qrcode',
+            constraint=models.UniqueConstraint(condition=models.Q(('site__isnull', False), ('tree__isnull', True)), fields=('site',), name='uniq_qrcode_site'),
+        ),
+    ]
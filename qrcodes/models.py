@@ -1,12 +1,9 @@
 import uuid
-from io import BytesIO
 from django.db import models
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.base import ContentFile
 
-import qrcode
-
 
 def qrcode_upload_to(instance, filename):
     return f'qrcodes/{instance.pk or "new"}/{filename}'
@@ -28,6 +25,13 @@ class QRCode(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # one canonical code per tree; writers insert with ignore_conflicts
+            models.UniqueConstraint(fields=['tree'], condition=models.Q(tree__isnull=False), name='uniq_qrcode_tree'),
+            # likewise one site code (not linked to a tree) per site
+            models.UniqueConstraint(fields=['site'], condition=models.Q(site__isnull=False, tree__isnull=True),
+                                    name='uniq_qrcode_site'),
+        ]
 
     def get_scan_path(self):
         # public scan endpoint (relative)
@@ -36,21 +40,24 @@ class QRCode(models.Model):
     def get_absolute_url(self):
         return reverse('qrcodes-detail', kwargs={'pk': str(self.pk)})
 
+    def get_image_url(self, fmt='svg', size=None):
+        """URL of the on-demand rendering of this code (see ``qrcode_image_view``)."""
+        url = reverse('qrcode-image', kwargs={'pk': str(self.pk), 'fmt': fmt})
+        return f'{url}?size={int(size)}' if size else url
+
+    @property
+    def image_url(self):
+        """Stored image when there is one, otherwise the on-demand PNG."""
+        if self.image:
+            return self.image.url
+        return self.get_image_url('png')
+
     def generate_image(self, base_url=None):
         """Generate and save a QR image pointing to the scan URL."""
-        if base_url is None:
-            base_url = getattr(settings, 'SITE_BASE_URL', '')
-        target = (base_url.rstrip('/') if base_url else '') + self.get_scan_path()
-        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
-        qr.add_data(target)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        bio = BytesIO()
-        img.save(bio, format='PNG')
-        bio.seek(0)
+        from .rendering import qr_target, render_png
+        png = render_png(qr_target(self.get_scan_path(), base_url))
         name = f'{self.pk}.png'
-        self.image.save(name, ContentFile(bio.read()), save=False)
-        bio.close()
+        self.image.save(name, ContentFile(png), save=False)
         return self.image
 
     def increment_scan(self, when):
@@ -60,3 +67,55 @@ class QRCode(models.Model):
 
     def __str__(self):
         return f'QR {self.label or self.pk}'
+
+
+class QRScanEvent(models.Model):
+    """One public scan of a QRCode.
+
+    Append-only: rows are batch-inserted from the cache buffer by
+    ``qrcodes.analytics.flush_scan_events`` and pruned once rolled up.
+    """
+    qrcode = models.ForeignKey(QRCode, on_delete=models.CASCADE, related_name='scan_events')
+    scanned_at = models.DateTimeField()
+    user_agent = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scanned_at']),
+        ]
+
+    def __str__(self):
+        return f'Scan of {self.qrcode_id} @ {self.scanned_at}'
+
+
+class QRScanBucket(models.Model):
+    """Scan count of one QRCode over one hour or one day."""
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    qrcode = models.ForeignKey(QRCode, on_delete=models.CASCADE, related_name='scan_buckets')
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['qrcode', 'granularity', 'bucket_start'], name='uniq_qrscanbucket'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f'{self.qrcode_id} {self.granularity} {self.bucket_start}: {self.count}'
+
+
+class QRScanRollupState(models.Model):
+    """High-water mark of the scan events already folded into buckets."""
+    name = models.CharField(max_length=64, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} @ {self.last_event_id}'
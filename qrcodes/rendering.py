@@ -0,0 +1,108 @@
+"""QR image rendering helpers.
+
+The functions here are pure (data in, bytes out). Batches are rendered
+serially by the Celery task that owns them (qrcodes.tasks); prefork workers
+are daemonic and can't start a process pool, so throughput comes from the
+worker's concurrency, not from inside a task. ``render_cached`` backs the
+on-demand image endpoint with an in-process LRU keyed by content hash.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+
+import qrcode
+
+
+IMAGE_FORMATS = {'svg': 'image/svg+xml', 'png': 'image/png'}
+DEFAULT_BORDER = 4
+MIN_SIZE, MAX_SIZE, DEFAULT_SIZE = 64, 2048, 330
+# bump when the output of render_image changes so cached ETags are invalidated
+RENDER_VERSION = 1
+
+
+def qr_target(path, base_url=None):
+    """Return the absolute URL encoded in a QR for an app ``path``."""
+    if base_url is None:
+        base_url = getattr(settings, 'SITE_BASE_URL', '')
+    return (base_url.rstrip('/') if base_url else '') + path
+
+
+def render_png(data, box_size=10, border=4):
+    """Encode ``data`` as a QR code and return the PNG bytes."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color='black', back_color='white')
+    bio = BytesIO()
+    img.save(bio, format='PNG')
+    return bio.getvalue()
+
+
+def qr_matrix(data):
+    """Return the QR module matrix for ``data`` as a tuple of row strings ('1' = dark)."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return tuple(''.join('1' if cell else '0' for cell in row) for row in qr.get_matrix())
+
+
+def matrix_svg(matrix, size=DEFAULT_SIZE, border=DEFAULT_BORDER):
+    """Render ``matrix`` as a standalone SVG document ``size`` pixels wide."""
+    n = len(matrix) + 2 * border
+    runs = []
+    for r, row in enumerate(matrix):
+        c = 0
+        while c < len(row):
+            if row[c] != '1':
+                c += 1
+                continue
+            start = c
+            while c < len(row) and row[c] == '1':
+                c += 1
+            runs.append(f'M{start + border} {r + border}h{c - start}v1h-{c - start}z')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(runs)}"/></svg>'
+    ).encode('utf-8')
+
+
+def matrix_png(matrix, size=DEFAULT_SIZE, border=DEFAULT_BORDER):
+    """Render ``matrix`` as a PNG of at most ``size`` pixels (whole pixels per module)."""
+    from PIL import Image
+
+    n = len(matrix) + 2 * border
+    scale = max(1, size // n)
+    blank = '0' * border
+    rows = ['0' * n] * border + [blank + row + blank for row in matrix] + ['0' * n] * border
+    pixels = bytes(0 if cell == '1' else 255 for row in rows for cell in row)
+    img = Image.frombytes('L', (n, n), pixels).resize((n * scale, n * scale), Image.NEAREST).convert('1')
+    bio = BytesIO()
+    img.save(bio, format='PNG', optimize=True)
+    return bio.getvalue()
+
+
+def image_etag(data, fmt, size):
+    """Content hash identifying the image ``render_image`` returns for these inputs."""
+    key = f'{RENDER_VERSION}:{fmt}:{size}:{data}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def render_image(data, fmt='svg', size=DEFAULT_SIZE):
+    """Render ``data`` as ``fmt`` ('svg' or 'png') at ``size`` pixels."""
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f'unsupported image format: {fmt}')
+    matrix = qr_matrix(data)
+    if fmt == 'svg':
+        return matrix_svg(matrix, size)
+    return matrix_png(matrix, size)
+
+
+@lru_cache(maxsize=1024)
+def render_cached(data, fmt='svg', size=DEFAULT_SIZE):
+    """``render_image`` behind a per-process LRU (hot codes render once per worker)."""
+    return render_image(data, fmt, size)
+
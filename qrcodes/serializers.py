@@ -5,6 +5,7 @@ from .models import QRCode
 class QRCodeSerializer(serializers.ModelSerializer):
     tree = serializers.StringRelatedField(read_only=True)
     site = serializers.StringRelatedField(read_only=True)
+    image_url = serializers.CharField(read_only=True)
 
     class Meta:
         model = QRCode
@@ -15,3 +16,16 @@ class GenerateQRCodeSerializer(serializers.Serializer):
     tree_id = serializers.CharField(required=False)
     site_id = serializers.IntegerField(required=False)
     label = serializers.CharField(required=False)
+
+
+class LabelSheetSerializer(serializers.Serializer):
+    tree_ids = serializers.ListField(child=serializers.CharField(), required=False)
+    campaign = serializers.IntegerField(required=False)
+    beneficiary = serializers.IntegerField(required=False)
+    columns = serializers.IntegerField(required=False, min_value=1, max_value=8, default=4)
+    rows = serializers.IntegerField(required=False, min_value=1, max_value=12, default=6)
+
+    def validate(self, attrs):
+        if not (attrs.get('tree_ids') or attrs.get('campaign') or attrs.get('beneficiary')):
+            raise serializers.ValidationError('provide tree_ids, campaign or beneficiary')
+        return attrs
@@ -1,13 +1,24 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from beneficiaries.models import PlantingSite
+from core.bulk import defer, delete_files
 from .models import QRCode
 
 
 @receiver(post_delete, sender=QRCode)
 def delete_qrcode_image(sender, instance, **kwargs):
     """Remove the QRCode.image file from storage when a QRCode is deleted."""
+    if instance.image:
+        defer(delete_files, [(instance.image.storage, instance.image.name)])
+
+
+@receiver(post_save, sender=PlantingSite)
+def queue_qrcode_for_site(sender, instance, created, **kwargs):
+    """Queue QR rendering for new planting sites; nothing is rendered inline."""
+    if not created:
+        return
     try:
-        if instance.image:
-            instance.image.delete(save=False)
+        from .tasks import queue_qr_render
+        defer(queue_qr_render)
     except Exception:
         pass
@@ -0,0 +1,126 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+
+from .models import QRCode
+from .rendering import qr_target, render_png
+
+
+# set while a render task is queued so a burst of saves queues it only once
+RENDER_QUEUED_KEY = 'qrcodes:render:queued'
+RENDER_QUEUED_TTL = 60
+
+
+def store_images():
+    """Whether QR PNGs are rendered into media storage (``QR_STORE_IMAGES``)."""
+    return getattr(settings, 'QR_STORE_IMAGES', True)
+
+
+def queue_qr_render():
+    """Ask a worker to render pending QR images once the transaction commits.
+
+    Saves only call this; they never render inline.
+    """
+    def _enqueue():
+        if not cache.add(RENDER_QUEUED_KEY, 1, RENDER_QUEUED_TTL):
+            return
+        try:
+            render_pending_qrcodes.delay()
+        except Exception:
+            # the periodic sweep will get to it
+            cache.delete(RENDER_QUEUED_KEY)
+
+    transaction.on_commit(_enqueue)
+
+
+def ensure_qrcode_records(batch_size=500):
+    """Create the canonical QRCode row for trees and sites that lack one."""
+    from trees.models import Tree
+    from beneficiaries.models import PlantingSite
+
+    created = 0
+    while True:
+        trees = list(Tree.objects.filter(qrcode__isnull=True).values_list('pk', 'tree_id')[:batch_size])
+        if not trees:
+            break
+        codes = QRCode.objects.bulk_create([QRCode(tree_id=pk, label=str(tree_id)) for pk, tree_id in trees],
+                                           ignore_conflicts=True)
+        # rows dropped as conflicts (another writer linked the tree first) aren't counted
+        created += QRCode.objects.filter(pk__in=[code.pk for code in codes]).count()
+    while True:
+        sites = list(PlantingSite.objects.filter(qrcode__isnull=True).values_list('pk', flat=True)[:batch_size])
+        if not sites:
+            break
+        codes = QRCode.objects.bulk_create([QRCode(site_id=pk) for pk in sites], ignore_conflicts=True)
+        created += QRCode.objects.filter(pk__in=[code.pk for code in codes]).count()
+    return created
+
+
+def render_qrcode_batch(qrcodes, base_url=None):
+    """Render and store images for ``qrcodes`` and write the names in bulk.
+
+    Tree-linked codes also become the tree's ``qr_image`` so each tree has a
+    single canonical image.
+    """
+    from trees.models import Tree
+
+    if not qrcodes:
+        return 0
+    images = [render_png(qr_target(q.get_scan_path(), base_url)) for q in qrcodes]
+    trees = []
+    for q, png in zip(qrcodes, images):
+        q.image.save(f'{q.pk}.png', ContentFile(png), save=False)
+        if q.tree_id:
+            trees.append(Tree(pk=q.tree_id, qr_image=q.image.name))
+    with transaction.atomic():
+        QRCode.objects.bulk_update(qrcodes, ['image'])
+        if trees:
+            Tree.objects.bulk_update(trees, ['qr_image'])
+    return len(qrcodes)
+
+
+@shared_task
+def render_pending_qrcodes(batch_size=500, max_batches=20):
+    """Render every QRCode that has no stored image yet, batch by batch.
+
+    With ``QR_STORE_IMAGES`` off only the QRCode records are created; images
+    are served by the on-demand endpoint.
+    """
+    cache.delete(RENDER_QUEUED_KEY)
+    created = ensure_qrcode_records(batch_size)
+    if not store_images():
+        return {'created': created, 'rendered': 0}
+    rendered = 0
+    for _ in range(max_batches):
+        batch = list(QRCode.objects.filter(Q(image__isnull=True) | Q(image='')).order_by('created_at')[:batch_size])
+        if not batch:
+            break
+        rendered += render_qrcode_batch(batch)
+    else:
+        # more work left than one run is allowed to take; continue in a new task
+        queue_qr_render()
+    return {'created': created, 'rendered': rendered}
+
+
+@shared_task
+def flush_scan_counts():
+    """Write cache-buffered scan counts to the QRCode rows."""
+    from .counters import flush_scan_counts as _flush
+    return _flush()
+
+
+@shared_task
+def flush_scan_events():
+    """Batch-insert buffered scan events and roll them up into buckets."""
+    from .analytics import flush_scan_events as _flush
+    return {'inserted': _flush()}
+
+
+@shared_task
+def prune_scan_events(retention_days=None):
+    """Delete raw scan events that are rolled up and past retention."""
+    from .analytics import prune_scan_events as _prune
+    return {'deleted': _prune(retention_days)}
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from qrcodes.labels import write_label_sheet
+from qrcodes.models import QRCode
+from trees.models import Tree, TreeCampaign
+
+
+class LabelSheetTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Label School', type='school')
+        other = Beneficiary.objects.create(name='Other School', type='school')
+        self.campaign = TreeCampaign.objects.create(name='Long rains')
+        for i in range(30):
+            Tree.objects.create(tree_id=f'L-{i:03d}', planting_date='2024-03-01', beneficiary=self.ben, campaign=self.campaign)
+        Tree.objects.create(tree_id='X-001', planting_date='2024-03-01', beneficiary=other)
+        user = get_user_model().objects.create_user('officer', 'o@example.com', 'pass')
+        self.client.force_login(user)
+
+    def test_campaign_sheet_creates_missing_codes(self):
+        resp = self.client.post('/api/qrcodes/labels/', {'campaign': self.campaign.pk}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        pdf = b''.join(resp.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(QRCode.objects.filter(tree__campaign=self.campaign).count(), 30)
+        self.assertFalse(QRCode.objects.filter(tree__tree_id='X-001').exists())
+
+    def test_page_count_follows_layout(self):
+        from io import BytesIO
+        from qrcodes.labels import label_qrcodes
+        entries = label_qrcodes(beneficiary=self.ben.pk)
+        self.assertEqual([caption for _, caption in entries][:2], ['L-000', 'L-001'])
+        self.assertEqual(write_label_sheet(BytesIO(), entries, columns=4, rows=6), 2)
+        self.assertEqual(write_label_sheet(BytesIO(), entries, columns=5, rows=6), 1)
+
+    def test_requires_a_selection(self):
+        resp = self.client.post('/api/qrcodes/labels/', {}, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post('/api/qrcodes/labels/', {'tree_ids': ['NOPE']}, content_type='application/json')
+        self.assertEqual(resp.status_code, 404)
@@ -1,17 +1,199 @@
-from django.test import TestCase
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from beneficiaries.models import Beneficiary
+from qrcodes.counters import PENDING_TIMEOUT, SCAN_LOG, flush_scan_counts, pending_scans
 from qrcodes.models import QRCode
 from trees.models import Tree
 
 
+@override_settings(QR_SCAN_BUFFER=True)
 class QRScanTest(TestCase):
     def setUp(self):
-        t = Tree.objects.create(tree_id='T-100')
+        cache.clear()
+        ben = Beneficiary.objects.create(name='Scan School', type='school')
+        t = Tree.objects.create(tree_id='T-100', planting_date='2024-01-01', beneficiary=ben)
         self.qr = QRCode.objects.create(tree=t, label='TestQR')
 
     def test_increment_scan_via_view(self):
         url = reverse('qrcode-scan', kwargs={'pk': str(self.qr.pk)})
         resp = self.client.get(url)
-        # after redirect or response, refresh and check scan_count
+        self.assertEqual(resp.status_code, 302)
+        # scans are buffered in the cache until the periodic flush
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.scan_count, 0)
+        flush_scan_counts()
         self.qr.refresh_from_db()
         self.assertGreaterEqual(self.qr.scan_count, 1)
+        self.assertIsNotNone(self.qr.last_scanned)
+
+    def test_scans_are_aggregated_into_one_update(self):
+        url = reverse('qrcode-scan', kwargs={'pk': str(self.qr.pk)})
+        for _ in range(5):
+            self.client.get(url)
+        self.assertEqual(pending_scans(self.qr.pk), 5)
+        with self.assertNumQueries(1):
+            # a single aggregated UPDATE is all the flush costs per code
+            result = flush_scan_counts()
+        self.assertEqual(result, {'codes': 1, 'scans': 5})
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.scan_count, 5)
+        self.assertEqual(pending_scans(self.qr.pk), 0)
+        # a second flush has nothing left to apply
+        self.assertEqual(flush_scan_counts(), {'codes': 0, 'scans': 0})
+
+    def test_lost_registration_is_recovered_when_the_pending_flag_expires(self):
+        url = reverse('qrcode-scan', kwargs={'pk': str(self.qr.pk)})
+        self.client.get(url)
+        # the code's slot is evicted before a flush reaches it: waited for once, then skipped
+        cache.delete(f'{SCAN_LOG}:slot:1')
+        flush_scan_counts()
+        self.assertEqual(flush_scan_counts(), {'codes': 0, 'scans': 0})
+        self.assertEqual(pending_scans(self.qr.pk), 1)
+        with mock.patch('time.time', return_value=time.time() + PENDING_TIMEOUT + 1):
+            self.client.get(url)
+            self.assertEqual(flush_scan_counts(), {'codes': 1, 'scans': 2})
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.scan_count, 2)
+
+    @override_settings(QR_SCAN_BUFFER=None)
+    def test_process_local_cache_counts_on_the_row(self):
+        # LocMem is private to each worker; a buffer there is never flushed
+        import datetime
+        from django.utils import timezone
+        from qrcodes.analytics import flush_scan_events
+        from qrcodes.counters import record_scan
+        earlier = timezone.now() - datetime.timedelta(minutes=1)
+        with self.assertNumQueries(1):
+            # one INSERT: no lock, no rollup and no UPDATE of the code's row
+            record_scan(self.qr.pk, earlier)
+        for _ in range(2):
+            record_scan(self.qr.pk, earlier)
+        # too recent to be rolled up: its id may not be committed in order yet
+        self.client.get(reverse('qrcode-scan', kwargs={'pk': str(self.qr.pk)}))
+        self.assertEqual(pending_scans(self.qr.pk), 0)
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.scan_count, 0)
+        flush_scan_events()
+        self.qr.refresh_from_db()
+        self.assertEqual((self.qr.scan_count, self.qr.last_scanned), (3, earlier))
+        flush_scan_events()
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.scan_count, 3)
+
+
+@override_settings(QR_SCAN_BUFFER=True)
+class QRScanAnalyticsTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        cache.clear()
+        ben = Beneficiary.objects.create(name='Scan School', type='school')
+        t = Tree.objects.create(tree_id='T-200', planting_date='2024-01-01', beneficiary=ben)
+        self.qr = QRCode.objects.create(tree=t, label='Busy sign')
+        self.quiet = QRCode.objects.create(label='Quiet sign')
+        self.user = get_user_model().objects.create_user('viewer', 'v@example.com', 'pass')
+
+    def _scan(self, qr, when):
+        from qrcodes.counters import record_scan
+        record_scan(qr.pk, when, 'test-agent')
+
+    def test_events_are_batch_inserted_and_rolled_up(self):
+        import datetime
+        from django.utils import timezone
+        from qrcodes.analytics import flush_scan_events, prune_scan_events
+        from qrcodes.models import QRScanBucket, QRScanEvent
+        base = (timezone.now() - datetime.timedelta(days=40)).replace(hour=10, minute=5, second=0, microsecond=0)
+        for i in range(3):
+            self._scan(self.qr, base + datetime.timedelta(minutes=i))
+        self._scan(self.qr, base + datetime.timedelta(hours=1))
+        self._scan(self.quiet, base)
+        self.assertEqual(flush_scan_events(), 5)
+        self.assertEqual(QRScanEvent.objects.count(), 5)
+        hours = QRScanBucket.objects.filter(qrcode=self.qr, granularity='hour').order_by('bucket_start')
+        self.assertEqual([b.count for b in hours], [3, 1])
+        self.assertEqual(QRScanBucket.objects.get(qrcode=self.qr, granularity='day').count, 4)
+        # further scans add to the existing buckets instead of duplicating them
+        self._scan(self.qr, base)
+        flush_scan_events()
+        self.assertEqual(QRScanBucket.objects.filter(qrcode=self.qr, granularity='hour').order_by('bucket_start').first().count, 4)
+        # rolled-up events past retention are pruned, buckets stay
+        self.assertEqual(prune_scan_events(retention_days=30), 6)
+        self.assertFalse(QRScanEvent.objects.exists())
+        self.assertTrue(QRScanBucket.objects.filter(qrcode=self.qr).exists())
+
+    def test_series_and_top_endpoints(self):
+        from django.utils import timezone
+        from qrcodes.analytics import flush_scan_events
+        now = timezone.now()
+        for _ in range(3):
+            self._scan(self.qr, now)
+        self._scan(self.quiet, now)
+        flush_scan_events()
+        self.client.force_login(self.user)
+        resp = self.client.get('/api/qrcodes/%s/scans/?granularity=hour' % self.qr.pk)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['total'], 3)
+        resp = self.client.get('/api/qrcodes/top/')
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()['results']
+        self.assertEqual(results[0]['qrcode'], str(self.qr.pk))
+        self.assertEqual(results[0]['scans'], 3)
+        self.assertEqual(results[0]['tree_id'], 'T-200')
+        for limit in ('0', '-1', 'x'):
+            self.assertEqual(self.client.get('/api/qrcodes/top/', {'limit': limit}).status_code, 400)
+
+    @override_settings(QR_SCAN_BUFFER=None)
+    def test_process_local_cache_writes_events_directly(self):
+        import datetime
+        from django.utils import timezone
+        from qrcodes.analytics import flush_scan_events
+        from qrcodes.models import QRScanEvent
+        earlier = timezone.now() - datetime.timedelta(minutes=1)
+        for _ in range(2):
+            self._scan(self.qr, earlier)
+        self.assertEqual(QRScanEvent.objects.count(), 2)
+        # nothing is left in a worker-private buffer; the stored events are rolled up
+        self.assertEqual(flush_scan_events(), 0)
+        self.client.force_login(self.user)
+        resp = self.client.get('/api/qrcodes/%s/scans/?granularity=hour' % self.qr.pk)
+        self.assertEqual(resp.json()['total'], 2)
+
+
+@override_settings(QR_STORE_IMAGES=False)
+class QRImageViewTest(TestCase):
+    def setUp(self):
+        self.qr = QRCode.objects.create(label='On demand')
+
+    def test_svg_and_png_render_with_cache_headers(self):
+        resp = self.client.get(self.qr.get_image_url('svg'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'image/svg+xml')
+        self.assertTrue(resp.content.startswith(b'<svg'))
+        self.assertIn('max-age', resp['Cache-Control'])
+        etag = resp['ETag']
+        again = self.client.get(self.qr.get_image_url('svg'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+
+        png = self.client.get(self.qr.get_image_url('png', size=200))
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertNotEqual(png['ETag'], etag)
+
+    def test_unknown_code_or_format_is_404(self):
+        import uuid
+        from django.urls import reverse
+        self.assertEqual(self.client.get(reverse('qrcode-image', kwargs={'pk': uuid.uuid4(), 'fmt': 'svg'})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('qrcode-image', kwargs={'pk': self.qr.pk, 'fmt': 'gif'})).status_code, 404)
+
+    def test_nothing_is_stored(self):
+        from qrcodes.tasks import render_pending_qrcodes
+        ben = Beneficiary.objects.create(name='No Store School', type='school')
+        Tree.objects.create(tree_id='T-300', planting_date='2024-01-01', beneficiary=ben)
+        result = render_pending_qrcodes()
+        self.assertEqual(result['rendered'], 0)
+        qr = QRCode.objects.get(tree__tree_id='T-300')
+        self.assertFalse(qr.image)
+        self.assertEqual(qr.image_url, qr.get_image_url('png'))
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QRCodeViewSet, qrcode_scan_view, qrcodes_list_view, qrcodes_generate_view, qrcodes_detail_view
+from .views import QRCodeViewSet, qrcode_scan_view, qrcode_image_view, qrcodes_list_view, qrcodes_generate_view, qrcodes_detail_view
 
 router = DefaultRouter()
 router.register(r'', QRCodeViewSet, basename='qrcodes')
@@ -9,6 +9,7 @@ urlpatterns = [
     path('scan/<uuid:pk>/', qrcode_scan_view, name='qrcode-scan'),
     # alias used by templates (underscore vs hyphen)
     path('scan/<uuid:pk>/', qrcode_scan_view, name='qrcode_scan'),
+    path('image/<uuid:pk>.<str:fmt>', qrcode_image_view, name='qrcode-image'),
     path('', include(router.urls)),
     # Web UI fallbacks
     path('web/list/', qrcodes_list_view, name='qrcodes_list'),
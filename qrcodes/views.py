@@ -1,10 +1,20 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.conf import settings
+from django.utils.cache import patch_cache_control
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import tempfile
 from .models import QRCode
-from .serializers import QRCodeSerializer, GenerateQRCodeSerializer
+from .counters import record_scan
+from .tasks import store_images
+from . import analytics
+from .rendering import DEFAULT_SIZE, IMAGE_FORMATS, MAX_SIZE, MIN_SIZE, image_etag, qr_target, render_cached
+from .serializers import QRCodeSerializer, GenerateQRCodeSerializer, LabelSheetSerializer
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 
@@ -33,32 +43,122 @@ class QRCodeViewSet(viewsets.ModelViewSet):
                 site = PlantingSite.objects.get(pk=data['site_id'])
             except PlantingSite.DoesNotExist:
                 site = None
-        qr = QRCode.objects.create(tree=tree, site=site, label=data.get('label',''))
-        qr.generate_image(request.build_absolute_uri('/'))
-        qr.save()
+        if tree is not None:
+            # a tree has one canonical code; hand back the existing one
+            qr, created = QRCode.objects.get_or_create(tree=tree, defaults={'site': site, 'label': data.get('label', '')})
+            if not created:
+                return Response(QRCodeSerializer(qr).data, status=status.HTTP_200_OK)
+        elif site is not None:
+            # so does a site
+            qr, created = QRCode.objects.get_or_create(site=site, tree=None, defaults={'label': data.get('label', '')})
+            if not created:
+                return Response(QRCodeSerializer(qr).data, status=status.HTTP_200_OK)
+        else:
+            qr = QRCode.objects.create(label=data.get('label',''))
+        if store_images():
+            qr.generate_image(request.build_absolute_uri('/'))
+            qr.save()
         return Response(QRCodeSerializer(qr).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['get'], url_path='scans')
+    def scans(self, request, pk=None):
+        """Scan time series for one code, read from the hourly/daily rollups.
+
+        Query params: ``granularity`` (hour|day, default day), ``since`` and
+        ``until`` (ISO dates/datetimes; default the last 30 days).
+        """
+        qr = self.get_object()
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ('hour', 'day'):
+            return Response({'detail': 'granularity must be hour or day'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since, until = _parse_window(request, default_days=30)
+        except ValueError:
+            return Response({'detail': 'invalid since/until'}, status=status.HTTP_400_BAD_REQUEST)
+        series = analytics.scan_series(qr.pk, granularity, since, until)
+        return Response({
+            'qrcode': str(qr.pk),
+            'granularity': granularity,
+            'since': since,
+            'until': until,
+            'total': sum(p['count'] for p in series),
+            'series': series,
+        })
+
+    @action(detail=False, methods=['get'], url_path='top')
+    def top(self, request):
+        """Most scanned codes over a window (default the last 30 days)."""
+        try:
+            since, until = _parse_window(request, default_days=30)
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+            if limit < 1:
+                raise ValueError('limit must be positive')
+        except ValueError:
+            return Response({'detail': 'invalid parameters'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'since': since, 'until': until, 'results': analytics.top_scanned(since, until, limit)})
+
+    @action(detail=False, methods=['post'], url_path='labels')
+    def labels(self, request):
+        """Printable PDF of QR labels for a campaign, a beneficiary or a list of tree ids.
+
+        Body: ``tree_ids`` (list), ``campaign``, ``beneficiary`` (filters are
+        combined), optional ``columns``/``rows`` per A4 page.
+        """
+        ser = LabelSheetSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        try:
+            from .labels import label_qrcodes, write_label_sheet
+            import reportlab  # noqa: F401
+        except Exception:
+            return Response({'detail': 'reportlab is not available on server'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = label_qrcodes(data.get('tree_ids'), data.get('campaign'), data.get('beneficiary'))
+        if not entries:
+            return Response({'detail': 'no trees match the selection'}, status=status.HTTP_404_NOT_FOUND)
+        # spill to disk past a few MB so large sheets aren't held in memory
+        out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        write_label_sheet(out, entries, data['columns'], data['rows'], request.build_absolute_uri('/'), title='QR labels')
+        out.seek(0)
+        return FileResponse(out, as_attachment=True, filename='qr-labels.pdf', content_type='application/pdf')
+
     @action(detail=True, methods=['get'], url_path='download')
     def download(self, request, pk=None):
         qr = self.get_object()
-        if not qr.image:
-            qr.generate_image(request.build_absolute_uri('/'))
-            qr.save()
-        return redirect(qr.image.url)
+        if qr.image:
+            return redirect(qr.image.url)
+        # nothing stored: hand out the on-demand rendering instead
+        return redirect(qr.get_image_url('png'))
+
+
+def _parse_window(request, default_days):
+    """Read ``since``/``until`` query params as aware datetimes."""
+    until = _parse_moment(request.query_params.get('until'))
+    since = _parse_moment(request.query_params.get('since'))
+    if since is None:
+        since = (until or timezone.now()) - timedelta(days=default_days)
+    return since, until
+
+
+def _parse_moment(value):
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
 
 
 @api_view(['GET'])
 def qrcode_scan_view(request, pk):
-    # public endpoint — log scan and redirect to a friendly view
-    qr = get_object_or_404(QRCode, pk=pk)
+    # public endpoint — count the scan (buffered in a shared cache and flushed
+    # to the row by qrcodes.tasks.flush_scan_counts) and redirect to a friendly view
+    qr = get_object_or_404(QRCode.objects.select_related('tree', 'site'), pk=pk)
     now = timezone.now()
     try:
-        qr.increment_scan(now)
+        record_scan(qr.pk, now, request.META.get('HTTP_USER_AGENT', ''))
     except Exception:
-        # fallback: increment in-memory
-        qr.scan_count = (qr.scan_count or 0) + 1
-        qr.last_scanned = now
-        qr.save()
+        # cache unavailable: fall back to a direct row update
+        qr.increment_scan(now)
     # redirect to a public info page (could be same app)
     if qr.tree:
         return redirect(qr.tree.get_absolute_url())
@@ -68,6 +168,37 @@ def qrcode_scan_view(request, pk):
     return render(request, 'qrcodes/qrcode_scan_result.html', {'qr': qr})
 
 
+def qrcode_image_view(request, pk, fmt):
+    """Public SVG/PNG rendering of a QR code, sized by ``?size=`` (pixels).
+
+    The output only depends on the scan URL, so responses carry a content-hash
+    ETag and a long ``Cache-Control``; repeat requests are answered with 304
+    before anything is rendered.
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise Http404
+    try:
+        size = int(request.GET.get('size', DEFAULT_SIZE))
+    except ValueError:
+        size = DEFAULT_SIZE
+    size = max(MIN_SIZE, min(size, MAX_SIZE))
+    if not QRCode.objects.filter(pk=pk).exists():
+        raise Http404
+    data = qr_target(reverse('qrcode-scan', kwargs={'pk': str(pk)}), _image_base_url(request))
+    etag = '"%s"' % image_etag(data, fmt, size)
+    if etag in [t.strip() for t in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render_cached(data, fmt, size), content_type=IMAGE_FORMATS[fmt])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'QR_IMAGE_MAX_AGE', 7 * 24 * 3600))
+    return response
+
+
+def _image_base_url(request):
+    return getattr(settings, 'SITE_BASE_URL', '') or request.build_absolute_uri('/')
+
+
 @login_required
 def qrcodes_list_view(request):
     # simple paginated list for web UI
@@ -87,6 +218,8 @@ def qrcodes_generate_view(request):
         site_id = request.POST.get('site_id')
         label = request.POST.get('label')
         qr = QRCode.objects.create(label=label)
+        if not store_images():
+            return render(request, 'qrcodes/qrcodes_generate.html', {'generated_qrcode': qr})
         try:
             qr.generate_image(request.build_absolute_uri('/'))
             qr.save()
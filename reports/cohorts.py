@@ -0,0 +1,210 @@
+"""Survival curves by planting cohort.
+
+A cohort is a planting month x species x beneficiary type (or any subset of
+those dimensions). Each tree is followed from its planting month until it
+died (``Tree.status == 'dead'``) or until now; the death month is the
+first TreeUpdate that recorded it dead, else ``replaced_date``, else the
+tree's last update, else the current month. Curves are Kaplan-Meier
+estimates at monthly ages, so young cohorts only contribute to the ages
+they have actually reached.
+
+Trees are fetched already counted per distinct (planting date, species,
+beneficiary[, death dates]) -- plantings happen in batches, so that is far
+fewer rows than trees. The columns become NumPy arrays and are grouped
+with weighted ``bincount`` over a flat cohort x age index, with no
+per-tree Python loop.
+Results are cached per cohort key (dimensions + filters) in the ``reports``
+cache namespace for ``REPORTS_COHORT_CACHE_TTL`` seconds, and dropped as
+soon as trees change (core.nscache).
+"""
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from beneficiaries.models import Beneficiary
+from core import nscache
+from trees.models import Tree, TreeSpecies
+from trees.carbon import with_death_dates
+
+
+DIMENSIONS = ('month', 'species', 'beneficiary_type')
+DEFAULT_MAX_AGE = 60
+CACHE_PREFIX = 'cohorts:'
+
+
+def _month(date):
+    return date.year * 12 + date.month - 1
+
+
+def _months(dates):
+    """Dates (None allowed) to month numbers (year * 12 + month - 1); missing = -1."""
+    return np.fromiter((-1 if d is None else _month(d) for d in dates), dtype=np.int64, count=len(dates))
+
+
+def _ints(values):
+    return np.array(values, dtype=np.int64)
+
+
+def _trees(species=None, beneficiary_type=None, start=None, end=None):
+    qs = Tree.objects.all()
+    if species is not None:
+        qs = qs.filter(species_id=species)
+    if beneficiary_type is not None:
+        qs = qs.filter(beneficiary__type=beneficiary_type)
+    if start is not None:
+        qs = qs.filter(planting_date__gte=start)
+    if end is not None:
+        qs = qs.filter(planting_date__lte=end)
+    return qs.annotate(_species=Coalesce('species_id', Value(-1)))
+
+
+def _living_columns(qs):
+    """(planted month, species, beneficiary, count) per distinct planting."""
+    rows = list(
+        qs.exclude(status='dead')
+        .values('planting_date', '_species', 'beneficiary_id')
+        .annotate(n=Count('id'))
+        .order_by()
+        .values_list('planting_date', '_species', 'beneficiary_id', 'n')
+    )
+    if not rows:
+        return [np.empty(0, dtype=np.int64)] * 4
+    planted, species, ben, count = zip(*rows)
+    return _months(planted), _ints(species), _ints(ben), _ints(count)
+
+
+def _dead_columns(qs):
+    """(planted month, species, beneficiary, death month, count) per distinct death."""
+    rows = list(
+        with_death_dates(qs.filter(status='dead'))
+        .values('planting_date', '_species', 'beneficiary_id', 'replaced_date', '_first_dead', '_last_update')
+        .annotate(n=Count('id'))
+        .order_by()
+        .values_list('planting_date', '_species', 'beneficiary_id', 'replaced_date', '_first_dead', '_last_update', 'n')
+    )
+    if not rows:
+        return [np.empty(0, dtype=np.int64)] * 5
+    planted, species, ben, replaced, first_dead, last, count = zip(*rows)
+    first_dead, replaced, last = _months(first_dead), _months(replaced), _months(last)
+    death = np.where(first_dead >= 0, first_dead, np.where(replaced >= 0, replaced, last))
+    return _months(planted), _ints(species), _ints(ben), death, _ints(count)
+
+
+def _lookup(keys, values, wanted, missing=-1):
+    """Vectorized ``dict(zip(keys, values)).get(w, missing)`` for sorted ``keys``."""
+    out = np.full(len(wanted), missing, dtype=np.int64)
+    if len(keys) == 0:
+        return out
+    pos = np.clip(np.searchsorted(keys, wanted), 0, len(keys) - 1)
+    hit = keys[pos] == wanted
+    out[hit] = values[pos[hit]]
+    return out
+
+
+def compute_cohorts(by=DIMENSIONS, species=None, beneficiary_type=None, start=None, end=None,
+                    max_age=DEFAULT_MAX_AGE, today=None):
+    """Survival curves for every cohort; see the module docstring.
+
+    Returns ``[{'planting_month'?, 'species_id'?, 'species'?,
+    'beneficiary_type'?, 'trees', 'dead', 'curve': {'age_months': [...],
+    'at_risk': [...], 'deaths': [...], 'survival': [...]}}]`` ordered by
+    cohort; curves are columnar, one entry per month of age.
+    """
+    today = today or timezone.localdate()
+    now = _month(today)
+    qs = _trees(species, beneficiary_type, start, end)
+    living = _living_columns(qs)
+    died = _dead_columns(qs)
+    planted, species_col, ben = (np.concatenate([a, b]) for a, b in zip(living[:3], died[:3]))
+    if len(planted) == 0:
+        return []
+    weight = np.concatenate([living[3], died[4]])
+    dead = np.concatenate([np.zeros(len(living[0]), dtype=bool), np.ones(len(died[0]), dtype=bool)])
+    end_month = np.concatenate([np.full(len(living[0]), now), np.where(died[3] >= 0, died[3], now)])
+    # ages past max_age land in one extra "survived the window" bin
+    age = np.clip(end_month - planted, 0, max_age + 1)
+
+    # cohort codes: mixed radix over the requested dimensions, most
+    # significant first, so np.unique also sorts the cohorts
+    dims = []
+    if 'month' in by:
+        dims.append(('month',) + np.unique(planted, return_inverse=True))
+    if 'species' in by:
+        dims.append(('species',) + np.unique(species_col, return_inverse=True))
+    if 'beneficiary_type' in by:
+        types = dict(Beneficiary.objects.values_list('id', 'type'))
+        names = sorted(set(types.values()))
+        position = {name: i for i, name in enumerate(names)}
+        ben_ids = np.array(sorted(types), dtype=np.int64)
+        type_codes = np.array([position[types[i]] for i in ben_ids.tolist()], dtype=np.int64)
+        dims.append(('beneficiary_type', np.array(names), _lookup(ben_ids, type_codes, ben, missing=0)))
+    code = np.zeros(len(planted), dtype=np.int64)
+    for _, values, inverse in dims:
+        code = code * len(values) + inverse
+    cohorts, group = np.unique(code, return_inverse=True)
+
+    bins = max_age + 2
+    flat = group * bins + age
+    size = len(cohorts) * bins
+    deaths = np.bincount(flat[dead], weights=weight[dead], minlength=size).astype(np.int64).reshape(-1, bins)
+    exits = np.bincount(flat, weights=weight, minlength=size).astype(np.int64).reshape(-1, bins)
+    # at risk at age a: every tree whose follow-up ends at a or later
+    at_risk = exits[:, ::-1].cumsum(axis=1)[:, ::-1]
+    hazard = np.divide(deaths, at_risk, out=np.zeros(deaths.shape), where=at_risk > 0)
+    survival = np.round(np.cumprod(1.0 - hazard, axis=1), 4)
+    first_planted = np.full(len(cohorts), np.iinfo(np.int64).max)
+    np.minimum.at(first_planted, group, planted)
+    totals = exits.sum(axis=1)
+    dead_totals = deaths.sum(axis=1)
+
+    species_names = dict(TreeSpecies.objects.values_list('id', 'name')) if 'species' in by else {}
+    results = []
+    for i, cohort in enumerate(cohorts.tolist()):
+        row = {}
+        for dim, values, _ in reversed(dims):
+            value = values[cohort % len(values)]
+            cohort //= len(values)
+            if dim == 'month':
+                row['planting_month'] = f'{value // 12:04d}-{value % 12 + 1:02d}'
+            elif dim == 'species':
+                row['species_id'] = None if value < 0 else int(value)
+                row['species'] = species_names.get(row['species_id'])
+            else:
+                row['beneficiary_type'] = str(value)
+        # ages the cohort's earliest plantings have reached
+        observed = min(max_age, now - int(first_planted[i]))
+        row['trees'] = int(totals[i])
+        row['dead'] = int(dead_totals[i])
+        ages = slice(0, max(observed, 0) + 1)
+        row['curve'] = {
+            'age_months': list(range(ages.stop)),
+            'at_risk': at_risk[i, ages].tolist(),
+            'deaths': deaths[i, ages].tolist(),
+            'survival': survival[i, ages].tolist(),
+        }
+        results.append(row)
+    return results
+
+
+def cohort_key(**params):
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return CACHE_PREFIX + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def survival_cohorts(by=DIMENSIONS, species=None, beneficiary_type=None, start=None, end=None,
+                     max_age=DEFAULT_MAX_AGE):
+    """Cached ``compute_cohorts``, keyed by the cohort definition and today's date."""
+    by = tuple(d for d in DIMENSIONS if d in by)
+    params = dict(by=by, species=species, beneficiary_type=beneficiary_type, start=start, end=end,
+                  max_age=max_age, today=timezone.localdate())
+    key = cohort_key(**params)
+    data = nscache.get(nscache.REPORTS, key)
+    if data is None:
+        data = compute_cohorts(**params)
+        nscache.set(nscache.REPORTS, key, data, getattr(settings, 'REPORTS_COHORT_CACHE_TTL', 900))
+    return data
@@ -1,5 +1,8 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from core import nscache
+from core.bulk import defer
+from monitoring.models import MonitoringReport
 from .models import GeneratedReport
 
 
@@ -11,3 +14,10 @@ def delete_report_file(sender, instance, **kwargs):
             instance.file.delete(save=False)
     except Exception:
         pass
+
+
+@receiver(post_save, sender=MonitoringReport)
+@receiver(post_delete, sender=MonitoringReport)
+def monitoring_report_changed(sender, instance, **kwargs):
+    """The report summary aggregates monitoring reports."""
+    defer(nscache.invalidate, [nscache.REPORTS])
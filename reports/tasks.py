@@ -16,6 +16,12 @@ def scheduled_generate_report(name, report_type='summary', filters=None):
     # here we just create a report entry
     rpt = GeneratedReport.objects.create(name=name, report_type=report_type, filters=filters or {})
     rpt.summary_text = f"Scheduled report generated at {timezone.now().isoformat()}"
+    from .views_api import _carbon_snapshot
+    snapshot = _carbon_snapshot()
+    if snapshot is not None:
+        from trees import carbon
+        rpt.metadata = {'carbon': carbon.summary(snapshot)}
+        rpt.summary_text += '\n' + carbon.summary_line(snapshot)
     rpt.save()
     return {'id': str(rpt.id), 'name': name}
 
@@ -0,0 +1,60 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from reports.cohorts import compute_cohorts
+from trees.models import Tree, TreeSpecies, TreeUpdate
+
+
+class SurvivalCohortTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        school = Beneficiary.objects.create(name='Cohort School', type='school')
+        church = Beneficiary.objects.create(name='Cohort Church', type='church')
+        self.acacia = TreeSpecies.objects.create(name='Acacia')
+        self.neem = TreeSpecies.objects.create(name='Neem')
+        trees = [
+            Tree.objects.create(tree_id=f'S{i}', species=self.acacia, planting_date='2024-01-10', beneficiary=school,
+                                status='dead' if i < 2 else 'alive')
+            for i in range(4)
+        ]
+        # died at 3 months (recorded by an update), and at 6 months (last seen)
+        TreeUpdate.objects.create(tree=trees[0], date=datetime.date(2024, 4, 2), status='dead')
+        TreeUpdate.objects.create(tree=trees[1], date=datetime.date(2024, 7, 20), status='alive')
+        Tree.objects.create(tree_id='C1', species=self.neem, planting_date='2024-02-01', beneficiary=church)
+
+    def test_kaplan_meier_curve_per_cohort(self):
+        cohorts = compute_cohorts(today=datetime.date(2024, 12, 15))
+        self.assertEqual(len(cohorts), 2)
+        first = cohorts[0]
+        self.assertEqual((first['planting_month'], first['species'], first['beneficiary_type']), ('2024-01', 'Acacia', 'school'))
+        self.assertEqual((first['trees'], first['dead']), (4, 2))
+        curve = first['curve']
+        self.assertEqual(curve['age_months'], list(range(12)))
+        self.assertEqual(curve['survival'][2], 1.0)
+        self.assertEqual((curve['at_risk'][3], curve['deaths'][3], curve['survival'][3]), (4, 1, 0.75))
+        self.assertEqual((curve['at_risk'][6], curve['survival'][6]), (3, 0.5))
+        self.assertEqual((curve['at_risk'][11], curve['survival'][11]), (2, 0.5))
+        self.assertEqual(cohorts[1]['beneficiary_type'], 'church')
+        self.assertEqual(len(cohorts[1]['curve']['survival']), 11)
+
+    def test_coarser_cohorts_and_filters(self):
+        by_species = compute_cohorts(by=('species',), today=datetime.date(2024, 12, 15))
+        self.assertEqual([(c['species'], c['trees']) for c in by_species], [('Acacia', 4), ('Neem', 1)])
+        self.assertNotIn('planting_month', by_species[0])
+        church = compute_cohorts(beneficiary_type='church', max_age=3, today=datetime.date(2024, 12, 15))
+        self.assertEqual(len(church), 1)
+        self.assertEqual(len(church[0]['curve']['survival']), 4)
+
+    def test_api_caches_per_cohort_key(self):
+        resp = self.client.get('/api/reports/survival/', {'by': 'species,month'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['by'], ['month', 'species'])
+        self.assertEqual(len(resp.json()['cohorts']), 2)
+        with self.assertNumQueries(0):
+            again = self.client.get('/api/reports/survival/', {'by': 'month,species'})
+        self.assertEqual(again.json(), resp.json())
+        self.assertEqual(self.client.get('/api/reports/survival/', {'by': 'region'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/survival/', {'max_age': '0'}).status_code, 400)
@@ -47,15 +47,22 @@ def report_overview(request):
         'recent_reports': recent_reports,
     }
     return render(request, 'reports/report_overview.html', context)
+import datetime
+
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from trees.models import Tree
+from django.db.models import Sum
+from trees.models import TreeStatsRollup
+from reports import cohorts
 
 @api_view(['GET'])
 def summary_stats(request):
-    total = Tree.objects.count()
-    alive = Tree.objects.filter(status='alive').count()
-    dead = Tree.objects.filter(status='dead').count()
+    by_status = dict(
+        TreeStatsRollup.objects.values_list('status').annotate(count=Sum('tree_count')).order_by()
+    )
+    total = sum(by_status.values())
+    alive = by_status.get('alive', 0)
+    dead = by_status.get('dead', 0)
     survival_rate = (alive / total * 100) if total else 0
     return Response({
         'total_trees': total,
@@ -63,3 +70,30 @@ def summary_stats(request):
         'dead': dead,
         'survival_rate_percent': round(survival_rate, 2),
     })
+
+
+@api_view(['GET'])
+def survival_cohorts(request):
+    """Survival-at-age curves per planting cohort (see reports.cohorts).
+
+    Query params: ``by`` (comma list of month, species, beneficiary_type;
+    default all three), ``species``, ``beneficiary_type``, ``planted_from``
+    and ``planted_to`` (YYYY-MM-DD) and ``max_age`` in months (1-240).
+    """
+    params = request.query_params
+    by = [d.strip() for d in params.get('by', ','.join(cohorts.DIMENSIONS)).split(',') if d.strip()]
+    unknown = sorted(set(by) - set(cohorts.DIMENSIONS))
+    if unknown:
+        return Response({'detail': f'unknown cohort dimensions: {", ".join(unknown)}'}, status=400)
+    try:
+        species = int(params['species']) if params.get('species') else None
+        start = datetime.date.fromisoformat(params['planted_from']) if params.get('planted_from') else None
+        end = datetime.date.fromisoformat(params['planted_to']) if params.get('planted_to') else None
+        max_age = int(params.get('max_age', cohorts.DEFAULT_MAX_AGE))
+        if not 1 <= max_age <= 240:
+            raise ValueError
+    except ValueError:
+        return Response({'detail': 'invalid species, planted_from, planted_to or max_age'}, status=400)
+    results = cohorts.survival_cohorts(by=by, species=species, beneficiary_type=params.get('beneficiary_type') or None,
+                                       start=start, end=end, max_age=max_age)
+    return Response({'by': [d for d in cohorts.DIMENSIONS if d in by], 'cohorts': results})
@@ -25,6 +25,15 @@ from .permissions import IsReportOwnerOrAdmin
 import base64
 
 
+def _carbon_snapshot():
+    """The latest CO2 snapshot (trees.carbon), or None if there is none yet."""
+    try:
+        from trees import carbon
+        return carbon.current_snapshot()
+    except Exception:
+        return None
+
+
 class GeneratedReportViewSet(viewsets.ModelViewSet):
     queryset = GeneratedReport.objects.all()
     serializer_class = GeneratedReportSerializer
@@ -46,10 +55,18 @@ class GeneratedReportViewSet(viewsets.ModelViewSet):
         from reports.views import summary_stats
         # call summary stats view directly (returns DRF Response)
         resp = summary_stats(request._request)
-        content = json.dumps(resp.data, default=str, indent=2).encode('utf-8')
+        snapshot = _carbon_snapshot()
+        payload = dict(resp.data)
+        summary_lines = [f"Generated at {timezone.now().isoformat()}"]
+        if snapshot is not None:
+            from trees import carbon
+            payload['carbon'] = dict(carbon.summary(snapshot), by_campaign=snapshot.by_campaign, by_region=snapshot.by_region)
+            rpt.metadata = dict(rpt.metadata or {}, carbon=carbon.summary(snapshot))
+            summary_lines.append(carbon.summary_line(snapshot))
+        content = json.dumps(payload, default=str, indent=2).encode('utf-8')
         filename = f'{rpt.id}.json'
         rpt.set_file(filename, content)
-        rpt.summary_text = f"Generated at {timezone.now().isoformat()}"
+        rpt.summary_text = '\n'.join(summary_lines)
         rpt.save()
         return Response(GeneratedReportSerializer(rpt).data, status=status.HTTP_201_CREATED)
 
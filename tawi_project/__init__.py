@@ -1 +1,8 @@
 # tawi_project package
+
+# Load the Celery app when Django starts so @shared_task uses its settings
+# (broker, beat schedule, eager mode in tests).
+try:
+    from .celery import app as celery_app  # noqa: F401
+except Exception:
+    celery_app = None
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tawi_project.settings')
 app = Celery('tawi_project')
@@ -10,3 +11,21 @@ app.autodiscover_tasks()
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
+
+
+@worker_init.connect
+def require_shared_media(**kwargs):
+    """Refuse to start a production worker that can't see the web service's media.
+
+    Import uploads and rendered QR images live in media storage; on local
+    disk each service only sees its own files (see STORAGES in settings).
+    """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    if settings.DEBUG or settings.USE_S3 or settings.MEDIA_SHARED_FILESYSTEM:
+        return
+    raise ImproperlyConfigured(
+        'Celery workers need media storage shared with the web service: '
+        'set USE_S3=1 (with the AWS_* variables) or MEDIA_SHARED_FILESYSTEM=1.'
+    )
@@ -104,6 +104,8 @@ if any('test' in a for a in sys.argv):
     SECURE_SSL_REDIRECT = False
     SESSION_COOKIE_SECURE = False
     CSRF_COOKIE_SECURE = False
+    # run Celery tasks inline so tests don't need a broker
+    CELERY_TASK_ALWAYS_EAGER = True
 
 ROOT_URLCONF = 'tawi_project.urls'
 
@@ -168,7 +170,6 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # WhiteNoise: enable compressed static file serving and manifest caching when
 # running with collectstatic in production. Requires whitenoise in requirements.
 WHITENOISE_AUTOREFRESH = DEBUG
-STATICFILES_STORAGE = os.environ.get('STATICFILES_STORAGE', 'whitenoise.storage.CompressedManifestStaticFilesStorage' if not DEBUG else 'django.contrib.staticfiles.storage.StaticFilesStorage')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -207,9 +208,20 @@ CACHES = {
         'LOCATION': 'unique-snowflake',
     }
 }
+# The in-memory cache is per process: invalidations made by one gunicorn or
+# Celery worker (core.nscache) are not seen by the others. Set REDIS_URL to
+# share one cache between all of them.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
 
 # Celery settings (use Redis in production)
-CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 
 # Email backend for dev: console. Configure SMTP in production.
@@ -232,7 +244,43 @@ if crontab is not None:
             'task': 'trees.tasks.remind_missing_updates',
             'schedule': crontab(hour=7, minute=0),
             'args': (30,)
-        }
+        },
+        'resume-tree-imports': {
+            'task': 'trees.tasks.resume_tree_imports',
+            'schedule': crontab(minute='*/5'),
+        },
+        'render-pending-qrcodes': {
+            'task': 'qrcodes.tasks.render_pending_qrcodes',
+            'schedule': crontab(minute='*/5'),
+        },
+        'flush-qrcode-scan-counts': {
+            'task': 'qrcodes.tasks.flush_scan_counts',
+            'schedule': crontab(minute='*'),
+        },
+        'flush-qrcode-scan-events': {
+            'task': 'qrcodes.tasks.flush_scan_events',
+            'schedule': crontab(minute='*'),
+        },
+        'prune-qrcode-scan-events': {
+            'task': 'qrcodes.tasks.prune_scan_events',
+            'schedule': crontab(hour=3, minute=30),
+        },
+        'snapshot-carbon-daily': {
+            'task': 'trees.tasks.snapshot_carbon',
+            'schedule': crontab(hour=0, minute=30),
+        },
+        'reconcile-campaign-counters': {
+            'task': 'trees.tasks.reconcile_campaign_counters',
+            'schedule': crontab(minute=15),
+        },
+        'scan-duplicate-trees': {
+            'task': 'trees.tasks.scan_duplicate_trees',
+            'schedule': crontab(hour=2, minute=0),
+        },
+        'prune-sync-tombstones': {
+            'task': 'core.tasks.prune_sync_tombstones',
+            'schedule': crontab(hour=4, minute=0),
+        },
     }
 
 # Basic logging configuration - expand in production to use file handlers or external logging services
@@ -266,17 +314,70 @@ LOGGING['loggers']['accounts.role_changes'] = {
     'propagate': False,
 }
 
-# Optional S3 settings: enable by setting USE_S3=1 and providing AWS_* env vars
+# Media storage. Files are written by one process and read by another (tree
+# import uploads by the Celery worker, QR images rendered by the worker and
+# served by the web service), so processes on separate machines need shared
+# storage: S3 (USE_S3=1 with the AWS_* env vars) or a filesystem mounted at
+# MEDIA_ROOT by all of them (MEDIA_SHARED_FILESYSTEM=1). Production workers
+# refuse to start without one (tawi_project.celery).
+# Django 5.1+ only reads STORAGES (DEFAULT_FILE_STORAGE/STATICFILES_STORAGE
+# settings are ignored); the STATICFILES_STORAGE env var picks the static
+# backend, e.g. whitenoise.storage.CompressedManifestStaticFilesStorage.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': os.environ.get('STATICFILES_STORAGE', 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+MEDIA_SHARED_FILESYSTEM = os.environ.get('MEDIA_SHARED_FILESYSTEM') in ('1', 'true', 'True')
 USE_S3 = os.environ.get('USE_S3') in ('1', 'true', 'True')
 if USE_S3:
     INSTALLED_APPS += ['storages']
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    STORAGES['default'] = {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'}
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
     AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME', None)
     AWS_QUERYSTRING_AUTH = False
 
+# Buffer QR scans in the cache and flush them from Celery beat (qrcodes.counters).
+# Unset: buffer only when the cache is shared between processes (REDIS_URL).
+QR_SCAN_BUFFER = {'1': True, 'true': True, '0': False, 'false': False}.get(os.environ.get('QR_SCAN_BUFFER', '').lower())
+
+# Raw QR scan events are kept this many days after being rolled up into
+# hourly/daily buckets (see qrcodes.analytics.prune_scan_events).
+QR_SCAN_EVENT_RETENTION_DAYS = int(os.environ.get('QR_SCAN_EVENT_RETENTION_DAYS', 30))
+
+# QR images are rendered on demand (qrcodes.views.qrcode_image_view); storing
+# a PNG per QRCode/Tree in media storage is optional.
+QR_STORE_IMAGES = os.environ.get('QR_STORE_IMAGES', '1') in ('1', 'true', 'True')
+QR_IMAGE_MAX_AGE = int(os.environ.get('QR_IMAGE_MAX_AGE', 7 * 24 * 3600))
+
+# Carbon estimates (trees.carbon) for species without co2_estimate_kg_per_year;
+# unset means such trees count as zero.
+CARBON_DEFAULT_KG_PER_YEAR = float(os.environ['CARBON_DEFAULT_KG_PER_YEAR']) if os.environ.get('CARBON_DEFAULT_KG_PER_YEAR') else None
+
+# Cache-Control max-age (seconds) of the public campaign progress API
+CAMPAIGN_PROGRESS_MAX_AGE = int(os.environ.get('CAMPAIGN_PROGRESS_MAX_AGE', 60))
+
+# How long resolved replacement-chain roots (trees.lineage) stay cached, in seconds
+LINEAGE_ROOT_CACHE_TTL = int(os.environ.get('LINEAGE_ROOT_CACHE_TTL', 24 * 3600))
+
+# Rows fetched per database round trip by the tree CSV/XLSX export (trees.export)
+TREE_EXPORT_CHUNK_SIZE = int(os.environ.get('TREE_EXPORT_CHUNK_SIZE', 2000))
+
+# Delta sync feed (core.sync): how long tombstones (and so sync tokens) are
+# kept, and how old a change must be before it is served
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 2))
+
+# Trees of one beneficiary with the same species and planting date closer than
+# this (metres) are queued for review as likely duplicates (trees.dedup)
+DEDUP_DISTANCE_M = float(os.environ.get('DEDUP_DISTANCE_M', 10))
+
+# Survival cohort curves (reports.cohorts) are cached this many seconds.
+REPORTS_COHORT_CACHE_TTL = int(os.environ.get('REPORTS_COHORT_CACHE_TTL', 900))
+
 # Branding defaults used in report generation
 ORG_NAME = os.environ.get('ORG_NAME', 'Tawi Tree Planting')
 ORG_TAGLINE = os.environ.get('ORG_TAGLINE', 'Growing communities, one tree at a time')
@@ -511,11 +612,6 @@ if DJANGO_TEST_DB_NAME:
     DATABASES['default'].setdefault('TEST', {})
     DATABASES['default']['TEST']['NAME'] = DJANGO_TEST_DB_NAME
 
-    # Configure static files storage: use WhiteNoise storage in production when
-    # available and DEBUG is False. Users can override STATICFILES_STORAGE via env.
-    if not DEBUG:
-        STATICFILES_STORAGE = os.environ.get('STATICFILES_STORAGE', 'whitenoise.storage.CompressedManifestStaticFilesStorage')
-
 # When running under the test runner, some deployment security settings
 # (like SECURE_SSL_REDIRECT) may be enabled via environment. Those cause
 # API endpoints to redirect to HTTPS (301) and break API tests expecting
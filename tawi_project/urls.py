@@ -18,11 +18,11 @@ from accounts.views import (
     api_profile as accounts_api_profile,
 )
 from beneficiaries.views import BeneficiaryViewSet, PlantingSiteViewSet
-from trees.views import TreeViewSet, TreeUpdateViewSet, TreeSpeciesViewSet
+from trees.views import TreeViewSet, TreeUpdateViewSet, TreeSpeciesViewSet, TreeCampaignViewSet, TreeImportJobViewSet, DuplicateCandidateViewSet
 from monitoring.views import FollowUpViewSet
 from monitoring.views import MonitoringReportViewSet
 from feedback.views import FeedbackViewSet
-from reports.views import summary_stats
+from reports.views import summary_stats, survival_cohorts
 from reports import views as reports_views
 from reports.views_api import GeneratedReportViewSet
 from dashboard.views import (
@@ -39,7 +39,7 @@ from dashboard.views import (
     dashboard_project,
 )
 from core.views import core_dashboard, core_analytics, about as core_about
-from core.views_api import PostViewSet, SiteConfigViewSet
+from core.views_api import PostViewSet, SiteConfigViewSet, sync_changes
 from monitoring import views as monitoring_views
 from events import views as events_views
 from trees import web_public_views as trees_public_views
@@ -63,6 +63,9 @@ router.register(r'planting-sites', PlantingSiteViewSet)
 router.register(r'trees', TreeViewSet)
 router.register(r'tree-updates', TreeUpdateViewSet)
 router.register(r'tree-species', TreeSpeciesViewSet)
+router.register(r'campaigns', TreeCampaignViewSet)
+router.register(r'tree-imports', TreeImportJobViewSet)
+router.register(r'tree-duplicates', DuplicateCandidateViewSet)
 router.register(r'followups', FollowUpViewSet)
 router.register(r'monitoring', MonitoringReportViewSet)
 router.register(r'feedback', FeedbackViewSet)
@@ -91,6 +94,8 @@ urlpatterns = [
     path('api/notifications/', include(('notifications.urls', 'notifications'), namespace='api_notifications')),
     path('api/reports/', include(('reports.urls', 'reports'), namespace='api_reports')),
     path('api/reports/summary/', summary_stats, name='reports-summary'),
+    path('api/reports/survival/', survival_cohorts, name='reports-survival'),
+    path('api/sync/', sync_changes, name='sync-changes'),
     # Include the dashboard app with an explicit namespace so templates
     # that use the 'dashboard:' namespaced reverses resolve correctly.
     path('dashboard/', include(('dashboard.urls', 'dashboard'), namespace='dashboard')),
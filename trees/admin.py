@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import TreeSpecies, Tree, TreeUpdate
 from django.utils.safestring import mark_safe
 from django.urls import reverse
+from core.bulk import BulkOperationAdminMixin
 from qrcodes.models import QRCode
 
 @admin.register(TreeSpecies)
@@ -9,7 +10,7 @@ class TreeSpeciesAdmin(admin.ModelAdmin):
     list_display = ('name',)
 
 @admin.register(Tree)
-class TreeAdmin(admin.ModelAdmin):
+class TreeAdmin(BulkOperationAdminMixin, admin.ModelAdmin):
     list_display = ('tree_id', 'species', 'planting_date', 'beneficiary', 'status', 'qrcode_link')
     readonly_fields = ('qrcode_link',)
 
@@ -0,0 +1,98 @@
+"""Denormalized TreeCampaign progress counters.
+
+Each campaign keeps ``tree_count``, ``seedling_count``, ``alive_count`` and
+``dead_count`` for its trees so "x of y planted" reads one row instead of
+aggregating the tree table. Tree signals apply deltas with F-expressions
+(``tree_changed``), bulk inserts call ``record_created`` and
+``reconcile`` (run periodically by ``trees.tasks.reconcile_campaign_counters``)
+corrects any drift from writes that bypass signals, such as
+``QuerySet.update()``.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Sum
+
+from .models import Tree, TreeCampaign
+
+
+COUNTER_FIELDS = ('tree_count', 'seedling_count', 'alive_count', 'dead_count')
+
+
+def _counts(tree):
+    """``(campaign_id, counters)`` a tree contributes, or None."""
+    if tree is None:
+        return None
+    values = tree.__dict__
+    if values.get('campaign_id') is None or 'status' not in values or 'number_of_seedlings' not in values:
+        return None
+    status = values['status']
+    return values['campaign_id'], (1, int(values['number_of_seedlings'] or 0), int(status == 'alive'), int(status == 'dead'))
+
+
+def apply_deltas(deltas):
+    """Add ``{campaign_id: (trees, seedlings, alive, dead)}`` to the counters."""
+    for campaign_id, delta in deltas.items():
+        updates = {field: F(field) + d for field, d in zip(COUNTER_FIELDS, delta) if d}
+        if updates:
+            TreeCampaign.objects.filter(pk=campaign_id).update(**updates)
+
+
+def _add(deltas, counts, sign):
+    if counts is not None:
+        campaign_id, values = counts
+        deltas[campaign_id] = [a + sign * b for a, b in zip(deltas[campaign_id], values)]
+
+
+def tree_changed(old, new):
+    """Apply the change between two tree states (either may be None)."""
+    old, new = _counts(old), _counts(new)
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    _add(deltas, old, -1)
+    _add(deltas, new, 1)
+    apply_deltas(deltas)
+
+
+def record_created(trees):
+    """Count trees inserted without signals (``bulk_create``)."""
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for tree in trees:
+        _add(deltas, _counts(tree), 1)
+    apply_deltas(deltas)
+
+
+def computed_counters(campaign_ids=None):
+    """``{campaign_id: (trees, seedlings, alive, dead)}`` aggregated from the tree table."""
+    qs = Tree.objects.filter(campaign__isnull=False)
+    if campaign_ids is not None:
+        qs = qs.filter(campaign_id__in=campaign_ids)
+    rows = (
+        qs.values('campaign_id')
+        .annotate(
+            trees=Count('id'),
+            seedlings=Sum('number_of_seedlings'),
+            alive=Count('id', filter=Q(status='alive')),
+            dead=Count('id', filter=Q(status='dead')),
+        )
+        .order_by()
+        .values_list('campaign_id', 'trees', 'seedlings', 'alive', 'dead')
+    )
+    return {row[0]: (row[1], row[2] or 0, row[3], row[4]) for row in rows}
+
+
+def reconcile(campaign_ids=None):
+    """Recompute the counters from the tree table; returns the campaigns corrected."""
+    expected = computed_counters(campaign_ids)
+    campaigns = TreeCampaign.objects.all()
+    if campaign_ids is not None:
+        campaigns = campaigns.filter(pk__in=campaign_ids)
+    changed = []
+    for pk, *stored in campaigns.values_list('pk', *COUNTER_FIELDS):
+        counters = expected.get(pk, (0, 0, 0, 0))
+        if tuple(stored) != counters:
+            changed.append(TreeCampaign(pk=pk, **dict(zip(COUNTER_FIELDS, counters))))
+    if changed:
+        TreeCampaign.objects.bulk_update(changed, list(COUNTER_FIELDS), batch_size=500)
+    return len(changed)
+
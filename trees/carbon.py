@@ -0,0 +1,192 @@
+"""CO2 sequestration estimates from species rates.
+
+Each seedling sequesters its species' ``co2_estimate_kg_per_year`` for every
+year it has been alive: from planting until ``as_of``, or until it died
+(dated like reports.cohorts: first update recording it dead, else
+``replaced_date``, else its last update; undated deaths earn nothing).
+The projection adds what living seedlings sequester over the next
+``horizon_years``. Species without a rate fall back to
+``CARBON_DEFAULT_KG_PER_YEAR`` (unset: they count as zero and are reported
+in ``trees_without_rate``).
+
+Trees are fetched already summed per distinct planting (date, species,
+campaign, beneficiary[, death dates]) and estimated in one NumPy pass;
+``take_snapshot`` stores the result per day in ``CarbonSnapshot`` (from the
+daily ``snapshot_carbon`` task); readers use the latest stored one.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from beneficiaries.models import Beneficiary
+from .models import CarbonSnapshot, Tree, TreeSpecies, TreeUpdate
+
+
+DEFAULT_HORIZON_YEARS = 10
+DAYS_PER_YEAR = 365.25
+GROUP_FIELDS = ('planting_date', 'species_id', 'campaign_id', 'beneficiary_id')
+BREAKDOWNS = ('campaign', 'beneficiary', 'species')
+
+
+def with_death_dates(qs):
+    """Annotate trees with ``_first_dead`` (first update recording them dead) and ``_last_update``.
+
+    Together with ``replaced_date`` these date a dead tree's death, in that
+    order of preference.
+    """
+    updates = TreeUpdate.objects.filter(tree=OuterRef('pk')).values('date')
+    return qs.annotate(
+        _first_dead=Subquery(updates.filter(status='dead').order_by('date')[:1]),
+        _last_update=Subquery(updates.order_by('-date')[:1]),
+    )
+
+
+def _ordinals(dates):
+    return np.fromiter((0 if d is None else d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+
+
+def _ids(values):
+    return np.fromiter((-1 if v is None else v for v in values), dtype=np.int64, count=len(values))
+
+
+def _columns(qs, as_of):
+    """(planted, end, seedlings, trees, living, species, campaign, beneficiary) arrays."""
+    living = list(
+        qs.exclude(status='dead').values(*GROUP_FIELDS)
+        .annotate(n=Count('id'), s=Sum('number_of_seedlings')).order_by()
+        .values_list(*GROUP_FIELDS, 'n', 's')
+    )
+    dead = list(
+        with_death_dates(qs.filter(status='dead'))
+        .values(*GROUP_FIELDS, 'replaced_date', '_first_dead', '_last_update')
+        .annotate(n=Count('id'), s=Sum('number_of_seedlings')).order_by()
+        .values_list(*GROUP_FIELDS, 'n', 's', 'replaced_date', '_first_dead', '_last_update')
+    )
+    # a dead tree's death date, or its planting date (no credit) if unknown
+    deaths = [first or replaced or last or planted for planted, *_, replaced, first, last in dead]
+    rows = [r[:6] for r in living] + [r[:6] for r in dead]
+    if not rows:
+        return None
+    planted, species, campaign, beneficiary, trees, seedlings = zip(*rows)
+    end = np.concatenate([np.full(len(living), as_of.toordinal(), dtype=np.int64), _ordinals(deaths)])
+    is_living = np.zeros(len(rows), dtype=bool)
+    is_living[:len(living)] = True
+    return (_ordinals(planted), np.minimum(end, as_of.toordinal()), _ids(seedlings), _ids(trees),
+            is_living, _ids(species), _ids(campaign), _ids(beneficiary))
+
+
+def _breakdown(keys, co2, projected, trees):
+    values, inverse = np.unique(keys, return_inverse=True)
+    sums = [np.bincount(inverse, weights=w, minlength=len(values)) for w in (co2, projected, trees)]
+    return {
+        ('none' if key < 0 else str(key)): {
+            'co2_kg': round(float(c), 2), 'projected_co2_kg': round(float(p), 2), 'trees': int(t),
+        }
+        for key, c, p, t in zip(values.tolist(), *sums)
+    }
+
+
+def _regions(by_beneficiary):
+    """Fold a beneficiary breakdown into regions (beneficiary address)."""
+    addresses = dict(
+        Beneficiary.objects.filter(pk__in=[int(k) for k in by_beneficiary if k != 'none']).values_list('pk', 'address')
+    )
+    regions = {}
+    for key, entry in by_beneficiary.items():
+        label = (addresses.get(int(key)) if key != 'none' else '') or 'Unknown'
+        region = regions.setdefault(label.strip() or 'Unknown', {'co2_kg': 0.0, 'projected_co2_kg': 0.0, 'trees': 0})
+        for field in region:
+            region[field] += entry[field]
+    for region in regions.values():
+        region['co2_kg'] = round(region['co2_kg'], 2)
+        region['projected_co2_kg'] = round(region['projected_co2_kg'], 2)
+    return regions
+
+
+def estimate(qs=None, as_of=None, horizon_years=DEFAULT_HORIZON_YEARS, breakdowns=True):
+    """Cumulative (``co2_kg``) and projected CO2 for the trees in ``qs``.
+
+    Returns a dict with the totals and, when ``breakdowns`` is true,
+    ``by_campaign``/``by_beneficiary``/``by_species``/``by_region``.
+    """
+    as_of = as_of or timezone.localdate()
+    qs = (Tree.objects.all() if qs is None else qs).filter(planting_date__lte=as_of)
+    result = {
+        'as_of': as_of, 'horizon_years': horizon_years, 'co2_kg': 0.0, 'projected_co2_kg': 0.0,
+        'trees': 0, 'seedlings': 0, 'trees_without_rate': 0,
+    }
+    if breakdowns:
+        result.update({f'by_{name}': {} for name in BREAKDOWNS + ('region',)})
+    columns = _columns(qs, as_of)
+    if columns is None:
+        return result
+    planted, end, seedlings, trees, living, species, campaign, beneficiary = columns
+
+    rates = {pk: rate for pk, rate in TreeSpecies.objects.values_list('pk', 'co2_estimate_kg_per_year') if rate is not None}
+    default = getattr(settings, 'CARBON_DEFAULT_KG_PER_YEAR', None)
+    rate = np.fromiter((rates.get(sp, np.nan) for sp in species.tolist()), dtype=float, count=len(species))
+    if default is not None:
+        rate = np.where(np.isnan(rate), float(default), rate)
+    unknown = np.isnan(rate)
+    rate = np.where(unknown, 0.0, rate)
+
+    years = np.maximum(end - planted, 0) / DAYS_PER_YEAR
+    co2 = seedlings * rate * years
+    projected = co2 + np.where(living, seedlings * rate * horizon_years, 0.0)
+    result.update({
+        'co2_kg': round(float(co2.sum()), 2),
+        'projected_co2_kg': round(float(projected.sum()), 2),
+        'trees': int(trees.sum()),
+        'seedlings': int(seedlings.sum()),
+        'trees_without_rate': int(trees[unknown].sum()),
+    })
+    if breakdowns:
+        for name, keys in zip(BREAKDOWNS, (campaign, beneficiary, species)):
+            result[f'by_{name}'] = _breakdown(keys, co2, projected, trees)
+        result['by_region'] = _regions(result['by_beneficiary'])
+    return result
+
+
+def take_snapshot(as_of=None, horizon_years=DEFAULT_HORIZON_YEARS):
+    """Estimate the whole inventory and store it as the snapshot for ``as_of``."""
+    data = estimate(as_of=as_of, horizon_years=horizon_years)
+    fields = {k: v for k, v in data.items() if k != 'as_of'}
+    snapshot, _ = CarbonSnapshot.objects.update_or_create(date=data['as_of'], defaults=fields)
+    return snapshot
+
+
+def current_snapshot():
+    """The latest stored snapshot, or None before the daily task first runs."""
+    return CarbonSnapshot.objects.order_by('-date').first()
+
+
+def history(start=None, end=None):
+    """Stored daily totals between two dates (inclusive), oldest first."""
+    qs = CarbonSnapshot.objects.order_by('date')
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    return list(qs.values('date', 'co2_kg', 'projected_co2_kg', 'trees', 'seedlings'))
+
+
+def summary(snapshot, regions=None):
+    """Report/dashboard figures from a snapshot, optionally for matching regions only."""
+    data = {
+        'as_of': snapshot.date.isoformat(),
+        'co2_kg': snapshot.co2_kg,
+        'projected_co2_kg': snapshot.projected_co2_kg,
+        'horizon_years': snapshot.horizon_years,
+    }
+    if regions is not None:
+        matching = [entry for label, entry in snapshot.by_region.items() if regions(label)]
+        data['co2_kg'] = round(sum(e['co2_kg'] for e in matching), 2)
+        data['projected_co2_kg'] = round(sum(e['projected_co2_kg'] for e in matching), 2)
+    return data
+
+
+def summary_line(snapshot):
+    return (f"Estimated CO2 sequestered: {snapshot.co2_kg / 1000:,.2f} t "
+            f"(projected {snapshot.projected_co2_kg / 1000:,.2f} t within {snapshot.horizon_years} years, "
+            f"as of {snapshot.date.isoformat()})")
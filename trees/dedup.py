@@ -0,0 +1,208 @@
+"""Duplicate tree detection.
+
+Every tree with coordinates carries a blocking key, ``dedup_key`` =
+``<beneficiary>:<ISO year>W<week>:<geohash cell>`` (cells of
+``CELL_PRECISION``, about 150 m). Two trees are duplicate candidates when
+they belong to the same beneficiary, have the same species and planting date
+and lie within ``DEDUP_DISTANCE_M`` metres of each other. Such a pair always
+shares the beneficiary/week prefix and sits in the same or an adjacent cell.
+
+* ``check_created`` runs when trees are created (by trees.signals and the
+  importer). It reads the neighbouring cells' keys with one indexed
+  ``IN`` query, whatever the size of the inventory.
+* ``scan`` walks the whole inventory in ``dedup_key`` order, one
+  beneficiary/week block at a time, and matches within each block with a
+  latitude sweep instead of comparing every pair.
+
+Pairs go into the ``DuplicateCandidate`` review queue. ``merge`` folds a
+duplicate into the tree it duplicates, and ``dismiss`` marks a pair as
+distinct trees so it is never queued again. Trees without coordinates get
+no key: beneficiaries often plant many trees on one day, and without a
+position those can't be told apart from duplicates.
+"""
+import datetime
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.geo import encode, neighbors
+from .models import DuplicateCandidate, Tree
+
+
+CELL_PRECISION = 7
+DEFAULT_DISTANCE_M = 10.0
+METRES_PER_DEGREE = 111320.0
+QUEUE_BATCH_SIZE = 1000
+
+
+def blocking_key(beneficiary_id, planting_date, latitude, longitude):
+    """The tree's ``dedup_key``, or '' when it can't be matched."""
+    if beneficiary_id is None or planting_date is None or latitude is None or longitude is None:
+        return ''
+    if not isinstance(planting_date, datetime.date):
+        # unsaved instances may still hold the string that was assigned
+        planting_date = datetime.date.fromisoformat(str(planting_date)[:10])
+    year, week, _ = planting_date.isocalendar()
+    return f'{beneficiary_id}:{year}W{week:02d}:{encode(latitude, longitude, CELL_PRECISION)}'
+
+
+def _block(key):
+    return key.rsplit(':', 1)[0]
+
+
+def _max_distance():
+    return float(getattr(settings, 'DEDUP_DISTANCE_M', DEFAULT_DISTANCE_M))
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    # equirectangular approximation; exact enough at a few metres
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371008.8
+
+
+ROW_FIELDS = ('pk', 'dedup_key', 'species_id', 'planting_date', 'latitude', 'longitude')
+
+
+def _match_block(rows, max_distance):
+    """Yield ``(older pk, newer pk, metres)`` for the duplicate pairs among ``rows`` (one block)."""
+    rows = sorted(rows, key=lambda r: (r[2] or -1, r[3], r[4]))
+    lat_window = max_distance / METRES_PER_DEGREE
+    for i, (pk, _, species, date, lat, lon) in enumerate(rows):
+        for other_pk, _, other_species, other_date, other_lat, other_lon in rows[i + 1:]:
+            if other_species != species or other_date != date or other_lat - lat > lat_window:
+                break
+            distance = _distance_m(lat, lon, other_lat, other_lon)
+            if distance <= max_distance:
+                yield min(pk, other_pk), max(pk, other_pk), round(distance, 2)
+
+
+def _queue(pairs):
+    """Add pairs to the review queue; pairs already there (even dismissed) are left alone."""
+    DuplicateCandidate.objects.bulk_create(
+        [DuplicateCandidate(duplicate_of_id=older, tree_id=newer, distance_m=d) for older, newer, d in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def check_created(trees):
+    """Queue duplicates of newly created trees; returns the pairs found."""
+    trees = [t for t in trees if t.dedup_key]
+    if not trees:
+        return []
+    keys = set()
+    for tree in trees:
+        prefix = _block(tree.dedup_key)
+        keys.update(f'{prefix}:{cell}' for cell in neighbors(tree.latitude, tree.longitude, CELL_PRECISION))
+    blocks = {}
+    for row in Tree.objects.filter(dedup_key__in=keys).values_list(*ROW_FIELDS):
+        blocks.setdefault(_block(row[1]), []).append(row)
+    new = {t.pk for t in trees}
+    max_distance = _max_distance()
+    pairs = [pair for rows in blocks.values() for pair in _match_block(rows, max_distance)
+             if pair[0] in new or pair[1] in new]
+    if pairs:
+        _queue(pairs)
+    return pairs
+
+
+def scan(chunk_size=5000):
+    """Scan the whole inventory for duplicate pairs and queue them; returns the number of pairs found."""
+    max_distance = _max_distance()
+    rows = Tree.objects.exclude(dedup_key='').order_by('dedup_key').values_list(*ROW_FIELDS).iterator(chunk_size=chunk_size)
+    found, pending, block, current = 0, [], None, []
+    for row in rows:
+        key = _block(row[1])
+        if key != block:
+            pending.extend(_match_block(current, max_distance))
+            block, current = key, []
+            if len(pending) >= QUEUE_BATCH_SIZE:
+                _queue(pending)
+                found, pending = found + len(pending), []
+        current.append(row)
+    pending.extend(_match_block(current, max_distance))
+    if pending:
+        _queue(pending)
+    return found + len(pending)
+
+
+def rebuild_keys(chunk_size=5000, model=Tree):
+    """Recompute ``dedup_key`` for every tree (after changing the key format); returns rows changed.
+
+    Migration 0014 carries its own frozen copy of this and ``blocking_key``.
+    """
+    changed = 0
+    fields = ('pk', 'beneficiary_id', 'planting_date', 'latitude', 'longitude', 'dedup_key')
+    batch = []
+    for pk, ben, date, lat, lon, stored in model.objects.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size):
+        key = blocking_key(ben, date, lat, lon)
+        if key != stored:
+            batch.append(model(pk=pk, dedup_key=key))
+        if len(batch) >= chunk_size:
+            model.objects.bulk_update(batch, ['dedup_key'])
+            changed, batch = changed + len(batch), []
+    if batch:
+        model.objects.bulk_update(batch, ['dedup_key'])
+    return changed + len(batch)
+
+
+def dismiss(candidate, user=None):
+    candidate.status = 'dismissed'
+    candidate.reviewed_by = user if user is not None and user.is_authenticated else None
+    candidate.reviewed_at = timezone.now()
+    candidate.save(update_fields=['status', 'reviewed_by', 'reviewed_at'])
+
+
+@transaction.atomic
+def merge(candidate, user=None):
+    """Fold ``candidate.tree`` into ``candidate.duplicate_of`` and delete it.
+
+    Updates and media move to the kept tree, and trees it had replaced point
+    at the kept tree instead. Its QR code moves too unless the kept tree has
+    one already; then the code is left unlinked, like the extra codes of
+    qrcodes migration 0004. The merge is written to the activity log; the
+    pair leaves the queue with the deleted tree.
+    """
+    from core import sync
+    from core.models import ActivityLog
+    from media_app.models import Media
+    from qrcodes.models import QRCode
+    from . import lineage
+    from .growth import refresh_growth
+    from .models import TreeUpdate
+
+    keep, drop = candidate.duplicate_of, candidate.tree
+    moved_updates = list(TreeUpdate.objects.filter(tree=drop).values_list('pk', flat=True))
+    TreeUpdate.objects.filter(pk__in=moved_updates).update(tree=keep)
+    Media.objects.filter(tree=drop).update(tree=keep)
+    # one code per tree (uniq_qrcode_tree)
+    if QRCode.objects.filter(tree=keep).exists():
+        unlinked = list(QRCode.objects.filter(tree=drop).values_list('pk', flat=True))
+        QRCode.objects.filter(pk__in=unlinked).update(tree=None)
+    else:
+        unlinked = []
+        QRCode.objects.filter(tree=drop).update(tree=keep)
+    replaced = list(Tree.objects.filter(replaced_by=drop).exclude(pk=keep.pk).values_list('pk', flat=True))
+    Tree.objects.filter(pk__in=replaced).update(replaced_by=keep)
+    # the kept tree was replaced by its own duplicate; don't leave a self-loop
+    unchained = Tree.objects.filter(pk=keep.pk, replaced_by=drop).update(replaced_by=None)
+    if unchained:
+        keep.replaced_by = None
+    drop_label = drop.tree_id
+    # trees after the dropped one lose it from their lineage
+    lineage.forget_chain(drop.pk)
+    drop.delete()
+
+    refresh_growth([keep.pk])
+    sync.record(TreeUpdate, moved_updates)
+    sync.record(Tree, replaced + [keep.pk] * unchained)
+    lineage.forget_chain(keep.pk)
+    ActivityLog.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        action=f'Merged duplicate tree {drop_label} into {keep.tree_id}',
+    )
+    for pk in unlinked:
+        ActivityLog.objects.create(action=f'Unlinked QR code {pk} of merged tree {drop_label} (kept tree {keep.tree_id})')
+    return {'kept': keep.pk, 'moved_updates': len(moved_updates), 'repointed_replacements': len(replaced)}
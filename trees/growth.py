@@ -0,0 +1,132 @@
+"""Growth analytics over TreeUpdate measurements.
+
+Per-update growth (height, canopy and diameter change per day since the
+tree's previous update) is computed for any set of trees in one query with
+``LAG(...) OVER (PARTITION BY tree_id ORDER BY date, id)``; on databases
+without window functions the rows are fetched in that order and shifted in a
+single pass instead. The per-day rates are also stored on each TreeUpdate by
+``refresh_growth`` so ``TreeUpdate.growth_rate_per_day`` never queries.
+"""
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+
+from .models import TreeUpdate
+
+
+METRICS = ('height', 'canopy', 'diameter')
+VALUE_FIELDS = tuple(f'{m}_cm' for m in METRICS)
+RATE_FIELDS = tuple(f'{m}_growth_per_day' for m in METRICS)
+REFRESH_CHUNK = 500
+
+
+def _rate(current, previous, days):
+    if current is None or previous is None or days is None:
+        return None
+    return round((current - previous) / days, 4)
+
+
+def _delta(row, prev_date, prev_values):
+    days = None
+    if prev_date is not None:
+        # same-day remeasurements count as one day, as before
+        days = max((row['date'] - prev_date).days, 1)
+    row['days_since_previous'] = days
+    for field, rate_field, previous in zip(VALUE_FIELDS, RATE_FIELDS, prev_values):
+        row[rate_field] = _rate(row[field], previous, days)
+    return row
+
+
+def _window_rows(qs, fields):
+    partition = [F('tree_id')]
+    order = [F('date').asc(), F('id').asc()]
+    lags = {'prev_date': Window(Lag('date'), partition_by=partition, order_by=order)}
+    for field in VALUE_FIELDS:
+        lags[f'prev_{field}'] = Window(Lag(field), partition_by=partition, order_by=order)
+    rows = qs.annotate(**lags).values(*fields, *lags).order_by('tree_id', 'date', 'id')
+    # streamed: the unfiltered /api/trees/growth/ walks every update
+    for row in rows.iterator(chunk_size=2000):
+        prev_date = row.pop('prev_date')
+        yield _delta(row, prev_date, [row.pop(f'prev_{f}') for f in VALUE_FIELDS])
+
+
+def _shifted_rows(qs, fields):
+    # fallback: same result from rows sorted like the window, shifted in Python
+    prev = None
+    for row in qs.values(*fields).order_by('tree_id', 'date', 'id').iterator(chunk_size=2000):
+        if prev is None or prev['tree_id'] != row['tree_id']:
+            _delta(row, None, [None] * len(VALUE_FIELDS))
+        else:
+            _delta(row, prev['date'], [prev[f] for f in VALUE_FIELDS])
+        prev = row
+        yield row
+
+
+def growth_deltas(qs=None, extra_fields=()):
+    """Yield one dict per update of ``qs`` with its growth since the previous one.
+
+    ``qs`` should select whole trees (filter on tree, species, campaign...,
+    not on dates) so each update's predecessor is part of the set. Rows carry
+    ``days_since_previous`` and ``<metric>_growth_per_day`` next to the raw
+    measurements and any ``extra_fields``.
+    """
+    if qs is None:
+        qs = TreeUpdate.objects.all()
+    fields = ('id', 'tree_id', 'date', *VALUE_FIELDS, *extra_fields)
+    if connection.features.supports_over_clause:
+        return _window_rows(qs, fields)
+    return _shifted_rows(qs, fields)
+
+
+def refresh_growth(tree_ids=None, model=TreeUpdate, chunk_size=REFRESH_CHUNK):
+    """Recompute the stored growth rates of the given trees' updates (all if None).
+
+    Returns the number of updates whose stored rates changed.
+    """
+    if tree_ids is None:
+        tree_ids = model.objects.values_list('tree_id', flat=True).distinct().order_by('tree_id')
+    tree_ids = list(tree_ids)
+    changed = 0
+    for i in range(0, len(tree_ids), chunk_size):
+        qs = model.objects.filter(tree_id__in=tree_ids[i:i + chunk_size])
+        stored = {row[0]: row[1:] for row in qs.values_list('id', *RATE_FIELDS)}
+        objs = []
+        for row in growth_deltas(qs):
+            rates = tuple(row[f] for f in RATE_FIELDS)
+            if stored.get(row['id']) != rates:
+                objs.append(model(pk=row['id'], **dict(zip(RATE_FIELDS, rates))))
+        if objs:
+            model.objects.bulk_update(objs, list(RATE_FIELDS), batch_size=chunk_size)
+        changed += len(objs)
+    return changed
+
+
+def species_curves(qs=None, bucket_days=30):
+    """Growth curves per species: average size and growth by tree age.
+
+    Ages are bucketed by ``bucket_days`` since planting. Returns
+    ``[{'species_id', 'species', 'curve': [{'age_days', 'samples',
+    'avg_<metric>_cm', 'avg_<metric>_growth_per_day', ...}]}]``.
+    """
+    extra = ('tree__species_id', 'tree__species__name', 'tree__planting_date')
+    buckets = {}
+    names = {}
+    for row in growth_deltas(qs, extra_fields=extra):
+        species = row['tree__species_id']
+        names[species] = row['tree__species__name']
+        age = max((row['date'] - row['tree__planting_date']).days, 0) // bucket_days
+        acc = buckets.setdefault((species, age), {'samples': 0, 'sums': {}, 'counts': {}})
+        acc['samples'] += 1
+        for field in VALUE_FIELDS + RATE_FIELDS:
+            if row[field] is not None:
+                acc['sums'][field] = acc['sums'].get(field, 0.0) + row[field]
+                acc['counts'][field] = acc['counts'].get(field, 0) + 1
+
+    curves = {}
+    for (species, age), acc in sorted(buckets.items(), key=lambda item: (item[0][0] is None, item[0][0] or 0, item[0][1])):
+        point = {'age_days': age * bucket_days, 'samples': acc['samples']}
+        for field in VALUE_FIELDS + RATE_FIELDS:
+            n = acc['counts'].get(field)
+            point[f'avg_{field}'] = round(acc['sums'][field] / n, 4) if n else None
+        curves.setdefault(species, []).append(point)
+    return [{'species_id': sp, 'species': names[sp], 'curve': curve} for sp, curve in curves.items()]
@@ -0,0 +1,310 @@
+"""Streaming import engine for bulk tree uploads.
+
+Rows are read lazily from CSV/XLSX uploads (or a JSON list), validated and
+resolved against the database one chunk at a time and written with
+``bulk_create``. Per-tree side effects (QRCode records and rendering,
+dashboard cache purge) are deferred to a single follow-up step in
+``finalize_import`` instead of running once per row through ``Tree.save()``
+and its signals.
+"""
+import codecs
+import csv
+import datetime
+import uuid
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from beneficiaries.models import Beneficiary
+from core import sync
+from core.geo import encode as geohash_encode
+from . import campaigns, dedup, stats
+from .models import Tree, TreeSpecies, TreeCampaign
+from .parsing import TREE_STATUSES, blank, clean, parse_date, parse_int
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class UnsupportedFileType(ValueError):
+    """Raised when an upload is neither CSV nor XLSX."""
+
+
+def iter_upload_rows(upload):
+    """Yield one dict per data row of an uploaded CSV/XLSX file.
+
+    The file is never read into memory as a whole: CSV is decoded line by line
+    and XLSX is opened in openpyxl's read-only mode.
+    """
+    name = (getattr(upload, 'name', '') or '').lower()
+    if name.endswith('.csv'):
+        return _iter_csv_rows(upload)
+    if name.endswith(('.xls', '.xlsx')):
+        return _iter_xlsx_rows(upload)
+    raise UnsupportedFileType('unsupported file type')
+
+
+def _iter_csv_rows(upload):
+    # utf-8-sig strips the BOM Excel adds to "CSV UTF-8" exports
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+    for row in reader:
+        yield row
+
+
+def _iter_xlsx_rows(upload):
+    # delay importing openpyxl until actually needed so the module is not
+    # required at import-time for the app to start.
+    import openpyxl
+
+    wb = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers:
+            return
+        headers = [str(h).strip() if h is not None else '' for h in headers]
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            yield {headers[i]: values[i] for i in range(min(len(headers), len(values))) if headers[i]}
+    finally:
+        wb.close()
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _lookup_key(value):
+    """Return ('pk', int) or ('name', str) for a foreign key cell."""
+    try:
+        return 'pk', parse_int(value)
+    except (TypeError, ValueError):
+        return 'name', str(value).strip().lower()
+
+
+class _ChunkResolver:
+    """Resolve the foreign keys referenced by one chunk with a query per model."""
+
+    def __init__(self, rows):
+        ben_ids, species_keys, campaign_keys, tree_ids = set(), set(), set(), set()
+        for _, row in rows:
+            if not blank(row.get('beneficiary')):
+                kind, key = _lookup_key(row['beneficiary'])
+                if kind == 'pk':
+                    ben_ids.add(key)
+            if not blank(row.get('species')):
+                species_keys.add(_lookup_key(row['species']))
+            if not blank(row.get('campaign')):
+                campaign_keys.add(_lookup_key(row['campaign']))
+            if not blank(row.get('tree_id')):
+                tree_ids.add(str(clean(row['tree_id'])))
+
+        self.beneficiaries = set(Beneficiary.objects.filter(pk__in=ben_ids).values_list('pk', flat=True)) if ben_ids else set()
+        self.species = self._resolve(TreeSpecies, species_keys)
+        self.campaigns = self._resolve(TreeCampaign, campaign_keys)
+        self.existing_tree_ids = set(Tree.objects.filter(tree_id__in=tree_ids).values_list('tree_id', flat=True)) if tree_ids else set()
+
+    @staticmethod
+    def _resolve(model, keys):
+        pks = [k for kind, k in keys if kind == 'pk']
+        names = [k for kind, k in keys if kind == 'name']
+        resolved = {}
+        if pks:
+            for pk in model.objects.filter(pk__in=pks).values_list('pk', flat=True):
+                resolved[('pk', pk)] = pk
+        if names:
+            # names are matched case-insensitively; the first match wins
+            qs = model.objects.annotate(lname=Lower('name')).filter(lname__in=names).order_by('pk')
+            for pk, name in qs.values_list('pk', 'lname'):
+                resolved.setdefault(('name', name.strip()), pk)
+        return resolved
+
+
+def _build_tree(row, resolver, seen_tree_ids):
+    """Validate a single row and return ``(Tree, errors)``."""
+    errors = []
+    if blank(row.get('beneficiary')):
+        errors.append('missing beneficiary')
+    if blank(row.get('planting_date')):
+        errors.append('missing planting_date')
+    if errors:
+        return None, errors
+
+    fields = {}
+    kind, ben = _lookup_key(row['beneficiary'])
+    if kind != 'pk' or ben not in resolver.beneficiaries:
+        errors.append('unknown beneficiary')
+    fields['beneficiary_id'] = ben
+
+    try:
+        fields['planting_date'] = parse_date(row['planting_date'])
+    except (TypeError, ValueError):
+        errors.append('invalid planting_date')
+
+    if not blank(row.get('species')):
+        fields['species_id'] = resolver.species.get(_lookup_key(row['species']))
+        if fields['species_id'] is None:
+            errors.append('unknown species')
+    if not blank(row.get('campaign')):
+        fields['campaign_id'] = resolver.campaigns.get(_lookup_key(row['campaign']))
+        if fields['campaign_id'] is None:
+            errors.append('unknown campaign')
+
+    if not blank(row.get('number_of_seedlings')):
+        try:
+            fields['number_of_seedlings'] = parse_int(row['number_of_seedlings'])
+            if fields['number_of_seedlings'] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append('invalid number_of_seedlings')
+    if not blank(row.get('status')):
+        fields['status'] = str(row['status']).strip().lower()
+        if fields['status'] not in TREE_STATUSES:
+            errors.append('invalid status')
+    for coord in ('latitude', 'longitude'):
+        if not blank(row.get(coord)):
+            try:
+                fields[coord] = float(row[coord])
+            except (TypeError, ValueError):
+                errors.append(f'invalid {coord}')
+    if 'latitude' in fields and 'longitude' in fields:
+        fields['geohash'] = geohash_encode(fields['latitude'], fields['longitude'])
+
+    tree_id = None if blank(row.get('tree_id')) else str(clean(row['tree_id']))
+    if tree_id:
+        if tree_id in resolver.existing_tree_ids or tree_id in seen_tree_ids:
+            errors.append('duplicate tree_id')
+        seen_tree_ids.add(tree_id)
+    else:
+        tree_id = f"TAWI-{uuid.uuid4().hex[:10].upper()}"
+    fields['tree_id'] = tree_id
+
+    if errors:
+        return None, errors
+    fields['dedup_key'] = dedup.blocking_key(ben, fields['planting_date'], fields.get('latitude'), fields.get('longitude'))
+    return Tree(**fields), []
+
+
+def iter_checked_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE, start=1):
+    """Yield ``(raw_rows, [(row_number, Tree)], errors)`` for each chunk.
+
+    ``start`` is the row number of the first row in ``rows`` so that error
+    reports stay accurate when resuming part-way through a file.
+    """
+    seen_tree_ids = set()
+    numbered = enumerate(rows, start=start)
+    for chunk in chunked(numbered, chunk_size):
+        resolver = _ChunkResolver(chunk)
+        trees, errors = [], []
+        for idx, row in chunk:
+            tree, row_errors = _build_tree(row, resolver, seen_tree_ids)
+            if row_errors:
+                errors.extend({'row': idx, 'error': e} for e in row_errors)
+            else:
+                trees.append((idx, tree))
+        yield chunk, trees, errors
+
+
+def validate_rows(rows, chunk_size=DEFAULT_CHUNK_SIZE, sample_size=3):
+    """Validate every row without writing anything.
+
+    Returns a dict with ``rows_parsed``, ``errors`` and a small ``sample`` of
+    the raw rows for the dry-run preview.
+    """
+    parsed = 0
+    errors = []
+    sample = []
+    for chunk, _, chunk_errors in iter_checked_chunks(rows, chunk_size):
+        parsed += len(chunk)
+        errors.extend(chunk_errors)
+        for _, row in chunk:
+            if len(sample) >= sample_size:
+                break
+            sample.append({k: (v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else v) for k, v in row.items()})
+    return {'rows_parsed': parsed, 'errors': errors, 'sample': sample}
+
+
+def insert_chunk(trees):
+    """Insert a chunk with one ``bulk_create``; isolate bad rows on failure."""
+    objs = [t for _, t in trees]
+    try:
+        with transaction.atomic():
+            Tree.objects.bulk_create(objs)
+            stats.record_created(objs)
+            campaigns.record_created(objs)
+            sync.record(Tree, [t.pk for t in objs])
+            dedup.check_created(objs)
+        return [t.pk for t in objs], []
+    except IntegrityError:
+        pass
+    # something in the chunk violates a constraint (e.g. a tree_id inserted
+    # concurrently); retry row by row so one bad row doesn't sink the chunk
+    created, errors = [], []
+    for idx, tree in trees:
+        try:
+            with transaction.atomic():
+                Tree.objects.bulk_create([tree])
+                stats.record_created([tree])
+                campaigns.record_created([tree])
+                sync.record(Tree, [tree.pk])
+                dedup.check_created([tree])
+            created.append(tree.pk)
+        except IntegrityError as exc:
+            errors.append({'row': idx, 'error': str(exc)})
+    return created, errors
+
+
+def import_rows(rows, chunk_size=DEFAULT_CHUNK_SIZE, finalize=True):
+    """Validate and insert rows chunk by chunk.
+
+    Returns a dict with the number of ``created`` trees, their primary keys
+    and any per-row ``errors``. When ``finalize`` is true the deferred side
+    effects run once for all created trees.
+    """
+    created_ids = []
+    errors = []
+    for _, trees, chunk_errors in iter_checked_chunks(rows, chunk_size):
+        errors.extend(chunk_errors)
+        if trees:
+            ids, insert_errors = insert_chunk(trees)
+            created_ids.extend(ids)
+            errors.extend(insert_errors)
+    if finalize and created_ids:
+        finalize_import(created_ids)
+    return {'created': len(created_ids), 'created_ids': created_ids, 'errors': errors}
+
+
+def finalize_import(tree_ids, chunk_size=DEFAULT_CHUNK_SIZE, purge_cache=True):
+    """Run the side effects ``bulk_create`` skipped, once for a whole import.
+
+    Creates the canonical QRCode record for every imported tree, queues the
+    QR worker to render their images in batches and purges the dashboard
+    cache a single time instead of once per row.
+    """
+    try:
+        from qrcodes.models import QRCode
+        from qrcodes.tasks import queue_qr_render
+    except Exception:
+        QRCode = None
+
+    if QRCode is not None:
+        for ids in chunked(tree_ids, chunk_size):
+            have_qr = set(QRCode.objects.filter(tree_id__in=ids).values_list('tree_id', flat=True))
+            missing = Tree.objects.filter(pk__in=[i for i in ids if i not in have_qr]).values_list('pk', 'tree_id')
+            QRCode.objects.bulk_create([QRCode(tree_id=pk, label=str(tid)) for pk, tid in missing], ignore_conflicts=True)
+        queue_qr_render()
+
+    if purge_cache:
+        try:
+            from dashboard.signals import invalidate_dashboard_cache
+            invalidate_dashboard_cache()
+        except Exception:
+            pass
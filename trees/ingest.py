@@ -0,0 +1,157 @@
+"""Batch ingestion of TreeUpdate measurements recorded offline.
+
+A device posts hundreds of updates at once, each with its own
+``client_key``. The batch is resolved and validated up front (trees by
+``tree_id`` and media by id, one query each), written with ``bulk_create``
+and linked to its media with one bulk insert into the M2M table. The side
+effects ``bulk_create`` skips are run once for the whole batch: stored growth
+rates (trees.growth) and the delta sync feed (core.sync).
+
+Keys make retries safe: an item whose key is already stored is answered
+with the existing update instead of being inserted again, including when a
+concurrent retry of the same batch wins the race. An item that fails to
+insert for any other reason is reported as an error; the rest are stored.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core import sync
+from media_app.models import Media
+from .growth import refresh_growth
+from .models import Tree, TreeUpdate
+from .parsing import TREE_STATUSES, blank, clean, parse_date
+
+
+MAX_BATCH_SIZE = 1000
+MEASUREMENTS = ('height_cm', 'canopy_cm', 'diameter_cm')
+
+
+def _build_update(item, key, trees, media):
+    """Validate one item; returns ``(TreeUpdate, media ids, errors)``."""
+    if not isinstance(item, dict):
+        return None, [], ['not an object']
+    errors = []
+    fields = {}
+    tree_pk = trees.get(str(clean(item.get('tree_id')))) if not blank(item.get('tree_id')) else None
+    if tree_pk is None:
+        errors.append('missing tree_id' if blank(item.get('tree_id')) else 'unknown tree_id')
+    fields['tree_id'] = tree_pk
+
+    status = str(item.get('status') or '').strip().lower()
+    if status not in TREE_STATUSES:
+        errors.append('missing status' if not status else 'invalid status')
+    fields['status'] = status
+
+    if blank(item.get('date')):
+        fields['date'] = timezone.localdate()
+    else:
+        try:
+            fields['date'] = parse_date(item['date'])
+        except (TypeError, ValueError):
+            errors.append('invalid date')
+    for name in MEASUREMENTS:
+        if not blank(item.get(name)):
+            try:
+                fields[name] = float(item[name])
+                if fields[name] < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                errors.append(f'invalid {name}')
+    fields['notes'] = str(item.get('notes') or '')
+
+    media_ids = item.get('media') or []
+    if not isinstance(media_ids, list) or not all(str(m).isdigit() and int(m) in media for m in media_ids):
+        errors.append('unknown media')
+        media_ids = []
+    if errors:
+        return None, [], errors
+    return TreeUpdate(client_key=key, **fields), [int(m) for m in media_ids], []
+
+
+def _insert(pending):
+    """``bulk_create`` the updates with their media links; returns the keys that could not be inserted."""
+    link = TreeUpdate.media.through
+    try:
+        with transaction.atomic():
+            TreeUpdate.objects.bulk_create([update for update, _ in pending])
+            link.objects.bulk_create([link(treeupdate_id=update.pk, media_id=m) for update, ids in pending for m in ids])
+        return set()
+    except IntegrityError:
+        pass
+    # a concurrent retry stored some of the same keys first, or some rows are
+    # invalid on their own (e.g. media deleted meanwhile); insert one by one
+    failed = set()
+    for update, ids in pending:
+        try:
+            with transaction.atomic():
+                update.pk = None
+                TreeUpdate.objects.bulk_create([update])
+                link.objects.bulk_create([link(treeupdate_id=update.pk, media_id=m) for m in ids])
+        except IntegrityError:
+            update.pk = None
+            failed.add(update.client_key)
+    return failed
+
+
+def ingest_updates(items):
+    """Store a batch of updates; returns one result per item, in order.
+
+    Each result is ``{'index', 'client_key', 'status', 'id'?, 'errors'?}``
+    with status ``created``, ``duplicate`` (the key was already stored; ``id``
+    is the stored update) or ``error``.
+    """
+    keys = [None if not isinstance(i, dict) or blank(i.get('client_key')) else str(clean(i['client_key']))
+            for i in items]
+    tree_ids = {str(clean(i['tree_id'])) for i in items if isinstance(i, dict) and not blank(i.get('tree_id'))}
+    trees = dict(Tree.objects.filter(tree_id__in=tree_ids).values_list('tree_id', 'pk'))
+    media_ids = {int(m) for i in items if isinstance(i, dict) and isinstance(i.get('media'), list)
+                 for m in i['media'] if str(m).isdigit()}
+    media = set(Media.objects.filter(pk__in=media_ids).values_list('pk', flat=True))
+    stored = dict(TreeUpdate.objects.filter(client_key__in=[k for k in keys if k]).values_list('client_key', 'pk'))
+
+    results, pending, seen = [], [], {}
+    for index, (item, key) in enumerate(zip(items, keys)):
+        result = {'index': index, 'client_key': key}
+        results.append(result)
+        if key is None:
+            result.update(status='error', errors=['missing client_key'])
+        elif len(key) > TreeUpdate._meta.get_field('client_key').max_length:
+            result.update(status='error', errors=['client_key too long'])
+        elif key in stored:
+            result.update(status='duplicate', id=stored[key])
+        elif key in seen:
+            # repeated within the batch: answered like the first occurrence
+            seen[key].append(result)
+        else:
+            update, links, errors = _build_update(item, key, trees, media)
+            if errors:
+                result.update(status='error', errors=errors)
+            else:
+                seen[key] = [result]
+                pending.append((update, links))
+
+    failed = _insert(pending) if pending else set()
+    if failed:
+        # only keys stored meanwhile are duplicates; the others failed on their own
+        stored.update(TreeUpdate.objects.filter(client_key__in=failed).values_list('client_key', 'pk'))
+    created = []
+    for update, _ in pending:
+        key = update.client_key
+        first, *repeats = seen[key]
+        if key in stored:
+            first.update(status='duplicate', id=stored[key])
+        elif key in failed:
+            first.update(status='error', errors=['could not be stored'])
+        else:
+            first.update(status='created', id=update.pk)
+            created.append(update)
+        for repeat in repeats:
+            if 'id' in first:
+                repeat.update(status='duplicate', id=first['id'])
+            else:
+                repeat.update(status='error', errors=first['errors'])
+
+    if created:
+        refresh_growth({update.tree_id for update in created})
+        sync.record(TreeUpdate, [update.pk for update in created])
+    return results
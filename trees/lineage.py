@@ -0,0 +1,275 @@
+"""Replacement lineage: chains of trees linked by ``Tree.replaced_by``.
+
+A dead tree that is replanted points at its replacement, which may itself
+be replaced later, so a planting position is a chain root -> ... -> tip.
+The root is the original tree (it replaced nothing); the tip is the tree
+standing there now (``replaced_by`` unset). A replacement may stand in for
+several dead trees, so chains can merge but never split.
+
+Chains are resolved for many trees at once with one recursive CTE. On
+databases without ``WITH RECURSIVE`` they are walked hop by hop with batched
+``IN`` queries, so the query count follows chain length, not tree count.
+Chains are cut off at ``MAX_DEPTH`` hops, which also stops accidental cycles.
+
+Roots are cached per tree for ``LINEAGE_ROOT_CACHE_TTL`` seconds;
+``forget_chain`` (called from trees.signals whenever a ``replaced_by`` link
+changes) drops the cached roots downstream of the change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Tree
+
+
+MAX_DEPTH = 100
+BATCH_SIZE = 500
+CACHE_PREFIX = 'trees:lineage:root:'
+
+
+def supports_recursive_cte():
+    if connection.vendor in ('postgresql', 'sqlite'):
+        return True
+    # MySQL 8+ and MariaDB 10.2+ (reported as mysql)
+    return connection.vendor == 'mysql' and connection.mysql_version >= (8,)
+
+
+def _use_cte(use_cte):
+    return supports_recursive_cte() if use_cte is None else use_cte
+
+
+def _batches(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), BATCH_SIZE):
+        yield ids[i:i + BATCH_SIZE]
+
+
+def _names():
+    q = connection.ops.quote_name
+    return {
+        'table': q(Tree._meta.db_table),
+        'id': q(Tree._meta.pk.column),
+        'next': q(Tree._meta.get_field('replaced_by').column),
+        'status': q(Tree._meta.get_field('status').column),
+    }
+
+
+# -- forward: a tree to its tip ------------------------------------------------
+
+_SUCCESSORS_SQL = """
+WITH RECURSIVE chain (start_id, node_id, next_id, depth) AS (
+    SELECT {id}, {id}, {next}, 0 FROM {table} WHERE {id} IN ({ids})
+    UNION ALL
+    SELECT chain.start_id, t.{id}, t.{next}, chain.depth + 1
+    FROM chain JOIN {table} t ON t.{id} = chain.next_id
+    WHERE chain.depth < %s
+)
+SELECT start_id, node_id FROM chain ORDER BY start_id, depth
+"""
+
+
+def successors(tree_ids, use_cte=None):
+    """``{tree id: [tree id, its replacement, ..., tip]}`` for each existing tree."""
+    chains = {}
+    if _use_cte(use_cte):
+        for batch in _batches(tree_ids):
+            sql = _SUCCESSORS_SQL.format(ids=', '.join(['%s'] * len(batch)), **_names())
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [*batch, MAX_DEPTH])
+                for start, node in cursor.fetchall():
+                    chains.setdefault(start, []).append(node)
+        return chains
+
+    links = {}
+    frontier = set(tree_ids)
+    for _ in range(MAX_DEPTH + 1):
+        frontier -= links.keys()
+        if not frontier:
+            break
+        for batch in _batches(frontier):
+            links.update(Tree.objects.filter(pk__in=batch).values_list('pk', 'replaced_by_id'))
+        frontier = {links[pk] for pk in frontier if pk in links and links[pk] is not None}
+    for start in tree_ids:
+        if start not in links:
+            continue
+        chain = [start]
+        while links.get(chain[-1]) is not None and len(chain) <= MAX_DEPTH:
+            chain.append(links[chain[-1]])
+        chains[start] = chain
+    return chains
+
+
+# -- backward: a tree to its root ------------------------------------------------
+
+_PREDECESSORS_SQL = """
+WITH RECURSIVE up (start_id, node_id, prev_id, depth) AS (
+    SELECT {id}, {id}, {id}, 0 FROM {table} WHERE {id} IN ({ids})
+    UNION ALL
+    SELECT up.start_id, t.{id}, up.node_id, up.depth + 1
+    FROM up JOIN {table} t ON t.{next} = up.node_id
+    WHERE up.depth < %s
+)
+SELECT start_id, node_id, prev_id, depth FROM up
+"""
+
+
+def _pick_roots(edges):
+    """Root per start from ``{start: [(node, reached_from), ...]}`` edges.
+
+    A root is a reached node that no other node was reached from (it
+    replaced nothing); merged chains have several, the lowest id wins.
+    """
+    roots = {}
+    for start, pairs in edges.items():
+        has_predecessor = {prev for node, prev in pairs if node != prev}
+        # (a pure cycle has no root; treat the start as its own)
+        roots[start] = min((node for node, _ in pairs if node not in has_predecessor), default=start)
+    return roots
+
+
+def _find_roots(tree_ids, use_cte):
+    edges = {}
+    if _use_cte(use_cte):
+        for batch in _batches(tree_ids):
+            sql = _PREDECESSORS_SQL.format(ids=', '.join(['%s'] * len(batch)), **_names())
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [*batch, MAX_DEPTH])
+                for start, node, prev, depth in cursor.fetchall():
+                    edges.setdefault(start, []).append((node, prev if depth else node))
+        return _pick_roots(edges)
+
+    existing = set()
+    for batch in _batches(tree_ids):
+        existing.update(Tree.objects.filter(pk__in=batch).values_list('pk', flat=True))
+    replaced = {}  # replacement id -> ids of the trees it replaced
+    frontier = set(existing)
+    for _ in range(MAX_DEPTH):
+        frontier -= replaced.keys()
+        if not frontier:
+            break
+        found = {pk: [] for pk in frontier}
+        for batch in _batches(frontier):
+            for pk, replacement in Tree.objects.filter(replaced_by_id__in=batch).values_list('pk', 'replaced_by_id'):
+                found[replacement].append(pk)
+        replaced.update(found)
+        frontier = {pk for ids in found.values() for pk in ids}
+    for start in existing:
+        pairs, seen, todo = [(start, start)], {start}, [start]
+        while todo:
+            node = todo.pop()
+            for prev in replaced.get(node, ()):
+                pairs.append((prev, node))
+                if prev not in seen:
+                    seen.add(prev)
+                    todo.append(prev)
+        edges[start] = pairs
+    return _pick_roots(edges)
+
+
+def roots(tree_ids, use_cte=None):
+    """``{tree id: id of the original tree of its planting position}``, cached."""
+    tree_ids = list(dict.fromkeys(tree_ids))
+    cached = cache.get_many([CACHE_PREFIX + str(pk) for pk in tree_ids])
+    result = {pk: cached[CACHE_PREFIX + str(pk)] for pk in tree_ids if CACHE_PREFIX + str(pk) in cached}
+    missing = [pk for pk in tree_ids if pk not in result]
+    if missing:
+        found = _find_roots(missing, use_cte)
+        cache.set_many({CACHE_PREFIX + str(pk): root for pk, root in found.items()},
+                       getattr(settings, 'LINEAGE_ROOT_CACHE_TTL', 24 * 3600))
+        result.update(found)
+    return result
+
+
+def forget(tree_id):
+    cache.delete(CACHE_PREFIX + str(tree_id))
+
+
+def forget_chain(tree_id):
+    """Drop cached roots of ``tree_id`` and every tree downstream of it."""
+    if tree_id is None:
+        return
+    chain = successors([tree_id]).get(tree_id, [tree_id])
+    cache.delete_many([CACHE_PREFIX + str(pk) for pk in chain])
+
+
+# -- planting positions --------------------------------------------------------
+
+def lineage(tree, use_cte=None):
+    """The full planting position of ``tree``: root, chain of trees and current tip."""
+    root = roots([tree.pk], use_cte)[tree.pk]
+    chain = successors([root], use_cte)[root]
+    trees = Tree.objects.in_bulk(chain)
+    entries = [
+        {'id': pk, 'tree_id': trees[pk].tree_id, 'status': trees[pk].status,
+         'planting_date': trees[pk].planting_date, 'replaced_date': trees[pk].replaced_date}
+        for pk in chain if pk in trees
+    ]
+    tip = entries[-1]
+    return {
+        'root': root,
+        'tip': tip['id'],
+        'replacements': len(entries) - 1,
+        'effective_status': 'dead' if tip['status'] == 'dead' else 'alive',
+        'chain': entries,
+    }
+
+
+_SURVIVAL_SQL = """
+WITH RECURSIVE chain (root_id, node_id, next_id, depth) AS (
+    SELECT {id}, {id}, {next}, 0 FROM {table} WHERE {id} IN ({roots})
+    UNION ALL
+    SELECT chain.root_id, t.{id}, t.{next}, chain.depth + 1
+    FROM chain JOIN {table} t ON t.{id} = chain.next_id
+    WHERE chain.depth < %s
+)
+SELECT
+    SUM(CASE WHEN c.depth = 0 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN c.depth = 0 AND c.next_id IS NULL AND t.{status} <> %s THEN 1 ELSE 0 END),
+    SUM(CASE WHEN c.depth > 0 AND c.next_id IS NULL THEN 1 ELSE 0 END),
+    SUM(CASE WHEN c.next_id IS NULL AND t.{status} <> %s THEN 1 ELSE 0 END)
+FROM chain c JOIN {table} t ON t.{id} = c.node_id
+"""
+
+
+def _survival_counts(positions, use_cte):
+    """(positions, originals surviving, replanted positions, positions surviving)."""
+    if _use_cte(use_cte):
+        sql, params = positions.values('pk').query.sql_with_params()
+        query = _SURVIVAL_SQL.format(roots=sql, **_names())
+        with connection.cursor() as cursor:
+            cursor.execute(query, [*params, MAX_DEPTH, 'dead', 'dead'])
+            return tuple(v or 0 for v in cursor.fetchone())
+
+    rows = list(positions.values_list('pk', 'replaced_by_id', 'status'))
+    chains = successors([pk for pk, replaced_by, _ in rows if replaced_by is not None], use_cte=False)
+    tips = {}
+    for batch in _batches({chain[-1] for chain in chains.values()}):
+        tips.update((pk, (replaced_by, s)) for pk, replaced_by, s in
+                    Tree.objects.filter(pk__in=batch).values_list('pk', 'replaced_by_id', 'status'))
+    original = sum(1 for _, replaced_by, s in rows if replaced_by is None and s != 'dead')
+    # a chain cut off at MAX_DEPTH has no tip
+    replanted = [tips[chain[-1]][1] for chain in chains.values() if tips[chain[-1]][0] is None]
+    return len(rows), original, len(replanted), original + sum(1 for s in replanted if s != 'dead')
+
+
+def _percent(part, whole):
+    return round(part * 100.0 / whole, 2) if whole else None
+
+
+def effective_survival(qs=None, use_cte=None):
+    """Survival per planting position for the original trees in ``qs``.
+
+    ``survival_rate_percent`` counts only originals still standing;
+    ``effective_survival_rate_percent`` also counts positions whose latest
+    replacement is alive. Filters on ``qs`` apply to the original trees.
+    """
+    positions = (Tree.objects.all() if qs is None else qs).filter(replacements__isnull=True)
+    total, original, replanted, surviving = _survival_counts(positions, use_cte)
+    return {
+        'positions': total,
+        'replanted': replanted,
+        'original_surviving': original,
+        'surviving': surviving,
+        'survival_rate_percent': _percent(original, total),
+        'effective_survival_rate_percent': _percent(surviving, total),
+    }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trees import dedup
+
+
+class Command(BaseCommand):
+    help = 'Scan all trees for likely duplicates and add them to the review queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--rebuild-keys', action='store_true',
+                            help='Recompute every blocking key first (after upgrading or changing the key format)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        if options['rebuild_keys']:
+            self.stdout.write(f'{dedup.rebuild_keys(chunk_size=chunk_size)} blocking keys updated')
+        found = dedup.scan(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'{found} duplicate pairs found'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trees import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the TreeStatsRollup table from the tree table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many groups are out of date')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['dry_run']:
+            self.stdout.write(f'{stats.drift()} groups out of date')
+            return
+        wrong = stats.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Tree stats rebuilt ({wrong} groups corrected)'))
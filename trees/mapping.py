@@ -0,0 +1,106 @@
+"""Bounding-box and zoom aware tree map data.
+
+At low zoom trees are aggregated in the database into a fixed lat/lng grid
+whose cell size follows the zoom level, so the response size depends on the
+viewport rather than on the number of trees. Individual points are only
+returned once the viewport holds few enough trees to draw them.
+"""
+from django.db.models import Avg, Count, F, FloatField, Value
+from django.db.models.functions import Floor
+
+from .models import Tree
+
+
+# zoom from which individual trees are returned instead of clusters
+POINTS_MIN_ZOOM = 14
+# never return more points than this; denser viewports are clustered
+MAX_POINTS = 5000
+# grid cells per 256px map tile edge (a cluster roughly every 64px)
+CELLS_PER_TILE = 4
+MAX_ZOOM = 22
+
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+
+def parse_bbox(value):
+    """Parse ``'west,south,east,north'`` into floats; ``None`` means the whole world."""
+    if not value:
+        return WORLD
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be west,south,east,north')
+    west, south, east, north = parts
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError('bbox out of range')
+    return west, south, east, north
+
+
+def in_bbox(qs, bbox):
+    """Restrict ``qs`` to trees with coordinates inside ``bbox`` (geohash-indexed)."""
+    return qs.filter(latitude__isnull=False, longitude__isnull=False).within_bbox(*bbox)
+
+
+def cell_size(zoom):
+    """Grid cell edge in degrees for ``zoom``."""
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+
+def clusters(qs, zoom):
+    """Aggregate ``qs`` into grid cells with counts and status breakdowns."""
+    size = cell_size(zoom)
+    rows = (
+        qs.annotate(cx=Floor(F('longitude') / Value(size, output_field=FloatField())),
+                    cy=Floor(F('latitude') / Value(size, output_field=FloatField())))
+        .values('cx', 'cy', 'status')
+        .annotate(n=Count('id'), lat=Avg('latitude'), lng=Avg('longitude'))
+        .order_by()
+    )
+    cells = {}
+    for row in rows:
+        cell = cells.setdefault((row['cx'], row['cy']), {'count': 0, 'lat': 0.0, 'lng': 0.0, 'statuses': {}})
+        n = row['n']
+        cell['count'] += n
+        # accumulate weighted sums; turned into the centroid below
+        cell['lat'] += row['lat'] * n
+        cell['lng'] += row['lng'] * n
+        cell['statuses'][row['status']] = cell['statuses'].get(row['status'], 0) + n
+    result = []
+    for cell in cells.values():
+        cell['lat'] = round(cell['lat'] / cell['count'], 6)
+        cell['lng'] = round(cell['lng'] / cell['count'], 6)
+        result.append(cell)
+    result.sort(key=lambda c: -c['count'])
+    return result
+
+
+def points(qs, limit=MAX_POINTS):
+    """Return up to ``limit`` points, or ``None`` if the viewport holds more."""
+    rows = list(
+        qs.order_by('pk').values('id', 'tree_id', 'latitude', 'longitude', 'status', 'species__name')[:limit + 1]
+    )
+    if len(rows) > limit:
+        return None
+    return [
+        {'id': r['id'], 'tree_id': r['tree_id'], 'lat': r['latitude'], 'lng': r['longitude'],
+         'species': r['species__name'], 'status': r['status']}
+        for r in rows
+    ]
+
+
+def map_data(bbox=WORLD, zoom=0, filters=None):
+    """Map payload for a viewport: points at high zoom, clusters otherwise."""
+    zoom = max(0, min(int(zoom), MAX_ZOOM))
+    qs = in_bbox(Tree.objects.filter(**(filters or {})), bbox)
+    if zoom >= POINTS_MIN_ZOOM:
+        pts = points(qs)
+        if pts is not None:
+            return {'mode': 'points', 'zoom': zoom, 'bbox': list(bbox), 'count': len(pts), 'points': pts}
+    found = clusters(qs, zoom)
+    return {
+        'mode': 'clusters',
+        'zoom': zoom,
+        'bbox': list(bbox),
+        'count': sum(c['count'] for c in found),
+        'cell_size': cell_size(zoom),
+        'clusters': found,
+    }
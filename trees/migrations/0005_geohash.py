@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0004_treeimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tree',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+METRICS = ('height', 'canopy', 'diameter')
+CHUNK_SIZE = 500
+
+
+def compute_growth(apps, schema_editor):
+    # frozen copy of trees.growth.refresh_growth: each update's change per day
+    # since the tree's previous update (same-day remeasurements count as one day)
+    TreeUpdate = apps.get_model('trees', 'TreeUpdate')
+    values = [f'{m}_cm' for m in METRICS]
+    rates = [f'{m}_growth_per_day' for m in METRICS]
+    rows = TreeUpdate.objects.order_by('tree_id', 'date', 'id').values_list('id', 'tree_id', 'date', *values)
+    batch = []
+    prev = None
+    for pk, tree_id, date, *current in rows.iterator(chunk_size=CHUNK_SIZE):
+        if prev is not None and prev[0] == tree_id:
+            days = max((date - prev[1]).days, 1)
+            growth = [None if a is None or b is None else round((a - b) / days, 4) for a, b in zip(current, prev[2])]
+        else:
+            growth = [None] * len(METRICS)
+        prev = (tree_id, date, current)
+        if any(g is not None for g in growth):
+            batch.append(TreeUpdate(pk=pk, **dict(zip(rates, growth))))
+        if len(batch) >= CHUNK_SIZE:
+            TreeUpdate.objects.bulk_update(batch, rates)
+            batch = []
+    if batch:
+        TreeUpdate.objects.bulk_update(batch, rates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0005_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treeupdate',
+            name='canopy_growth_per_day',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='treeupdate',
+            name='diameter_growth_per_day',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='treeupdate',
+            name='height_growth_per_day',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='treeupdate',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(compute_growth, migrations.RunPython.noop),
+    ]
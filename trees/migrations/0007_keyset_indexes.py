@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0006_treeupdate_growth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tree',
+            index=models.Index(fields=['planting_date', 'id'], name='trees_tree_plantin_d89c21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treeupdate',
+            index=models.Index(fields=['date', 'id'], name='trees_treeu_date_8b38da_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollup(apps, schema_editor):
+    Tree = apps.get_model('trees', 'Tree')
+    TreeStatsRollup = apps.get_model('trees', 'TreeStatsRollup')
+    rows = (
+        Tree.objects.annotate(planting_month=TruncMonth('planting_date'))
+        .values('species_id', 'status', 'planting_month', 'beneficiary_id')
+        .annotate(tree_count=Count('id'), seedling_count=Sum('number_of_seedlings'))
+        .order_by()
+    )
+    TreeStatsRollup.objects.bulk_create(
+        [TreeStatsRollup(**dict(r, seedling_count=r['seedling_count'] or 0)) for r in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beneficiaries', '0003_geohash'),
+        ('trees', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreeStatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('alive', 'Alive'), ('dead', 'Dead'), ('replanted', 'Replanted')], max_length=16)),
+                ('planting_month', models.DateField()),
+                ('tree_count', models.IntegerField(default=0)),
+                ('seedling_count', models.IntegerField(default=0)),
+                ('beneficiary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='beneficiaries.beneficiary')),
+                ('species', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trees.treespecies')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('species', 'status', 'planting_month', 'beneficiary'), name='trees_stats_rollup_group'), models.UniqueConstraint(condition=models.Q(('species__isnull', True)), fields=('status', 'planting_month', 'beneficiary'), name='trees_stats_rollup_group_no_species')],
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0008_stats_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarbonSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('co2_kg', models.FloatField(default=0)),
+                ('projected_co2_kg', models.FloatField(default=0)),
+                ('horizon_years', models.PositiveSmallIntegerField(default=10)),
+                ('trees', models.PositiveIntegerField(default=0)),
+                ('seedlings', models.PositiveIntegerField(default=0)),
+                ('trees_without_rate', models.PositiveIntegerField(default=0)),
+                ('by_campaign', models.JSONField(blank=True, default=dict)),
+                ('by_beneficiary', models.JSONField(blank=True, default=dict)),
+                ('by_species', models.JSONField(blank=True, default=dict)),
+                ('by_region', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+    ]
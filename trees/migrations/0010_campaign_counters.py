@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def count_campaign_trees(apps, schema_editor):
+    Tree = apps.get_model('trees', 'Tree')
+    TreeCampaign = apps.get_model('trees', 'TreeCampaign')
+    rows = (
+        Tree.objects.filter(campaign__isnull=False).values('campaign_id')
+        .annotate(
+            trees=Count('id'),
+            seedlings=Sum('number_of_seedlings'),
+            alive=Count('id', filter=Q(status='alive')),
+            dead=Count('id', filter=Q(status='dead')),
+        )
+        .order_by()
+    )
+    for row in rows:
+        TreeCampaign.objects.filter(pk=row['campaign_id']).update(
+            tree_count=row['trees'], seedling_count=row['seedlings'] or 0,
+            alive_count=row['alive'], dead_count=row['dead'],
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0009_carbon_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treecampaign',
+            name='alive_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='treecampaign',
+            name='dead_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='treecampaign',
+            name='seedling_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='treecampaign',
+            name='tree_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_campaign_trees, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0010_campaign_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treeupdate',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
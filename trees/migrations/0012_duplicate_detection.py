@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0011_treeupdate_client_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tree',
+            name='dedup_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=48),
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_m', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dismissed', 'Dismissed')], db_index=True, default='pending', max_length=16)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('duplicate_of', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trees.tree')),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tree', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='trees.tree')),
+            ],
+            options={
+                'ordering': ['-detected_at', '-id'],
+                'constraints': [models.UniqueConstraint(fields=('tree', 'duplicate_of'), name='trees_duplicate_candidate_pair')],
+            },
+        ),
+    ]
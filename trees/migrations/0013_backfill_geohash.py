@@ -0,0 +1,64 @@
+from django.db import migrations
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+CHUNK_SIZE = 2000
+
+
+def encode(latitude, longitude, precision=9):
+    # frozen copy of core.geo.encode, so later changes there don't alter this migration
+    if latitude is None or longitude is None:
+        return ''
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value, lon_lo = (value << 1) | 1, mid
+            else:
+                value, lon_hi = value << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = (value << 1) | 1, mid
+            else:
+                value, lat_hi = value << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(model):
+    # rows with coordinates and no geohash, in pk-ordered chunks
+    qs = model.objects.filter(latitude__isnull=False, longitude__isnull=False, geohash='').order_by('pk')
+    last_pk = None
+    while True:
+        chunk = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', 'latitude', 'longitude')[:CHUNK_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        model.objects.bulk_update([model(pk=pk, geohash=encode(lat, lon)) for pk, lat, lon in rows], ['geohash'])
+
+
+def fill_geohash(apps, schema_editor):
+    # rows saved before the geohash column existed are invisible to
+    # within_bbox until their geohash is filled in
+    backfill_geohash(apps.get_model('trees', 'Tree'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0012_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
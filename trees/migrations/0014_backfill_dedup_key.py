@@ -0,0 +1,70 @@
+from django.db import migrations
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+CHUNK_SIZE = 2000
+
+
+def encode(latitude, longitude, precision=9):
+    # frozen copy of core.geo.encode, so later changes there don't alter this migration
+    if latitude is None or longitude is None:
+        return ''
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value, lon_lo = (value << 1) | 1, mid
+            else:
+                value, lon_hi = value << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = (value << 1) | 1, mid
+            else:
+                value, lat_hi = value << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def blocking_key(beneficiary_id, planting_date, latitude, longitude):
+    # frozen copy of trees.dedup.blocking_key
+    if beneficiary_id is None or planting_date is None or latitude is None or longitude is None:
+        return ''
+    year, week, _ = planting_date.isocalendar()
+    return f'{beneficiary_id}:{year}W{week:02d}:{encode(latitude, longitude, 7)}'
+
+
+def fill_dedup_key(apps, schema_editor):
+    # rows saved before the dedup_key column existed are skipped by
+    # dedup.scan and check_created until their key is filled in
+    Tree = apps.get_model('trees', 'Tree')
+    fields = ('pk', 'beneficiary_id', 'planting_date', 'latitude', 'longitude', 'dedup_key')
+    batch = []
+    for pk, ben, date, lat, lon, stored in Tree.objects.order_by('pk').values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        key = blocking_key(ben, date, lat, lon)
+        if key != stored:
+            batch.append(Tree(pk=pk, dedup_key=key))
+        if len(batch) >= CHUNK_SIZE:
+            Tree.objects.bulk_update(batch, ['dedup_key'])
+            batch = []
+    if batch:
+        Tree.objects.bulk_update(batch, ['dedup_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trees', '0013_backfill_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_dedup_key, migrations.RunPython.noop),
+    ]
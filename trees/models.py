@@ -1,10 +1,10 @@
 from django.db import models
 from beneficiaries.models import Beneficiary
+from core.geo import GeoQuerySet, encode as geohash_encode
 from django.conf import settings
+from django.urls import reverse
 import os
-import qrcode
-from io import BytesIO
-from django.core.files.base import ContentFile
+import uuid
 from django.utils import timezone
 try:
     from django.contrib.gis.db import models as geomodels
@@ -31,10 +31,22 @@ class TreeCampaign(models.Model):
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
     description = models.TextField(blank=True)
+    # denormalized progress counters, kept current by trees.campaigns
+    tree_count = models.IntegerField(default=0, editable=False)
+    seedling_count = models.IntegerField(default=0, editable=False)
+    alive_count = models.IntegerField(default=0, editable=False)
+    dead_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    @property
+    def progress(self):
+        """Seedlings planted as a percentage of ``target`` (None without a target)."""
+        if not self.target:
+            return None
+        return round(min(self.seedling_count, self.target) * 100.0 / self.target, 1)
+
 class Tree(models.Model):
     STATUS_CHOICES = [
         ('alive', 'Alive'),
@@ -51,6 +63,10 @@ class Tree(models.Model):
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='alive')
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # maintained from latitude/longitude for index-backed spatial lookups (core.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    # duplicate-detection blocking key (trees.dedup): beneficiary, planting week, coarse cell
+    dedup_key = models.CharField(max_length=48, blank=True, default='', db_index=True, editable=False)
     # optional GeoDjango point field (use PostGIS and GeoDjango for production spatial queries)
     if HAS_GEODJANGO:
         location = geomodels.PointField(null=True, blank=True)
@@ -62,9 +78,12 @@ class Tree(models.Model):
     replaced_by = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='replacements')
     replaced_date = models.DateField(null=True, blank=True)
 
+    objects = GeoQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=['planting_date']),
+            models.Index(fields=['planting_date', 'id']),
             models.Index(fields=['latitude', 'longitude']),
             models.Index(fields=['status']),
         ]
@@ -72,70 +91,192 @@ class Tree(models.Model):
     def __str__(self):
         return f"{self.tree_id} ({self.species})"
 
+    def get_absolute_url(self):
+        return reverse('trees:tree_detail', kwargs={'pk': self.pk})
+
     def save(self, *args, **kwargs):
         # Ensure tree_id
         if not self.tree_id:
             # simple unique id
             import uuid
             self.tree_id = f"TAWI-{uuid.uuid4().hex[:10].upper()}"
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        from .dedup import blocking_key
+        self.dedup_key = blocking_key(self.beneficiary_id, self.planting_date, self.latitude, self.longitude)
 
+        # QR images are rendered off-request by qrcodes.tasks.render_pending_qrcodes
         super().save(*args, **kwargs)
 
-        # generate QR if missing
-        if not self.qr_image:
-            try:
-                qr = qrcode.QRCode(version=1, box_size=10, border=4)
-                base = getattr(settings, 'SITE_BASE_URL', '')
-                target = (base.rstrip('/') if base else '') + f"/trees/{self.pk}/"
-                qr.add_data(target)
-                qr.make(fit=True)
-                img = qr.make_image(fill_color='black', back_color='white')
-                buf = BytesIO()
-                img.save(buf, format='PNG')
-                fname = f"{self.tree_id}.png"
-                self.qr_image.save(fname, ContentFile(buf.getvalue()), save=False)
-                buf.close()
-                super().save(update_fields=['qr_image'])
-            except Exception:
-                # fail silently in save to avoid blocking
-                pass
-
 class TreeUpdate(models.Model):
     tree = models.ForeignKey(Tree, on_delete=models.CASCADE, related_name='updates')
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=timezone.localdate)
     status = models.CharField(max_length=16, choices=Tree.STATUS_CHOICES)
     height_cm = models.FloatField(null=True, blank=True)
     canopy_cm = models.FloatField(null=True, blank=True)
     diameter_cm = models.FloatField(null=True, blank=True)
+    # change per day since the previous update of the same tree (trees.growth)
+    height_growth_per_day = models.FloatField(null=True, blank=True, editable=False)
+    canopy_growth_per_day = models.FloatField(null=True, blank=True, editable=False)
+    diameter_growth_per_day = models.FloatField(null=True, blank=True, editable=False)
     notes = models.TextField(blank=True)
     # link to media records
     media = models.ManyToManyField('media_app.Media', blank=True)
+    # idempotency key chosen by the device that recorded the update (trees.ingest)
+    client_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
 
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['date', 'id']),
+        ]
 
     @property
     def growth_rate_per_day(self):
-        # compute growth rate based on previous update height
-        try:
-            # prefer previous update with date <= this date
-            prev = None
-            qs = TreeUpdate.objects.filter(tree=self.tree).exclude(pk=self.pk).order_by('-date', '-id')
-            for candidate in qs:
-                if candidate.date <= self.date:
-                    prev = candidate
-                    break
-            if not prev:
-                # fallback to nearest by date (first/last)
-                prev = TreeUpdate.objects.filter(tree=self.tree).exclude(pk=self.pk).order_by('date', 'id').last()
-            if not prev or not self.height_cm or not prev.height_cm:
-                return None
-            days = (self.date - prev.date).days
-            if days <= 0:
-                days = 1
-            return round((self.height_cm - prev.height_cm) / days, 4)
-        except Exception:
-            return None
+        """Height growth (cm/day) since the tree's previous update.
+
+        Precomputed by ``trees.growth.refresh_growth`` whenever the tree's
+        updates change; reading it never queries.
+        """
+        return self.height_growth_per_day
 
     def __str__(self):
         return f"Update {self.id} for {self.tree.tree_id}"
+
+
+class DuplicateCandidate(models.Model):
+    """A pair of trees that look like the same planting, waiting for review.
+
+    Found by trees.dedup when a tree is created or by the batch scan;
+    ``tree`` is the newer row and ``duplicate_of`` the one it would be
+    merged into.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dismissed', 'Dismissed'),
+    ]
+    tree = models.ForeignKey(Tree, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    duplicate_of = models.ForeignKey(Tree, on_delete=models.CASCADE, related_name='+')
+    distance_m = models.FloatField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending', db_index=True)
+    detected_at = models.DateTimeField(auto_now_add=True)
+    reviewed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-detected_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['tree', 'duplicate_of'], name='trees_duplicate_candidate_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.tree_id} duplicates {self.duplicate_of_id} ({self.status})"
+
+
+class TreeStatsRollup(models.Model):
+    """Tree and seedling counts per (species, status, planting month, beneficiary).
+
+    Maintained incrementally by ``trees.stats`` as trees are created,
+    edited and deleted, so summary endpoints aggregate a few groups instead
+    of scanning every tree. ``rebuild_tree_stats`` recomputes it from scratch.
+    """
+    species = models.ForeignKey(TreeSpecies, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=16, choices=Tree.STATUS_CHOICES)
+    # first day of the planting month
+    planting_month = models.DateField()
+    beneficiary = models.ForeignKey(Beneficiary, on_delete=models.CASCADE, related_name='+')
+    tree_count = models.IntegerField(default=0)
+    seedling_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['species', 'status', 'planting_month', 'beneficiary'],
+                name='trees_stats_rollup_group',
+            ),
+            # NULLs never collide in a unique index; give trees without a species their own
+            models.UniqueConstraint(
+                fields=['status', 'planting_month', 'beneficiary'],
+                condition=models.Q(species__isnull=True),
+                name='trees_stats_rollup_group_no_species',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.species_id}/{self.status}/{self.planting_month:%Y-%m}/{self.beneficiary_id}: {self.tree_count}"
+
+
+class CarbonSnapshot(models.Model):
+    """Estimated CO2 sequestered by the whole inventory as of one day.
+
+    Written daily by ``trees.tasks.snapshot_carbon`` (see trees.carbon) so
+    current and historical totals are read, not recomputed. Breakdowns map
+    a campaign/beneficiary/species id (or region label) to
+    ``{'co2_kg', 'projected_co2_kg', 'trees'}``.
+    """
+    date = models.DateField(unique=True)
+    co2_kg = models.FloatField(default=0)
+    projected_co2_kg = models.FloatField(default=0)
+    horizon_years = models.PositiveSmallIntegerField(default=10)
+    trees = models.PositiveIntegerField(default=0)
+    seedlings = models.PositiveIntegerField(default=0)
+    trees_without_rate = models.PositiveIntegerField(default=0)
+    by_campaign = models.JSONField(default=dict, blank=True)
+    by_beneficiary = models.JSONField(default=dict, blank=True)
+    by_species = models.JSONField(default=dict, blank=True)
+    by_region = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"CO2 {self.date}: {self.co2_kg:.0f} kg"
+
+
+def tree_import_upload_to(instance, filename):
+    return f'imports/trees/{instance.pk}/{filename}'
+
+
+class TreeImportJob(models.Model):
+    """A bulk tree upload processed in the background.
+
+    ``rows_processed`` is the checkpoint: it only advances in the same
+    transaction that commits a chunk, so a worker that dies mid-import
+    resumes from the last committed chunk.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('validating', 'Validating'),
+        ('importing', 'Importing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    # cap on stored error rows so a broken sheet can't bloat the job record
+    MAX_ERRORS = 500
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to=tree_import_upload_to)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='tree_imports')
+    chunk_size = models.PositiveIntegerField(default=1000)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Tree import {self.pk} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100.0 if self.status == 'completed' else 0.0
+        return round(min(self.rows_processed, self.total_rows) * 100.0 / self.total_rows, 1)
@@ -0,0 +1,34 @@
+"""Cell parsing shared by the bulk tree import (trees.importer) and the
+batch update ingestion (trees.ingest).
+
+Values come from CSV/XLSX cells or JSON, so they may be strings with
+surrounding whitespace, numbers or date/datetime objects.
+"""
+import datetime
+
+from .models import Tree
+
+
+TREE_STATUSES = {key for key, _ in Tree.STATUS_CHOICES}
+
+
+def blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+
+def parse_int(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(str(value).strip())
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Tree, TreeUpdate, TreeSpecies
+from .models import DuplicateCandidate, Tree, TreeUpdate, TreeSpecies, TreeCampaign, TreeImportJob
 from media_app.serializers import MediaSerializer
+from beneficiaries.serializers import BeneficiarySerializer
+from core.fieldsets import SparseFieldsetSerializerMixin
 
 
 class TreeUpdateSerializer(serializers.ModelSerializer):
@@ -19,12 +21,15 @@ class TreeBulkCreateSerializer(serializers.Serializer):
             created.append(t)
         return created
 
-class TreeSerializer(serializers.ModelSerializer):
-    updates = TreeUpdateSerializer(many=True, read_only=True)
+class TreeCampaignSerializer(serializers.ModelSerializer):
+    """A campaign with its live progress counters (trees.campaigns)."""
+    progress_percent = serializers.FloatField(source='progress', read_only=True)
 
     class Meta:
-        model = Tree
-        fields = '__all__'
+        model = TreeCampaign
+        fields = ['id', 'name', 'description', 'target', 'start_date', 'end_date',
+                  'tree_count', 'seedling_count', 'alive_count', 'dead_count', 'progress_percent']
+        read_only_fields = fields
 
 
 class TreeSpeciesSerializer(serializers.ModelSerializer):
@@ -32,4 +37,42 @@ class TreeSpeciesSerializer(serializers.ModelSerializer):
         model = TreeSpecies
         fields = '__all__'
 
+
+class TreeSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Full tree with its updates; supports ``?fields=`` and ``?expand=`` (see core.fieldsets)."""
+    updates = TreeUpdateSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Tree
+        # geohash and dedup_key are index columns kept up to date by Tree.save()
+        exclude = ('geohash', 'dedup_key')
+        expandable = {
+            'species': (TreeSpeciesSerializer, 'species'),
+            'beneficiary': (BeneficiarySerializer, 'beneficiary'),
+        }
+        prefetch = {'updates': ['updates', 'updates__media']}
+
     
+
+
+class TreeImportJobSerializer(serializers.ModelSerializer):
+    created_by = serializers.StringRelatedField(read_only=True)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TreeImportJob
+        exclude = ('file',)
+        read_only_fields = [f.name for f in TreeImportJob._meta.fields]
+
+
+class DuplicateCandidateSerializer(serializers.ModelSerializer):
+    """A queued duplicate pair with enough of both trees to review it."""
+    tree_code = serializers.CharField(source='tree.tree_id', read_only=True)
+    duplicate_of_code = serializers.CharField(source='duplicate_of.tree_id', read_only=True)
+    reviewed_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = DuplicateCandidate
+        fields = ['id', 'tree', 'tree_code', 'duplicate_of', 'duplicate_of_code', 'distance_m', 'status',
+                  'detected_at', 'reviewed_by', 'reviewed_at']
+        read_only_fields = fields
@@ -1,16 +1,20 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Tree
+from core.bulk import defer, delete_files
+from .models import Tree, TreeSpecies, TreeUpdate
 
 
 @receiver(post_delete, sender=Tree)
 def delete_tree_qr_image(sender, instance, **kwargs):
-    """Remove the Tree.qr_image file from storage when a Tree is deleted."""
-    try:
-        if instance.qr_image:
-            instance.qr_image.delete(save=False)
-    except Exception:
-        pass
+    """Remove the Tree.qr_image file from storage when a Tree is deleted.
+
+    Images under ``qrcodes/`` belong to the tree's QRCode record, which
+    outlives the tree, so they are left in place. Within a bulk operation
+    the files are removed together once it commits (core.bulk).
+    """
+    image = instance.qr_image
+    if image and not image.name.startswith('qrcodes/'):
+        defer(delete_files, [(image.storage, image.name)])
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Tree
@@ -18,28 +22,94 @@ from .models import Tree
 
 @receiver(post_save, sender=Tree)
 def ensure_qrcode_for_tree(sender, instance, created, **kwargs):
-    """Ensure a QRCode record exists for each Tree and generate its image.
+    """Queue QR rendering for trees that don't have their image yet.
 
-    This runs after a Tree is saved. If no QRCode exists linking to this
-    Tree, create one and generate the PNG image using the QRCode model's
-    helper. This keeps a canonical QRCode record separate from the
-    Tree.qr_image ImageField which is intended as a simple inline image.
+    Nothing is rendered or written here: once the transaction commits a
+    worker creates the canonical QRCode record and renders images in
+    batches (see qrcodes.tasks.render_pending_qrcodes).
     """
     try:
         # avoid importing at module import time to reduce startup coupling
-        from qrcodes.models import QRCode
+        from qrcodes.tasks import queue_qr_render, store_images
+        if not created and (instance.qr_image or not store_images()):
+            return
+        defer(queue_qr_render)
     except Exception:
+        # don't let QR failures break tree saves
         return
 
-    try:
-        # if there is already a QRCode for this tree, ensure it has an image
-        q = QRCode.objects.filter(tree=instance).first()
-        if q is None:
-            q = QRCode.objects.create(tree=instance, label=str(instance.tree_id))
-        # generate image if missing
-        if not q.image:
-            q.generate_image()
-            q.save(update_fields=['image'])
-    except Exception:
-        # don't let QR failures break tree saves
+
+@receiver(post_save, sender=TreeUpdate)
+@receiver(post_delete, sender=TreeUpdate)
+def refresh_tree_growth(sender, instance, origin=None, **kwargs):
+    """Keep the stored growth rates of the tree's updates current.
+
+    Adding, editing or removing an update can change its own rate and the
+    rate of the update after it, so the tree's updates are recomputed in one
+    window query, once per tree within a bulk operation (core.bulk). Updates
+    deleted along with their tree are skipped. The saved instance isn't
+    refreshed; callers that return its rates read them back.
+    """
+    if origin is not None and not isinstance(origin, TreeUpdate) and getattr(origin, 'model', None) is not TreeUpdate:
+        # cascaded from deleting the tree (or its beneficiary): nothing to recompute
+        return
+    from .growth import refresh_growth
+    defer(refresh_growth, [instance.tree_id])
+
+
+@receiver(pre_save, sender=Tree)
+def remember_stored_tree(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the tree's stored counters-relevant fields before they are overwritten.
+
+    New trees have nothing stored, and saves that write none of those fields
+    don't move any counters, so neither reads the row.
+    """
+    from . import stats
+    if instance._state.adding or not stats.tracked(update_fields):
+        instance._stored_tree = None
+    else:
+        instance._stored_tree = stats.stored_tree(instance.pk)
+
+
+@receiver(post_save, sender=Tree)
+def update_tree_counters_on_save(sender, instance, update_fields=None, **kwargs):
+    """Move the tree between TreeStatsRollup groups and campaign counters.
+
+    See trees.stats and trees.campaigns. A changed ``replaced_by`` link also
+    drops the cached lineage roots downstream of it (trees.lineage).
+    """
+    from . import campaigns, lineage, stats
+    if not stats.tracked(update_fields):
         return
+    old = getattr(instance, '_stored_tree', None)
+    new = stats.saved_tree(instance, old, update_fields)
+    stats.tree_changed(old, new)
+    campaigns.tree_changed(old, new)
+    old_link = old.replaced_by_id if old is not None else None
+    if new is not None and new.replaced_by_id != old_link:
+        lineage.forget_chain(old_link)
+        lineage.forget_chain(new.replaced_by_id)
+
+
+@receiver(post_save, sender=Tree)
+def queue_duplicate_candidates(sender, instance, created, raw=False, **kwargs):
+    """Check a new tree against its blocking key's neighbourhood (trees.dedup)."""
+    if created and not raw:
+        from . import dedup
+        dedup.check_created([instance])
+
+
+@receiver(post_delete, sender=Tree)
+def update_tree_counters_on_delete(sender, instance, **kwargs):
+    from . import campaigns, lineage, stats
+    stats.tree_changed(instance, None)
+    campaigns.tree_changed(instance, None)
+    lineage.forget_chain(instance.__dict__.get('replaced_by_id'))
+    lineage.forget(instance.pk)
+
+
+@receiver(pre_delete, sender=TreeSpecies)
+def fold_species_stats(sender, instance, **kwargs):
+    """The species' trees are kept with no species; keep their counts too."""
+    from . import stats
+    stats.fold_species(instance.pk)
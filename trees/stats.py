@@ -0,0 +1,179 @@
+"""Incrementally maintained tree statistics (``TreeStatsRollup``).
+
+Every tree belongs to one group: (species, status, planting month,
+beneficiary). The rollup keeps ``tree_count``/``seedling_count`` per group
+and the signal handlers in ``trees.signals`` apply +1/-1 deltas as trees
+are created, edited and deleted, so the summary endpoints aggregate
+O(groups) rows instead of scanning the tree table. Bulk inserts that skip
+signals call ``record_created``; ``rebuild`` recomputes everything.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Tree, TreeStatsRollup
+
+
+GROUP_FIELDS = ('species_id', 'status', 'planting_month', 'beneficiary_id')
+# Tree attnames the rollup, campaign counters (trees.campaigns) and cached
+# lineage roots (trees.lineage) depend on
+TRACKED_FIELDS = ('species_id', 'status', 'planting_date', 'beneficiary_id', 'number_of_seedlings', 'campaign_id',
+                  'replaced_by_id')
+
+
+def _month(value):
+    # unsaved instances may still hold the string that was assigned
+    value = Tree._meta.get_field('planting_date').to_python(value)
+    return value.replace(day=1) if value is not None else None
+
+
+def loaded(tree):
+    """Whether every tracked field of ``tree`` is loaded (not deferred)."""
+    return tree is not None and all(name in tree.__dict__ for name in TRACKED_FIELDS)
+
+
+def snapshot(tree):
+    """``(group, seedlings)`` for a tree, or None if a tracked field isn't loaded."""
+    if tree is None:
+        return None
+    values = tree.__dict__
+    if any(name not in values for name in TRACKED_FIELDS):
+        return None
+    if values['beneficiary_id'] is None or values['planting_date'] is None:
+        return None
+    group = (values['species_id'], values['status'], _month(values['planting_date']), values['beneficiary_id'])
+    return group, int(values['number_of_seedlings'] or 0)
+
+
+def tracked(update_fields):
+    """Whether saving ``update_fields`` (None: every field) can change a tracked field."""
+    if update_fields is None:
+        return True
+    return any(Tree._meta.get_field(name).attname in TRACKED_FIELDS for name in update_fields)
+
+
+def stored_tree(pk):
+    """The tracked fields of a tree as currently stored (an unsaved Tree), or None."""
+    row = Tree.objects.filter(pk=pk).values(*TRACKED_FIELDS).first()
+    return None if row is None else Tree(pk=pk, **row)
+
+
+def saved_tree(tree, old, update_fields=None):
+    """The tracked fields of ``tree`` as its save stored them.
+
+    Fields the save didn't write (outside ``update_fields``, or deferred) keep
+    their value from ``old``, the tree as stored before the save; the row is
+    only read back when that isn't known.
+    """
+    if update_fields is None and loaded(tree):
+        return tree
+    if old is None:
+        return stored_tree(tree.pk)
+    values = tree.__dict__
+    written = set(values) if update_fields is None else {Tree._meta.get_field(name).attname for name in update_fields}
+    return Tree(pk=tree.pk, **{name: values[name] if name in written and name in values else old.__dict__[name]
+                               for name in TRACKED_FIELDS})
+
+
+def apply_deltas(deltas):
+    """Add ``{group: (trees, seedlings)}`` deltas to the rollup.
+
+    Rows are updated in place with F-expressions; a group seen for the first
+    time is created. Negative deltas never create rows: the group may already
+    be gone with its beneficiary or species.
+    """
+    for group, (trees, seedlings) in deltas.items():
+        if not trees and not seedlings:
+            continue
+        lookup = dict(zip(GROUP_FIELDS, group))
+        updates = {'tree_count': F('tree_count') + trees, 'seedling_count': F('seedling_count') + seedlings}
+        if TreeStatsRollup.objects.filter(**lookup).update(**updates) or trees < 0:
+            continue
+        try:
+            with transaction.atomic():
+                TreeStatsRollup.objects.create(tree_count=trees, seedling_count=seedlings, **lookup)
+        except IntegrityError:
+            # created concurrently; add to that row instead
+            TreeStatsRollup.objects.filter(**lookup).update(**updates)
+
+
+def tree_changed(old, new):
+    """Apply the change between two tree states (either may be None)."""
+    old, new = snapshot(old), snapshot(new)
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    if old is not None:
+        deltas[old[0]][0] -= 1
+        deltas[old[0]][1] -= old[1]
+    if new is not None:
+        deltas[new[0]][0] += 1
+        deltas[new[0]][1] += new[1]
+    apply_deltas(deltas)
+
+
+def record_created(trees):
+    """Count trees inserted without signals (``bulk_create``)."""
+    deltas = defaultdict(lambda: [0, 0])
+    for tree in trees:
+        snap = snapshot(tree)
+        if snap is not None:
+            deltas[snap[0]][0] += 1
+            deltas[snap[0]][1] += snap[1]
+    apply_deltas(deltas)
+
+
+def fold_species(species_id):
+    """Move a species' groups to "no species" before the species is deleted.
+
+    Its trees keep existing with ``species=NULL``, but the rollup rows
+    cascade with the species.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    rows = TreeStatsRollup.objects.filter(species_id=species_id).values_list(*GROUP_FIELDS[1:], 'tree_count', 'seedling_count')
+    for status, month, beneficiary_id, trees, seedlings in rows:
+        group = (None, status, month, beneficiary_id)
+        deltas[group][0] += trees
+        deltas[group][1] += seedlings
+    apply_deltas(deltas)
+
+
+def computed_rows():
+    """The rollup as it should be, computed from the tree table."""
+    rows = (
+        Tree.objects.annotate(planting_month=TruncMonth('planting_date'))
+        .values('species_id', 'status', 'planting_month', 'beneficiary_id')
+        .annotate(tree_count=Count('id'), seedling_count=Sum('number_of_seedlings'))
+        .order_by()
+    )
+    return {tuple(r[f] for f in GROUP_FIELDS): (r['tree_count'], r['seedling_count'] or 0) for r in rows}
+
+
+def stored_rows():
+    rows = TreeStatsRollup.objects.filter(tree_count__gt=0).values_list(*GROUP_FIELDS, 'tree_count', 'seedling_count')
+    return {tuple(r[:4]): tuple(r[4:]) for r in rows}
+
+
+def drift(expected=None, current=None):
+    """Number of groups whose stored counts differ from the tree table."""
+    expected = computed_rows() if expected is None else expected
+    current = stored_rows() if current is None else current
+    return sum(1 for group in expected.keys() | current.keys() if expected.get(group) != current.get(group))
+
+
+def rebuild(batch_size=1000):
+    """Recompute the whole rollup from the tree table in one transaction.
+
+    Returns the number of groups whose counts were wrong or missing.
+    """
+    with transaction.atomic():
+        expected = computed_rows()
+        wrong = drift(expected, stored_rows())
+        TreeStatsRollup.objects.all().delete()
+        TreeStatsRollup.objects.bulk_create(
+            [TreeStatsRollup(tree_count=t, seedling_count=s, **dict(zip(GROUP_FIELDS, group))) for group, (t, s) in expected.items()],
+            batch_size=batch_size,
+        )
+    return wrong
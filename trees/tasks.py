@@ -1,24 +1,238 @@
+import logging
+from itertools import islice
+
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Max, Q
+from django.db.models.functions import Lower
 from django.utils import timezone
-from .models import Tree, TreeUpdate
+from beneficiaries.models import Beneficiary
+from .models import Tree, TreeImportJob
 from django.core.mail import send_mail
 from notifications.models import Notification
 
+logger = logging.getLogger(__name__)
+
+
+# digests list at most this many tree ids; the count covers the rest
+REMINDER_SAMPLE_SIZE = 20
+REMINDER_BATCH_SIZE = 500
+
+
+def stale_trees(days_without=30):
+    """Living trees whose latest update (or planting, if never updated) is older than the cutoff."""
+    cutoff = timezone.now().date() - timezone.timedelta(days=days_without)
+    return (
+        Tree.objects.exclude(status='dead')
+        .annotate(last_update=Max('updates__date'))
+        .filter(Q(last_update__lt=cutoff) | Q(last_update__isnull=True, planting_date__lt=cutoff))
+    )
+
 
 @shared_task
 def remind_missing_updates(days_without=30):
-    cutoff = timezone.now().date() - timezone.timedelta(days=days_without)
-    trees = Tree.objects.filter(updates__date__lt=cutoff).distinct()
-    # create notifications for each tree owner/beneficiary contact if available
-    created = 0
-    for t in trees:
-        # simplistic: notify the beneficiary user if they are a user (assuming Beneficiary has user relation)
-        recipient = None
+    """Send each responsible user one digest of their trees that lack recent updates.
+
+    Trees are matched to users through their beneficiary's ``contact_email``.
+    The whole run is a fixed number of queries: stale trees are streamed from
+    one grouped query, recipients resolved in bulk and digests written with
+    ``bulk_create``. Users who already got today's digest are skipped.
+    """
+    from django.contrib.auth import get_user_model
+
+    by_beneficiary = {}
+    total = 0
+    rows = stale_trees(days_without).order_by('beneficiary_id', 'tree_id').values_list('beneficiary_id', 'tree_id')
+    for ben_id, tree_id in rows.iterator(chunk_size=2000):
+        total += 1
+        entry = by_beneficiary.setdefault(ben_id, [0, []])
+        entry[0] += 1
+        if len(entry[1]) < REMINDER_SAMPLE_SIZE:
+            entry[1].append(tree_id)
+    if not by_beneficiary:
+        return {'count': 0, 'recipients': 0, 'notifications_created': 0, 'unassigned': 0}
+
+    emails = {
+        pk: email.strip().lower()
+        for pk, email in Beneficiary.objects.filter(pk__in=by_beneficiary).exclude(contact_email='')
+        .values_list('pk', 'contact_email')
+    }
+    users = dict(
+        get_user_model().objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=set(emails.values()), is_active=True)
+        .values_list('email_lower', 'pk')
+    )
+    digests = {}
+    unassigned = 0
+    for ben_id, (count, sample) in by_beneficiary.items():
+        user_id = users.get(emails.get(ben_id))
+        if user_id is None:
+            unassigned += count
+            continue
+        digest = digests.setdefault(user_id, {'count': 0, 'trees': [], 'beneficiaries': []})
+        digest['count'] += count
+        digest['beneficiaries'].append(ben_id)
+        digest['trees'].extend(sample[:REMINDER_SAMPLE_SIZE - len(digest['trees'])])
+
+    today = timezone.localdate()
+    already = set(
+        Notification.objects.filter(verb='missing_update', created_at__date=today, recipient_id__in=digests)
+        .values_list('recipient_id', flat=True)
+    )
+    notifications = [
+        Notification(
+            recipient_id=user_id,
+            verb='missing_update',
+            level='warning',
+            description=f"{d['count']} tree{'s' if d['count'] != 1 else ''} ha{'ve' if d['count'] != 1 else 's'} not been updated for {days_without} days",
+            metadata={'tree_count': d['count'], 'trees': d['trees'], 'beneficiaries': d['beneficiaries'], 'days_without': days_without},
+        )
+        for user_id, d in digests.items() if user_id not in already
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=REMINDER_BATCH_SIZE)
+    return {'count': total, 'recipients': len(digests), 'notifications_created': len(notifications), 'unassigned': unassigned}
+
+
+@shared_task
+def snapshot_carbon():
+    """Store today's CO2 estimate (trees.carbon) for the dashboard and reports."""
+    from .carbon import take_snapshot
+    snapshot = take_snapshot()
+    return {'date': snapshot.date.isoformat(), 'co2_kg': snapshot.co2_kg, 'trees': snapshot.trees}
+
+
+@shared_task
+def reconcile_campaign_counters():
+    """Correct campaign progress counters that drifted from the tree table (trees.campaigns)."""
+    from .campaigns import reconcile
+    corrected = reconcile()
+    if corrected:
+        logger.warning('reconcile_campaign_counters corrected %d campaigns', corrected)
+    return {'corrected': corrected}
+
+
+@shared_task
+def scan_duplicate_trees():
+    """Queue likely duplicate trees for review (trees.dedup)."""
+    from .dedup import scan
+    return {'pairs': scan()}
+
+
+# an import whose worker has not checkpointed for this long is considered
+# abandoned and is handed to a new worker by resume_tree_imports
+IMPORT_STALL_MINUTES = 10
+
+
+class _CheckpointConflict(Exception):
+    """Another worker already committed the chunk this one was importing."""
+
+
+def dispatch_tree_import(job):
+    """Queue ``process_tree_import`` for a job.
+
+    A broker outage must not lose the upload: the job stays ``pending`` and
+    ``resume_tree_imports`` picks it up on its next run.
+    """
+    try:
+        process_tree_import.delay(str(job.pk))
+        return True
+    except Exception:
+        logger.exception('could not queue tree import %s', job.pk)
+        return False
+
+
+def _record_errors(job, errors):
+    room = TreeImportJob.MAX_ERRORS - len(job.errors)
+    if room > 0:
+        job.errors = job.errors + errors[:room]
+    job.error_count += len(errors)
+
+
+def _job_rows(job, start=0):
+    from . import importer
+    job.file.open('rb')
+    rows = importer.iter_upload_rows(job.file)
+    return islice(rows, start, None)
+
+
+@shared_task(acks_late=True)
+def process_tree_import(job_id):
+    """Validate then import an uploaded sheet in committed, checkpointed chunks."""
+    from . import importer
+
+    job = TreeImportJob.objects.filter(pk=job_id).first()
+    if job is None or job.status in ('completed', 'failed'):
+        return {'status': getattr(job, 'status', 'missing')}
+
+    try:
+        if job.status in ('pending', 'validating'):
+            job.status = 'validating'
+            job.save(update_fields=['status', 'updated_at'])
+            report = importer.validate_rows(_job_rows(job), chunk_size=job.chunk_size, sample_size=0)
+            job.total_rows = report['rows_parsed']
+            if report['errors']:
+                _record_errors(job, report['errors'])
+                job.status = 'failed'
+                job.message = 'validation failed'
+                job.finished_at = timezone.now()
+                job.save()
+                return {'status': job.status, 'errors': job.error_count}
+            job.status = 'importing'
+            job.save(update_fields=['status', 'total_rows', 'updated_at'])
+
+        # resume after the last committed chunk
+        offset = job.rows_processed
+        chunks = importer.iter_checked_chunks(_job_rows(job, offset), chunk_size=job.chunk_size, start=offset + 1)
+        for raw, trees, errors in chunks:
+            with transaction.atomic():
+                ids, insert_errors = importer.insert_chunk(trees) if trees else ([], [])
+                if ids:
+                    importer.finalize_import(ids, purge_cache=False)
+                _record_errors(job, errors + insert_errors)
+                job.created_count += len(ids)
+                # the checkpoint only moves if nobody else advanced it; a
+                # second worker on the same job rolls its chunk back here
+                advanced = TreeImportJob.objects.filter(pk=job.pk, rows_processed=offset).update(
+                    rows_processed=offset + len(raw),
+                    created_count=job.created_count,
+                    error_count=job.error_count,
+                    errors=job.errors,
+                    updated_at=timezone.now(),
+                )
+                if not advanced:
+                    raise _CheckpointConflict()
+            offset += len(raw)
+            job.rows_processed = offset
+    except _CheckpointConflict:
+        return {'status': 'superseded'}
+    except Exception as exc:
+        logger.exception('tree import %s failed', job.pk)
+        TreeImportJob.objects.filter(pk=job.pk).update(status='failed', message=str(exc)[:255], finished_at=timezone.now())
+        return {'status': 'failed', 'error': str(exc)}
+    finally:
         try:
-            recipient = getattr(t.beneficiary, 'user', None)
+            job.file.close()
         except Exception:
-            recipient = None
-        if recipient:
-            Notification.objects.create(recipient=recipient, verb='missing_update', description=f'Tree {t.tree_id} has not been updated for {days_without} days', metadata={'tree': str(t.pk)})
-            created += 1
-    return {'count': trees.count(), 'notifications_created': created}
+            pass
+
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    try:
+        from dashboard.signals import invalidate_dashboard_cache
+        invalidate_dashboard_cache()
+    except Exception:
+        pass
+    return {'status': job.status, 'created': job.created_count, 'errors': job.error_count}
+
+
+@shared_task
+def resume_tree_imports():
+    """Re-queue imports that were never dispatched or whose worker died."""
+    stale = timezone.now() - timezone.timedelta(minutes=IMPORT_STALL_MINUTES)
+    jobs = TreeImportJob.objects.filter(status__in=['pending', 'validating', 'importing'], updated_at__lt=stale)
+    resumed = 0
+    for job in jobs:
+        if dispatch_tree_import(job):
+            resumed += 1
+    return {'resumed': resumed}
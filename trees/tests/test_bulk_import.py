@@ -2,8 +2,11 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from beneficiaries.models import Beneficiary
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+import tempfile
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class BulkImportTest(TestCase):
     def setUp(self):
         User = get_user_model()
@@ -19,3 +22,74 @@ class BulkImportTest(TestCase):
         j = resp.json()
         self.assertTrue(j.get('valid'))
         self.assertEqual(j.get('rows_parsed'), 2)
+
+    def test_csv_import_creates_trees_in_bulk(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from trees.models import Tree, TreeSpecies
+        from qrcodes.models import QRCode
+        TreeSpecies.objects.create(name='Grevillea')
+        lines = ['tree_id,planting_date,beneficiary,species,number_of_seedlings']
+        lines += ['C%d,2024-03-01,%d,grevillea,2' % (i, self.ben.pk) for i in range(50)]
+        f = SimpleUploadedFile('trees.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post('/api/trees/bulk_create/', {'file': f})
+        # uploads become background jobs (run inline by eager Celery in tests)
+        self.assertEqual(resp.status_code, 202)
+        job = self.client.get('/api/tree-imports/%s/' % resp.json()['id']).json()
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['created_count'], 50)
+        self.assertEqual(job['progress'], 100.0)
+        self.assertEqual(Tree.objects.filter(species__name='Grevillea', number_of_seedlings=2).count(), 50)
+        self.assertEqual(QRCode.objects.filter(tree__tree_id__startswith='C').count(), 50)
+        # row count must not drive the number of queries
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_xlsx_import(self):
+        import io
+        import openpyxl
+        from trees.models import Tree
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(['tree_id', 'planting_date', 'beneficiary'])
+        ws.append(['X1', '2024-01-01', self.ben.pk])
+        ws.append(['X2', '2024-01-02', self.ben.pk])
+        buf = io.BytesIO()
+        wb.save(buf)
+        f = SimpleUploadedFile('trees.xlsx', buf.getvalue())
+        resp = self.client.post('/api/trees/bulk_create/', {'file': f})
+        self.assertEqual(resp.status_code, 202)
+        self.assertTrue(Tree.objects.filter(tree_id__in=['X1', 'X2']).count() == 2)
+
+    def test_invalid_rows_are_reported_and_nothing_is_created(self):
+        from trees.models import Tree
+        csv_content = 'tree_id,planting_date,beneficiary\nD1,2024-01-01,%d\nD1,2024-01-01,%d\nD3,not-a-date,999999\n' % (self.ben.pk, self.ben.pk)
+        f = SimpleUploadedFile('trees.csv', csv_content.encode('utf-8'), content_type='text/csv')
+        resp = self.client.post('/api/trees/bulk_create/', {'file': f})
+        self.assertEqual(resp.status_code, 202)
+        job = self.client.get('/api/tree-imports/%s/' % resp.json()['id']).json()
+        self.assertEqual(job['status'], 'failed')
+        errors = {(e['row'], e['error']) for e in job['errors']}
+        self.assertIn((2, 'duplicate tree_id'), errors)
+        self.assertIn((3, 'unknown beneficiary'), errors)
+        self.assertIn((3, 'invalid planting_date'), errors)
+        self.assertFalse(Tree.objects.filter(tree_id__startswith='D').exists())
+
+    def test_import_job_resumes_from_checkpoint(self):
+        from django.core.files.base import ContentFile
+        from trees.models import Tree, TreeImportJob
+        from trees.tasks import process_tree_import
+        lines = ['tree_id,planting_date,beneficiary'] + ['R%d,2024-01-01,%d' % (i, self.ben.pk) for i in range(10)]
+        job = TreeImportJob(created_by=self.admin, chunk_size=4, status='importing', total_rows=10)
+        job.file.save('resume.csv', ContentFile('\n'.join(lines).encode('utf-8')), save=False)
+        # pretend a worker committed the first chunk and then died
+        job.rows_processed = 4
+        job.save()
+        Tree.objects.bulk_create([Tree(tree_id='R%d' % i, planting_date='2024-01-01', beneficiary=self.ben) for i in range(4)])
+        result = process_tree_import(str(job.pk))
+        self.assertEqual(result['status'], 'completed')
+        job.refresh_from_db()
+        self.assertEqual(job.rows_processed, 10)
+        self.assertEqual(job.created_count, 6)
+        self.assertEqual(job.error_count, 0)
+        self.assertEqual(Tree.objects.filter(tree_id__startswith='R').count(), 10)
@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from trees import campaigns, importer
+from trees.models import Tree, TreeCampaign
+
+
+class CampaignCounterTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Campaign School', type='school')
+        self.spring = TreeCampaign.objects.create(name='Spring', target=20)
+        self.autumn = TreeCampaign.objects.create(name='Autumn')
+
+    def plant(self, tree_id, campaign, status='alive', seedlings=1):
+        return Tree.objects.create(tree_id=tree_id, planting_date='2024-03-01', beneficiary=self.ben,
+                                   campaign=campaign, status=status, number_of_seedlings=seedlings)
+
+    def counters(self, campaign):
+        campaign.refresh_from_db()
+        return tuple(getattr(campaign, f) for f in campaigns.COUNTER_FIELDS)
+
+    def test_counters_follow_tree_changes(self):
+        tree = self.plant('C1', self.spring, seedlings=4)
+        self.plant('C2', self.spring, status='dead')
+        self.assertEqual(self.counters(self.spring), (2, 5, 1, 1))
+        self.assertEqual(self.spring.progress, 25.0)
+
+        tree.status = 'dead'
+        tree.save()
+        self.assertEqual(self.counters(self.spring), (2, 5, 0, 2))
+
+        tree.campaign = self.autumn
+        tree.save()
+        self.assertEqual(self.counters(self.spring), (1, 1, 0, 1))
+        self.assertEqual(self.counters(self.autumn), (1, 4, 0, 1))
+        self.assertIsNone(self.autumn.progress)
+
+        tree.delete()
+        self.assertEqual(self.counters(self.autumn), (0, 0, 0, 0))
+
+    def test_import_and_reconcile(self):
+        rows = [{'tree_id': f'I{i}', 'planting_date': '2024-03-05', 'beneficiary': str(self.ben.pk),
+                 'campaign': 'Spring', 'number_of_seedlings': '2'} for i in range(5)]
+        self.assertEqual(importer.import_rows(rows, finalize=False)['created'], 5)
+        self.assertEqual(self.counters(self.spring), (5, 10, 5, 0))
+
+        # writes that bypass signals drift until the periodic reconcile
+        Tree.objects.filter(tree_id='I0').update(status='dead')
+        TreeCampaign.objects.filter(pk=self.autumn.pk).update(tree_count=3)
+        self.assertEqual(campaigns.reconcile(), 2)
+        self.assertEqual(self.counters(self.spring), (5, 10, 4, 1))
+        self.assertEqual(self.counters(self.autumn), (0, 0, 0, 0))
+        self.assertEqual(campaigns.reconcile(), 0)
+
+    def test_public_progress_api(self):
+        self.plant('C1', self.spring, seedlings=30)
+        with self.assertNumQueries(2):
+            # the page count and the campaign rows; no tree aggregation
+            resp = self.client.get('/api/campaigns/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('max-age=60', resp['Cache-Control'])
+        spring = next(c for c in resp.json()['results'] if c['name'] == 'Spring')
+        self.assertEqual((spring['tree_count'], spring['seedling_count'], spring['progress_percent']), (1, 30, 100.0))
+        detail = self.client.get(f'/api/campaigns/{self.autumn.pk}/').json()
+        self.assertIsNone(detail['progress_percent'])
+        self.assertEqual(self.client.post('/api/campaigns/', {'name': 'x'}).status_code, 405)
@@ -0,0 +1,87 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from beneficiaries.models import Beneficiary
+from reports.models import GeneratedReport
+from trees import carbon
+from trees.models import CarbonSnapshot, Tree, TreeCampaign, TreeSpecies, TreeUpdate
+
+
+AS_OF = datetime.date(2024, 1, 1)
+
+
+class CarbonEstimateTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Carbon School', type='school', address='Kisumu County')
+        other = Beneficiary.objects.create(name='Carbon Church', type='church', address='Nakuru County')
+        self.acacia = TreeSpecies.objects.create(name='Acacia', co2_estimate_kg_per_year=10)
+        unknown = TreeSpecies.objects.create(name='Unknown rate')
+        self.campaign = TreeCampaign.objects.create(name='Rains 2022')
+        # 3 seedlings alive for 2 years: 3 * 10 * 2 = 60 kg
+        Tree.objects.create(tree_id='C1', species=self.acacia, planting_date='2022-01-01', beneficiary=self.ben,
+                            campaign=self.campaign, number_of_seedlings=3)
+        # died after one year: 10 kg, nothing projected
+        dead = Tree.objects.create(tree_id='C2', species=self.acacia, planting_date='2022-01-01', beneficiary=other,
+                                   status='dead')
+        TreeUpdate.objects.create(tree=dead, date=datetime.date(2023, 1, 1), status='dead')
+        Tree.objects.create(tree_id='C3', species=unknown, planting_date='2022-01-01', beneficiary=other)
+        # planted after as_of: not counted
+        Tree.objects.create(tree_id='C4', species=self.acacia, planting_date='2024-06-01', beneficiary=other)
+
+    def test_cumulative_projected_and_breakdowns(self):
+        data = carbon.estimate(as_of=AS_OF, horizon_years=10)
+        self.assertAlmostEqual(data['co2_kg'], 69.95, delta=0.01)
+        # living acacia seedlings add 3 * 10 * 10 kg over the horizon
+        self.assertAlmostEqual(data['projected_co2_kg'], 369.95, delta=0.01)
+        self.assertEqual((data['trees'], data['seedlings'], data['trees_without_rate']), (3, 5, 1))
+        self.assertAlmostEqual(data['by_campaign'][str(self.campaign.pk)]['co2_kg'], 59.96, delta=0.01)
+        self.assertEqual(data['by_campaign']['none']['trees'], 2)
+        self.assertAlmostEqual(data['by_region']['Kisumu County']['co2_kg'], 59.96, delta=0.01)
+        self.assertEqual(data['by_species'][str(self.acacia.pk)]['trees'], 2)
+
+    @override_settings(CARBON_DEFAULT_KG_PER_YEAR=5)
+    def test_default_rate_for_species_without_one(self):
+        data = carbon.estimate(as_of=AS_OF, breakdowns=False)
+        self.assertEqual(data['trees_without_rate'], 0)
+        self.assertAlmostEqual(data['co2_kg'], 79.95, delta=0.01)
+        self.assertNotIn('by_campaign', data)
+
+    def test_snapshots_history_and_api(self):
+        self.assertEqual(self.client.get('/api/trees/carbon/').status_code, 404)
+        self.assertEqual(CarbonSnapshot.objects.count(), 0)
+        carbon.take_snapshot(AS_OF)
+        carbon.take_snapshot(AS_OF)  # re-running a day replaces it
+        self.assertEqual(CarbonSnapshot.objects.count(), 1)
+        history = self.client.get('/api/trees/carbon/history/', {'start': '2023-12-01'}).json()['history']
+        self.assertEqual([h['date'] for h in history], ['2024-01-01'])
+        self.assertAlmostEqual(history[0]['co2_kg'], 69.95, delta=0.01)
+
+        carbon.take_snapshot(AS_OF - datetime.timedelta(days=1))
+        data = self.client.get('/api/trees/carbon/').json()
+        self.assertEqual(CarbonSnapshot.objects.count(), 2)
+        self.assertEqual(data['as_of'], '2024-01-01')
+        self.assertIn('by_region', data)
+        with self.assertNumQueries(1):
+            self.client.get('/api/trees/carbon/')
+
+        tree = Tree.objects.get(tree_id='C1')
+        one = self.client.get(f'/api/trees/{tree.pk}/carbon/').json()
+        self.assertEqual((one['tree'], one['trees'], one['seedlings']), ('C1', 1, 3))
+        self.assertEqual(self.client.get('/api/trees/carbon/history/', {'start': 'x'}).status_code, 400)
+
+    def test_dashboard_and_reports_include_carbon(self):
+        from dashboard.services.dashboard_service import get_dashboard_summary
+        self.assertEqual(get_dashboard_summary()['co2_kg'], 0.0)
+        carbon.take_snapshot()
+        summary = get_dashboard_summary()
+        self.assertGreater(summary['co2_kg'], 0)
+
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user('donor', 'donor@example.com', 'pass'))
+        resp = client.post('/api/reports/generated/generate/', {'name': 'Donor report', 'report_type': 'summary'}, format='json')
+        rpt = GeneratedReport.objects.get(pk=resp.json()['id'])
+        self.assertEqual(rpt.metadata['carbon']['co2_kg'], summary['co2_kg'])
+        self.assertIn('Estimated CO2 sequestered', rpt.summary_text)
@@ -0,0 +1,184 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from core.geo import encode
+from media_app.models import Media
+from trees import dedup, importer
+from trees.models import DuplicateCandidate, Tree, TreeSpecies, TreeUpdate
+
+
+# 36.82205 and 36.82206 fall in different precision-7 cells, about a metre apart
+LAT, LON, LON_NEXT_CELL = -1.2921, 36.82205, 36.82206
+
+
+class DuplicateDetectionTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Dedup School', type='school')
+        self.neem = TreeSpecies.objects.create(name='Neem')
+        self.moringa = TreeSpecies.objects.create(name='Moringa')
+        self.original = self.plant('T1')
+
+    def plant(self, tree_id, species=None, latitude=LAT, longitude=LON, planting_date='2024-03-04'):
+        return Tree.objects.create(tree_id=tree_id, planting_date=planting_date, beneficiary=self.ben,
+                                   species=species or self.neem, latitude=latitude, longitude=longitude)
+
+    def pairs(self):
+        return set(DuplicateCandidate.objects.values_list('tree__tree_id', 'duplicate_of__tree_id'))
+
+    def test_blocking_key(self):
+        self.assertEqual(self.original.dedup_key, f'{self.ben.pk}:2024W10:{encode(LAT, LON, 7)}')
+        self.assertEqual(dedup.blocking_key(self.ben.pk, '2024-03-04', None, None), '')
+
+    def test_duplicate_is_queued_when_created(self):
+        self.plant('T2', latitude=LAT + 0.00003)
+        self.assertEqual(self.pairs(), {('T2', 'T1')})
+        candidate = DuplicateCandidate.objects.get()
+        self.assertEqual(candidate.status, 'pending')
+        self.assertAlmostEqual(candidate.distance_m, 3.34, places=1)
+
+    def test_pairs_across_adjacent_cells_are_found(self):
+        self.plant('T2', longitude=LON_NEXT_CELL)
+        self.assertNotEqual(Tree.objects.get(tree_id='T2').dedup_key, self.original.dedup_key)
+        self.assertEqual(self.pairs(), {('T2', 'T1')})
+
+    def test_distinct_trees_are_not_queued(self):
+        self.plant('OTHER-SPECIES', species=self.moringa)
+        self.plant('FAR', latitude=LAT + 0.0002)
+        self.plant('OTHER-WEEK', planting_date='2024-03-11')
+        Tree.objects.create(tree_id='NO-GPS', planting_date='2024-03-04', beneficiary=self.ben, species=self.neem)
+        self.assertEqual(self.pairs(), set())
+
+    def test_imported_trees_are_checked(self):
+        rows = [{'tree_id': f'I{i}', 'planting_date': '2024-03-04', 'beneficiary': self.ben.pk, 'species': 'neem',
+                 'latitude': LAT, 'longitude': LON + i * 0.001} for i in range(20)]
+        result = importer.import_rows(rows, finalize=False)
+        self.assertEqual(result['created'], 20)
+        self.assertEqual(self.pairs(), {('I0', 'T1')})
+
+    def test_scan_finds_pairs_and_skips_reviewed_ones(self):
+        Tree.objects.bulk_create([
+            Tree(tree_id=f'B{i}', planting_date='2024-03-04', beneficiary=self.ben, species=self.neem,
+                 latitude=LAT, longitude=LON + i * 0.00004,
+                 dedup_key=dedup.blocking_key(self.ben.pk, '2024-03-04', LAT, LON + i * 0.00004))
+            for i in range(1, 4)
+        ])
+        # B1 (4 m from T1), B2 (4 m from B1, 9 m from T1), B3 (4 m from B2)
+        self.assertEqual(dedup.scan(chunk_size=2), 5)
+        self.assertEqual(self.pairs(), {('B1', 'T1'), ('B2', 'T1'), ('B2', 'B1'), ('B3', 'B1'), ('B3', 'B2')})
+        dedup.dismiss(DuplicateCandidate.objects.get(tree__tree_id='B3', duplicate_of__tree_id='B2'))
+        dedup.scan()
+        self.assertEqual(DuplicateCandidate.objects.count(), 5)
+        self.assertEqual(DuplicateCandidate.objects.filter(status='dismissed').count(), 1)
+
+    def test_rebuild_keys(self):
+        Tree.objects.filter(pk=self.original.pk).update(dedup_key='')
+        self.assertEqual(dedup.rebuild_keys(), 1)
+        self.original.refresh_from_db()
+        self.assertEqual(self.original.dedup_key, f'{self.ben.pk}:2024W10:{encode(LAT, LON, 7)}')
+
+    def test_migration_backfills_existing_rows(self):
+        import importlib
+        from django.apps import apps
+        self.plant('T2', latitude=LAT + 0.00003)
+        DuplicateCandidate.objects.all().delete()
+        Tree.objects.update(dedup_key='')
+        self.assertEqual(dedup.scan(), 0)
+        importlib.import_module('trees.migrations.0014_backfill_dedup_key').fill_dedup_key(apps, None)
+        self.assertEqual(dedup.scan(), 1)
+        self.assertEqual(self.pairs(), {('T2', 'T1')})
+
+    def test_merge_moves_updates_and_media(self):
+        user = get_user_model().objects.create_user('reviewer', 'r@example.com', 'pass')
+        duplicate = self.plant('T2', latitude=LAT + 0.00003)
+        TreeUpdate.objects.create(tree=duplicate, date='2024-06-01', status='alive', height_cm=40)
+        photo = Media.objects.create(file='photo.jpg', uploader=user, tree=duplicate)
+        dead = Tree.objects.create(tree_id='OLD', planting_date='2023-01-01', beneficiary=self.ben,
+                                   status='dead', replaced_by=duplicate)
+
+        result = dedup.merge(DuplicateCandidate.objects.get(), user)
+
+        self.assertEqual(result, {'kept': self.original.pk, 'moved_updates': 1, 'repointed_replacements': 1})
+        self.assertFalse(Tree.objects.filter(pk=duplicate.pk).exists())
+        self.assertEqual(self.original.updates.count(), 1)
+        photo.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(photo.tree_id, self.original.pk)
+        self.assertEqual(dead.replaced_by_id, self.original.pk)
+        self.assertFalse(DuplicateCandidate.objects.exists())
+
+    def test_merge_when_both_trees_have_a_qrcode(self):
+        from core.models import ActivityLog
+        from qrcodes.models import QRCode
+        duplicate = self.plant('T2', latitude=LAT + 0.00003)
+        kept_code = QRCode.objects.create(tree=self.original, label='T1')
+        dropped_code = QRCode.objects.create(tree=duplicate, label='T2')
+
+        dedup.merge(DuplicateCandidate.objects.get())
+
+        self.assertEqual(list(QRCode.objects.filter(tree=self.original)), [kept_code])
+        dropped_code.refresh_from_db()
+        self.assertIsNone(dropped_code.tree_id)
+        self.assertTrue(ActivityLog.objects.filter(action__contains=str(dropped_code.pk)).exists())
+
+    def test_merge_moves_qrcode_to_a_tree_without_one(self):
+        from qrcodes.models import QRCode
+        duplicate = self.plant('T2', latitude=LAT + 0.00003)
+        code = QRCode.objects.create(tree=duplicate, label='T2')
+        dedup.merge(DuplicateCandidate.objects.get())
+        code.refresh_from_db()
+        self.assertEqual(code.tree_id, self.original.pk)
+
+    def test_merge_into_the_tree_it_replaced(self):
+        from trees import lineage
+        duplicate = self.plant('T2', latitude=LAT + 0.00003)
+        Tree.objects.filter(pk=self.original.pk).update(status='dead', replaced_by=duplicate)
+
+        result = dedup.merge(DuplicateCandidate.objects.get())
+
+        self.assertEqual(result['repointed_replacements'], 0)
+        self.original.refresh_from_db()
+        self.assertIsNone(self.original.replaced_by_id)
+        self.assertEqual(lineage.roots([self.original.pk])[self.original.pk], self.original.pk)
+
+
+class DuplicateReviewApiTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.manager = User.objects.create_user('manager', 'm@example.com', 'pass')
+        self.manager.groups.add(Group.objects.create(name='Admins'))
+        self.ben = Beneficiary.objects.create(name='Review School', type='school')
+        self.kept = Tree.objects.create(tree_id='K1', planting_date='2024-03-04', beneficiary=self.ben,
+                                        latitude=LAT, longitude=LON)
+        self.dup = Tree.objects.create(tree_id='K2', planting_date='2024-03-04', beneficiary=self.ben,
+                                       latitude=LAT, longitude=LON)
+        self.candidate = DuplicateCandidate.objects.get()
+
+    def test_review_requires_tree_manager(self):
+        self.assertEqual(self.client.get('/api/tree-duplicates/').status_code, 403)
+        viewer = get_user_model().objects.create_user('viewer', 'v@example.com', 'pass')
+        self.client.force_login(viewer)
+        self.assertEqual(self.client.get('/api/tree-duplicates/').status_code, 200)
+        resp = self.client.post(f'/api/tree-duplicates/{self.candidate.pk}/merge/')
+        self.assertEqual(resp.status_code, 403)
+
+    def test_dismiss_then_merge_is_rejected(self):
+        self.client.force_login(self.manager)
+        rows = self.client.get('/api/tree-duplicates/').json()['results']
+        self.assertEqual([(r['tree_code'], r['duplicate_of_code']) for r in rows], [('K2', 'K1')])
+
+        resp = self.client.post(f'/api/tree-duplicates/{self.candidate.pk}/dismiss/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['status'], 'dismissed')
+        self.assertEqual(self.client.get('/api/tree-duplicates/').json()['results'], [])
+        self.assertEqual(len(self.client.get('/api/tree-duplicates/?status=dismissed').json()['results']), 1)
+        resp = self.client.post(f'/api/tree-duplicates/{self.candidate.pk}/merge/')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_merge(self):
+        self.client.force_login(self.manager)
+        resp = self.client.post(f'/api/tree-duplicates/{self.candidate.pk}/merge/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['kept'], self.kept.pk)
+        self.assertFalse(Tree.objects.filter(pk=self.dup.pk).exists())
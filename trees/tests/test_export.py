@@ -0,0 +1,59 @@
+import csv
+import io
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from beneficiaries.models import Beneficiary
+from trees import export, importer
+from trees.models import Tree, TreeCampaign, TreeSpecies
+
+
+class TreeExportTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Export School', type='school')
+        self.neem = TreeSpecies.objects.create(name='Neem')
+        self.campaign = TreeCampaign.objects.create(name='Spring')
+        for i in range(5):
+            Tree.objects.create(tree_id=f'E{i}', planting_date=f'2024-0{i + 1}-10', beneficiary=self.ben,
+                                species=self.neem, campaign=self.campaign if i % 2 else None,
+                                status='dead' if i == 4 else 'alive', latitude=-1.2, longitude=36.8)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('partner', 'p@example.com', 'pass'))
+
+    def read_csv(self, resp):
+        return list(csv.DictReader(io.StringIO(b''.join(resp.streaming_content).decode())))
+
+    @override_settings(TREE_EXPORT_CHUNK_SIZE=2)
+    def test_csv_streams_filtered_rows(self):
+        resp = self.client.get('/api/trees/export/csv/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertIn('attachment; filename="trees-', resp['Content-Disposition'])
+        rows = self.read_csv(resp)
+        self.assertEqual([r['tree_id'] for r in rows], ['E0', 'E1', 'E2', 'E3', 'E4'])
+        self.assertEqual((rows[1]['species'], rows[1]['campaign'], rows[1]['beneficiary']), ('Neem', 'Spring', str(self.ben.pk)))
+
+        resp = self.client.get('/api/trees/export/csv/', {'campaign': self.campaign.pk, 'planted_from': '2024-03-01'})
+        self.assertEqual([r['tree_id'] for r in self.read_csv(resp)], ['E3'])
+        resp = self.client.get('/api/trees/export/csv/', {'status': 'dead'})
+        self.assertEqual([r['tree_id'] for r in self.read_csv(resp)], ['E4'])
+        self.assertEqual(self.client.get('/api/trees/export/csv/', {'status': 'gone'}).status_code, 400)
+        self.assertIn(APIClient().get('/api/trees/export/csv/').status_code, (401, 403))
+
+    def test_xlsx_export(self):
+        resp = self.client.get('/api/trees/export/xlsx/', {'species': self.neem.pk, 'planted_to': '2024-02-28'})
+        self.assertEqual(resp.status_code, 200)
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(resp.streaming_content)), read_only=True)
+        rows = list(wb.active.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), export.HEADERS)
+        self.assertEqual([r[0] for r in rows[1:]], ['E0', 'E1'])
+
+    def test_export_round_trips_through_the_importer(self):
+        rows = self.read_csv(self.client.get('/api/trees/export/csv/'))
+        Tree.objects.all().delete()
+        result = importer.import_rows(rows, finalize=False)
+        self.assertEqual(result['created'], 5)
+        self.assertEqual(Tree.objects.filter(campaign=self.campaign).count(), 2)
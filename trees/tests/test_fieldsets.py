@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from trees.models import Tree, TreeSpecies, TreeUpdate
+
+
+class TreeSparseFieldsetTest(TestCase):
+    def setUp(self):
+        ben = Beneficiary.objects.create(name='Fieldset School', type='school')
+        species = TreeSpecies.objects.create(name='Acacia')
+        for i in range(10):
+            t = Tree.objects.create(tree_id=f'F-{i}', planting_date='2024-01-01', beneficiary=ben, species=species)
+            TreeUpdate.objects.create(tree=t, date='2024-02-01', status='alive', height_cm=10)
+
+    def test_default_output_unchanged_and_prefetched(self):
+        with self.assertNumQueries(4):  # count, trees, updates, update media
+            resp = self.client.get('/api/trees/')
+        row = resp.json()['results'][0]
+        self.assertIn('qr_image', row)
+        self.assertEqual(len(row['updates']), 1)
+        self.assertIsInstance(row['species'], int)
+        # internal index columns stay out of the API
+        self.assertNotIn('geohash', row)
+        self.assertNotIn('dedup_key', row)
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(2):
+            resp = self.client.get('/api/trees/', {'fields': 'id,tree_id,status'})
+        self.assertEqual(set(resp.json()['results'][0]), {'id', 'tree_id', 'status'})
+
+    def test_expand_related(self):
+        with self.assertNumQueries(2):
+            resp = self.client.get('/api/trees/', {'fields': 'tree_id', 'expand': 'species,beneficiary'})
+        row = resp.json()['results'][0]
+        self.assertEqual(row['species']['name'], 'Acacia')
+        self.assertEqual(row['beneficiary']['name'], 'Fieldset School')
+        self.assertNotIn('updates', row)
+        resp = self.client.get('/api/trees/', {'fields': 'tree_id', 'expand': 'updates'})
+        self.assertEqual(len(resp.json()['results'][0]['updates']), 1)
+
+    def test_unknown_names_rejected(self):
+        self.assertEqual(self.client.get('/api/trees/', {'fields': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/trees/', {'fields': 'geohash'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/trees/', {'expand': 'campaign'}).status_code, 400)
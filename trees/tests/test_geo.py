@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from beneficiaries.models import Beneficiary, PlantingSite
+from core import geo
+from trees.models import Tree
+
+
+class GeohashTest(SimpleTestCase):
+    def test_encode_known_points(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.encode(-1.2921, 36.8219, 5), 'kzf0t')
+        self.assertEqual(geo.encode(None, 36.8), '')
+
+    def test_cover_contains_points_in_box(self):
+        bbox = (36.7, -1.4, 36.95, -1.2)
+        ranges = geo.prefix_ranges(geo.cover(bbox))
+        self.assertLessEqual(len(ranges), geo.MAX_COVER_CELLS)
+        for lat, lon in [(-1.3, 36.8), (-1.399, 36.701), (-1.201, 36.949)]:
+            h = geo.encode(lat, lon)
+            self.assertTrue(any(start <= h and (end is None or h < end) for start, end in ranges), (lat, lon))
+
+    def test_antimeridian_box_is_split(self):
+        prefixes = geo.cover((179.5, -17.0, -179.5, -16.0))
+        self.assertTrue(any(geo.encode(-16.5, 179.9).startswith(p) for p in prefixes))
+        self.assertTrue(any(geo.encode(-16.5, -179.9).startswith(p) for p in prefixes))
+
+
+class GeoQuerySetTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Geo School', type='school', latitude=-1.29, longitude=36.82)
+        self.near = Tree.objects.create(tree_id='G-1', planting_date='2024-01-01', beneficiary=self.ben, latitude=-1.2921, longitude=36.8219)
+        self.edge = Tree.objects.create(tree_id='G-2', planting_date='2024-01-01', beneficiary=self.ben, latitude=-1.3, longitude=36.9)
+        self.far = Tree.objects.create(tree_id='G-3', planting_date='2024-01-01', beneficiary=self.ben, latitude=-4.0435, longitude=39.6682)
+
+    def test_geohash_maintained_on_save(self):
+        self.assertEqual(self.near.geohash, geo.encode(-1.2921, 36.8219))
+        self.assertEqual(self.ben.geohash, geo.encode(-1.29, 36.82))
+        site = PlantingSite.objects.create(beneficiary=self.ben, latitude=1.0, longitude=2.0)
+        self.assertEqual(site.geohash, geo.encode(1.0, 2.0))
+        self.near.latitude = None
+        self.near.save()
+        self.assertEqual(self.near.geohash, '')
+
+    def test_geohash_maintained_by_bulk_writes(self):
+        from django.db.models import F
+        bbox = (36.8, -1.31, 36.95, -1.28)
+        Tree.objects.filter(pk=self.far.pk).update(latitude=-1.295, longitude=36.83)
+        Tree.objects.filter(pk=self.near.pk).update(latitude=F('latitude') - 1)
+        self.edge.latitude, self.edge.longitude = -1.29, 36.85
+        Tree.objects.bulk_update([self.edge], ['latitude', 'longitude'])
+        ids = set(Tree.objects.within_bbox(*bbox).values_list('tree_id', flat=True))
+        self.assertEqual(ids, {'G-2', 'G-3'})
+        self.assertEqual(Tree.objects.get(pk=self.near.pk).geohash, geo.encode(-2.2921, 36.8219))
+        self.far.longitude = 39.6682
+        Tree.objects.bulk_update([self.far], ['longitude'])
+        self.assertEqual(Tree.objects.get(pk=self.far.pk).geohash, geo.encode(-1.295, 39.6682))
+
+    def test_bbox_and_radius(self):
+        ids = set(Tree.objects.within_bbox(36.8, -1.31, 36.95, -1.28).values_list('tree_id', flat=True))
+        self.assertEqual(ids, {'G-1', 'G-2'})
+        rows = list(Tree.objects.within_radius(-1.2921, 36.8219, 5).values_list('tree_id', 'distance_km'))
+        self.assertEqual([r[0] for r in rows], ['G-1'])
+        self.assertAlmostEqual(rows[0][1], 0.0, places=3)
+        self.assertEqual(Tree.objects.within_radius(-1.2921, 36.8219, 10).count(), 2)
+
+    def test_backfill_command(self):
+        Tree.objects.filter(pk__in=[self.near.pk, self.far.pk]).update(geohash='')
+        out = StringIO()
+        call_command('backfill_geohash', '--model', 'trees.Tree', '--chunk-size', '1', stdout=out)
+        self.assertIn('trees.Tree: updated 2 rows', out.getvalue())
+        self.assertEqual(Tree.objects.get(pk=self.far.pk).geohash, geo.encode(-4.0435, 39.6682))
+
+    def test_migration_backfills_existing_rows(self):
+        import importlib
+        from django.apps import apps
+        Tree.objects.update(geohash='')
+        self.assertFalse(Tree.objects.within_bbox(36.8, -1.31, 36.95, -1.28).exists())
+        importlib.import_module('trees.migrations.0013_backfill_geohash').fill_geohash(apps, None)
+        ids = set(Tree.objects.within_bbox(36.8, -1.31, 36.95, -1.28).values_list('tree_id', flat=True))
+        self.assertEqual(ids, {'G-1', 'G-2'})
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from beneficiaries.models import Beneficiary
+from core.models import ChangeLog
+from media_app.models import Media
+from trees import ingest
+from trees.models import Tree, TreeUpdate
+
+
+class BatchUpdateIngestTest(TestCase):
+    def setUp(self):
+        ben = Beneficiary.objects.create(name='Ingest School', type='school')
+        self.trees = [Tree.objects.create(tree_id=f'T{i}', planting_date='2024-01-10', beneficiary=ben) for i in range(3)]
+        self.user = get_user_model().objects.create_user('officer', 'o@example.com', 'pass')
+        self.photo = Media.objects.create(uploader=self.user, file=SimpleUploadedFile('p.jpg', b'x'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def items(self, n=6):
+        return [{'client_key': f'dev1-{i}', 'tree_id': self.trees[i % 3].tree_id, 'status': 'alive',
+                 'date': f'2024-0{i // 3 + 2}-01', 'height_cm': 10 + i, 'media': [self.photo.pk] if i == 0 else []}
+                for i in range(n)]
+
+    def test_bulk_insert_with_media_and_growth(self):
+        with self.assertNumQueries(14):
+            # lookups (3), inserts with media links (4), growth refresh (3), sync feed (4)
+            results = ingest.ingest_updates(self.items())
+        self.assertEqual([r['status'] for r in results], ['created'] * 6)
+        self.assertEqual(TreeUpdate.objects.count(), 6)
+        first = TreeUpdate.objects.get(client_key='dev1-0')
+        self.assertEqual(list(first.media.all()), [self.photo])
+        later = TreeUpdate.objects.get(client_key='dev1-3')
+        self.assertEqual(later.growth_rate_per_day, round(3 / 29, 4))
+        self.assertEqual(ChangeLog.objects.filter(model='trees.treeupdate').count(), 6)
+
+    def test_retries_do_not_duplicate(self):
+        first = ingest.ingest_updates(self.items(4))
+        items = self.items(6) + [dict(self.items(6)[5])]
+        again = ingest.ingest_updates(items)
+        self.assertEqual([r['status'] for r in again], ['duplicate'] * 4 + ['created'] * 2 + ['duplicate'])
+        self.assertEqual([r['id'] for r in again[:4]], [r['id'] for r in first])
+        self.assertEqual(again[6]['id'], again[5]['id'])
+        self.assertEqual(TreeUpdate.objects.count(), 6)
+
+    def test_rows_failing_for_other_reasons_are_errors(self):
+        link = TreeUpdate.media.through
+        insert_links = link.objects.bulk_create
+
+        def media_gone(objs, *args, **kwargs):
+            # as if the photo was deleted after the batch was validated
+            if any(obj.media_id == self.photo.pk for obj in objs):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return insert_links(objs, *args, **kwargs)
+
+        items = self.items(3) + [dict(self.items(1)[0])]
+        with mock.patch.object(link.objects, 'bulk_create', side_effect=media_gone):
+            results = ingest.ingest_updates(items)
+        self.assertEqual([r['status'] for r in results], ['error', 'created', 'created', 'error'])
+        self.assertEqual(results[0]['errors'], ['could not be stored'])
+        self.assertEqual(results[3]['errors'], ['could not be stored'])
+        self.assertFalse(TreeUpdate.objects.filter(client_key='dev1-0').exists())
+        self.assertEqual(TreeUpdate.objects.count(), 2)
+
+    def test_invalid_items_are_reported_per_item(self):
+        items = self.items(2) + [
+            {'tree_id': 'T0', 'status': 'alive'},
+            {'client_key': 'x1', 'tree_id': 'NOPE', 'status': 'alive'},
+            {'client_key': 'x2', 'tree_id': 'T1', 'status': 'sleeping', 'height_cm': -3, 'media': [999]},
+        ]
+        resp = self.client.post('/api/tree-updates/batch/', {'updates': items}, format='json')
+        self.assertEqual(resp.status_code, 207)
+        data = resp.json()
+        self.assertEqual((data['created'], data['errors']), (2, 3))
+        self.assertEqual(data['results'][2]['errors'], ['missing client_key'])
+        self.assertEqual(data['results'][3]['errors'], ['unknown tree_id'])
+        self.assertEqual(data['results'][4]['errors'], ['invalid status', 'invalid height_cm', 'unknown media'])
+
+    def test_api_limits(self):
+        resp = self.client.post('/api/tree-updates/batch/', {'updates': self.items(2)}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.post('/api/tree-updates/batch/', {'updates': []}, format='json').status_code, 400)
+        too_many = [{'client_key': str(i)} for i in range(ingest.MAX_BATCH_SIZE + 1)]
+        self.assertEqual(self.client.post('/api/tree-updates/batch/', {'updates': too_many}, format='json').status_code, 400)
+        self.assertIn(APIClient().post('/api/tree-updates/batch/', {'updates': self.items(1)}, format='json').status_code, (401, 403))
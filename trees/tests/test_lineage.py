@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from trees import lineage
+from trees.models import Tree
+
+
+class ReplacementLineageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ben = Beneficiary.objects.create(name='Lineage School', type='school')
+        # A (dead) -> B (dead) -> C (alive); D and E (dead) -> F (alive); G alive; H dead
+        self.c = self.plant('C')
+        self.b = self.plant('B', 'dead', replaced_by=self.c)
+        self.a = self.plant('A', 'dead', replaced_by=self.b)
+        self.f = self.plant('F')
+        self.d = self.plant('D', 'dead', replaced_by=self.f)
+        self.e = self.plant('E', 'dead', replaced_by=self.f)
+        self.g = self.plant('G')
+        self.h = self.plant('H', 'dead')
+
+    def plant(self, tree_id, status='alive', replaced_by=None):
+        return Tree.objects.create(tree_id=tree_id, planting_date='2024-01-10', beneficiary=self.ben,
+                                   status=status, replaced_by=replaced_by)
+
+    def test_chains_and_roots_with_and_without_cte(self):
+        ids = [self.a.pk, self.b.pk, self.c.pk, self.f.pk, self.g.pk]
+        for use_cte in (True, False):
+            cache.clear()
+            chains = lineage.successors(ids, use_cte=use_cte)
+            self.assertEqual(chains[self.a.pk], [self.a.pk, self.b.pk, self.c.pk])
+            self.assertEqual(chains[self.g.pk], [self.g.pk])
+            roots = lineage.roots(ids, use_cte=use_cte)
+            self.assertEqual(roots, {self.a.pk: self.a.pk, self.b.pk: self.a.pk, self.c.pk: self.a.pk,
+                                     self.f.pk: self.d.pk, self.g.pk: self.g.pk})
+
+    def test_chain_lookups_are_one_query_and_roots_are_cached(self):
+        with self.assertNumQueries(1):
+            lineage.successors([self.a.pk, self.d.pk, self.e.pk, self.g.pk], use_cte=True)
+        with self.assertNumQueries(1):
+            lineage.roots([self.c.pk, self.f.pk], use_cte=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(lineage.roots([self.c.pk])[self.c.pk], self.a.pk)
+
+    def test_relinking_invalidates_cached_roots(self):
+        self.assertEqual(lineage.roots([self.c.pk])[self.c.pk], self.a.pk)
+        self.b.replaced_by = None
+        self.b.save()
+        self.assertEqual(lineage.roots([self.c.pk])[self.c.pk], self.c.pk)
+        self.h.replaced_by = self.g
+        self.h.save()
+        self.assertEqual(lineage.roots([self.g.pk])[self.g.pk], self.h.pk)
+        self.h.delete()
+        self.assertEqual(lineage.roots([self.g.pk])[self.g.pk], self.g.pk)
+
+    def test_effective_survival_counts_replanted_positions(self):
+        expected = {'positions': 5, 'replanted': 3, 'original_surviving': 1, 'surviving': 4,
+                    'survival_rate_percent': 20.0, 'effective_survival_rate_percent': 80.0}
+        with self.assertNumQueries(1):
+            self.assertEqual(lineage.effective_survival(use_cte=True), expected)
+        self.assertEqual(lineage.effective_survival(use_cte=False), expected)
+        self.c.status = 'dead'
+        self.c.save()
+        self.assertEqual(lineage.effective_survival(Tree.objects.filter(tree_id__in=['A', 'G']))['surviving'], 1)
+
+    def test_api(self):
+        data = self.client.get(f'/api/trees/{self.b.pk}/lineage/').json()
+        self.assertEqual((data['root'], data['tip'], data['replacements']), (self.a.pk, self.c.pk, 2))
+        self.assertEqual([t['tree_id'] for t in data['chain']], ['A', 'B', 'C'])
+        self.assertEqual(data['effective_status'], 'alive')
+        resp = self.client.get('/api/trees/effective-survival/', {'beneficiary': self.ben.pk})
+        self.assertEqual(resp.json()['effective_survival_rate_percent'], 80.0)
+        self.assertEqual(self.client.get('/api/trees/effective-survival/', {'planted_to': 'x'}).status_code, 400)
@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from trees.models import Tree, TreeSpecies
+
+
+class TreeMapTest(TestCase):
+    def setUp(self):
+        ben = Beneficiary.objects.create(name='Map School', type='school')
+        self.species = TreeSpecies.objects.create(name='Acacia')
+        # a dense patch near Nairobi and a single tree near Mombasa
+        for i in range(20):
+            Tree.objects.create(tree_id=f'M-{i}', planting_date='2024-01-01', beneficiary=ben, species=self.species,
+                                latitude=-1.2921 + i * 0.0001, longitude=36.8219 + i * 0.0001,
+                                status='dead' if i < 5 else 'alive')
+        Tree.objects.create(tree_id='M-far', planting_date='2024-01-01', beneficiary=ben, latitude=-4.0435, longitude=39.6682)
+        Tree.objects.create(tree_id='M-none', planting_date='2024-01-01', beneficiary=ben)
+
+    def test_low_zoom_returns_clusters_with_status_breakdown(self):
+        resp = self.client.get('/api/trees/map/', {'zoom': 5})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['mode'], 'clusters')
+        self.assertEqual(data['count'], 21)
+        biggest = data['clusters'][0]
+        self.assertEqual(biggest['count'], 20)
+        self.assertEqual(biggest['statuses'], {'dead': 5, 'alive': 15})
+        self.assertEqual(len(data['clusters']), 2)
+
+    def test_high_zoom_returns_points_in_bbox(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/trees/map/', {'zoom': 16, 'bbox': '36.8,-1.3,36.9,-1.2'})
+        data = resp.json()
+        self.assertEqual(data['mode'], 'points')
+        self.assertEqual(data['count'], 20)
+        self.assertEqual(data['points'][0]['species'], 'Acacia')
+
+    def test_filters_and_bad_params(self):
+        data = self.client.get('/api/trees/map/', {'zoom': 3, 'status': 'dead'}).json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(self.client.get('/api/trees/map/', {'bbox': '1,2,3'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/trees/map/', {'species': 'oak'}).status_code, 400)
@@ -0,0 +1,54 @@
+import datetime
+
+from django.test import TestCase
+
+from beneficiaries.models import Beneficiary
+from trees.models import Tree
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        ben = Beneficiary.objects.create(name='Cursor School', type='school')
+        start = datetime.date(2024, 1, 1)
+        # several trees share each planting date so the id tiebreak matters
+        for i in range(30):
+            Tree.objects.create(tree_id=f'C-{i:02d}', planting_date=start + datetime.timedelta(days=i % 4), beneficiary=ben)
+        self.expected = list(Tree.objects.order_by('planting_date', 'id').values_list('tree_id', flat=True))
+
+    def _walk(self, url, params):
+        seen = []
+        pages = 0
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url, params).json()
+            params = None
+            seen.extend(row['tree_id'] for row in data['results'])
+            url = data['next']
+            pages += 1
+        return seen, pages
+
+    def test_walks_full_list_in_keyset_order(self):
+        seen, pages = self._walk('/api/trees/', {'cursor': '', 'fields': 'id,tree_id'})
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 2)  # PAGE_SIZE 25
+
+    def test_previous_link_returns_the_prior_page(self):
+        first = self.client.get('/api/trees/', {'pagination': 'cursor', 'fields': 'tree_id'}).json()
+        self.assertNotIn('count', first)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['tree_id'] for r in second['results']], self.expected[25:])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([r['tree_id'] for r in back['results']], self.expected[:25])
+
+    def test_page_numbers_still_default(self):
+        data = self.client.get('/api/trees/', {'page': 2, 'fields': 'tree_id'}).json()
+        self.assertEqual(data['count'], 30)
+        self.assertEqual(len(data['results']), 5)
+
+    def test_page_size_is_not_client_selectable(self):
+        data = self.client.get('/api/trees/', {'pagination': 'cursor', 'page_size': 5, 'fields': 'tree_id'}).json()
+        self.assertEqual(len(data['results']), 25)
+
+    def test_bad_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/trees/', {'cursor': 'garbage'}).status_code, 404)
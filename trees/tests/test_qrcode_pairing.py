@@ -1,6 +1,9 @@
 import tempfile
 import shutil
 import os
+from unittest import mock
+
+from django.db import IntegrityError, transaction
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
@@ -27,13 +30,17 @@ class QRCodeTreePairingTests(TestCase):
 
     def test_tree_generates_qr_and_qrcode_links(self):
         today = timezone.now().date()
-        tree = Tree.objects.create(tree_id='T-TEST-1', planting_date=today, beneficiary=self.benef)
+        with self.captureOnCommitCallbacks(execute=True):
+            tree = Tree.objects.create(tree_id='T-TEST-1', planting_date=today, beneficiary=self.benef)
 
-        # Tree should have generated a qr_image during save
-        self.assertTrue(bool(tree.qr_image and tree.qr_image.name), 'Tree.qr_image should be set after save')
+        # Tree should have its qr_image once the queued render has run
+        tree.refresh_from_db()
+        self.assertTrue(bool(tree.qr_image and tree.qr_image.name), 'Tree.qr_image should be set after rendering')
 
-        # Create a QRCode linked to this tree and generate its image
-        qr = QRCode.objects.create(tree=tree, label='test-qr')
+        # The tree's canonical QRCode; a second one for the same tree is refused
+        qr = QRCode.objects.get(tree=tree)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            QRCode.objects.create(tree=tree, label='test-qr')
         qr.generate_image(base_url='')
         qr.save()
 
@@ -63,3 +70,49 @@ class QRCodeTreePairingTests(TestCase):
         qr.delete()
         self.assertFalse(QRCode.objects.filter(pk=qr_pk).exists())
         self.assertTrue(Tree.objects.filter(pk=tree.pk).exists(), 'Deleting QRCode should not delete linked Tree')
+
+    def test_concurrent_writers_keep_one_code_per_tree(self):
+        from qrcodes.tasks import ensure_qrcode_records
+        from trees.importer import finalize_import
+        tree = Tree.objects.create(tree_id='T-TEST-3', planting_date=timezone.now().date(), beneficiary=self.benef)
+        # another writer inserted the code between our check and insert
+        QRCode.objects.bulk_create([QRCode(tree=tree, label='T-TEST-3')], ignore_conflicts=True)
+        QRCode.objects.bulk_create([QRCode(tree=tree, label='T-TEST-3')], ignore_conflicts=True)
+        finalize_import([tree.pk], purge_cache=False)
+        ensure_qrcode_records()
+        self.assertEqual(QRCode.objects.filter(tree=tree).count(), 1)
+
+    def test_ensure_qrcode_records_counts_only_stored_codes(self):
+        from qrcodes.tasks import ensure_qrcode_records
+        tree = Tree.objects.create(tree_id='T-TEST-4', planting_date=timezone.now().date(), beneficiary=self.benef)
+        QRCode.objects.filter(tree=tree).delete()
+        insert = QRCode.objects.bulk_create
+
+        def racing(objs, **kwargs):
+            # another writer links the tree between our lookup and insert
+            insert([QRCode(tree=tree, label='other writer')])
+            return insert(objs, **kwargs)
+
+        with mock.patch.object(QRCode.objects, 'bulk_create', side_effect=racing):
+            self.assertEqual(ensure_qrcode_records(), 0)
+        self.assertEqual(QRCode.objects.get(tree=tree).label, 'other writer')
+
+    def test_ensure_qrcode_records_keeps_one_code_per_site(self):
+        from beneficiaries.models import PlantingSite
+        from qrcodes.tasks import ensure_qrcode_records
+        site = PlantingSite.objects.create(beneficiary=self.benef, name='Plot A')
+        insert = QRCode.objects.bulk_create
+
+        def racing(objs, **kwargs):
+            # an overlapping run creates the site's code first
+            insert([QRCode(site=site, label='other run')])
+            return insert(objs, **kwargs)
+
+        with mock.patch.object(QRCode.objects, 'bulk_create', side_effect=racing):
+            self.assertEqual(ensure_qrcode_records(), 0)
+        self.assertEqual(QRCode.objects.get(site=site).label, 'other run')
+        # a tree code recording the site doesn't count as the site's code
+        tree = Tree.objects.create(tree_id='T-TEST-5', planting_date=timezone.now().date(), beneficiary=self.benef)
+        QRCode.objects.create(tree=tree, site=site)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            QRCode.objects.create(site=site)
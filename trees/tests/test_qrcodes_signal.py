@@ -1,4 +1,5 @@
-from django.test import TestCase
+import tempfile
+from django.test import TestCase, override_settings
 from beneficiaries.models import Beneficiary, PlantingSite
 from django.contrib.auth import get_user_model
 
@@ -6,14 +7,26 @@ from trees.models import Tree
 from qrcodes.models import QRCode
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class QRCodeSignalTests(TestCase):
     def setUp(self):
         self.benef = Beneficiary.objects.create(name='B', type='school')
 
     def test_qrcode_created_on_tree_save(self):
-        t = Tree.objects.create(tree_id='T1', planting_date='2020-01-01', beneficiary=self.benef)
-        # after save signal, QRCode should exist
+        # the save itself only queues rendering; the worker runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            t = Tree.objects.create(tree_id='T1', planting_date='2020-01-01', beneficiary=self.benef)
+            self.assertFalse(QRCode.objects.filter(tree=t).exists())
+        # after the render task, QRCode should exist
         q = QRCode.objects.filter(tree=t).first()
         self.assertIsNotNone(q)
-        # image should have been generated (or at least the field exists)
+        # image should have been generated and shared with the tree
+        self.assertTrue(q.image.name)
+        t.refresh_from_db()
+        self.assertEqual(t.qr_image.name, q.image.name)
+
+    def test_site_save_queues_qrcode(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            site = PlantingSite.objects.create(beneficiary=self.benef, name='Compound')
+        q = QRCode.objects.get(site=site)
         self.assertTrue(q.image.name)
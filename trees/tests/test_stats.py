@@ -0,0 +1,128 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from beneficiaries.models import Beneficiary
+from trees import importer, stats
+from trees.models import Tree, TreeSpecies, TreeStatsRollup
+
+
+class TreeStatsRollupTest(TestCase):
+    def setUp(self):
+        self.ben = Beneficiary.objects.create(name='Rollup School', type='school')
+        self.acacia = TreeSpecies.objects.create(name='Acacia')
+        self.neem = TreeSpecies.objects.create(name='Neem')
+
+    def plant(self, tree_id, species=None, status='alive', date='2024-01-10', seedlings=1):
+        return Tree.objects.create(tree_id=tree_id, species=species, planting_date=date, beneficiary=self.ben,
+                                   status=status, number_of_seedlings=seedlings)
+
+    def counts(self):
+        return stats.stored_rows()
+
+    def test_create_update_delete_move_counts_between_groups(self):
+        jan = datetime.date(2024, 1, 1)
+        tree = self.plant('R1', self.acacia, seedlings=3)
+        self.plant('R2', self.acacia, date='2024-01-25', seedlings=2)
+        self.assertEqual(self.counts(), {(self.acacia.pk, 'alive', jan, self.ben.pk): (2, 5)})
+
+        tree.status = 'dead'
+        tree.number_of_seedlings = 4
+        tree.save()
+        self.assertEqual(self.counts(), {
+            (self.acacia.pk, 'alive', jan, self.ben.pk): (1, 2),
+            (self.acacia.pk, 'dead', jan, self.ben.pk): (1, 4),
+        })
+
+        tree.delete()
+        self.assertEqual(self.counts(), {(self.acacia.pk, 'alive', jan, self.ben.pk): (1, 2)})
+        self.assertEqual(stats.drift(), 0)
+
+    def test_unchanged_save_writes_nothing(self):
+        tree = self.plant('R1', self.acacia)
+        with CaptureQueriesContext(connection) as ctx:
+            tree.save()
+        # the stored snapshot read and the UPDATE itself; the rest is the
+        # delta sync feed entry (core.sync)
+        rollup = [q['sql'] for q in ctx.captured_queries if 'trees_treestatsrollup' in q['sql']]
+        self.assertEqual(rollup, [])
+        self.assertEqual(len([q for q in ctx.captured_queries if 'core_changelog' not in q['sql']
+                              and 'SAVEPOINT' not in q['sql']]), 2)
+
+    def test_only_updates_of_tracked_fields_read_the_stored_row(self):
+        jan = datetime.date(2024, 1, 1)
+        with mock.patch.object(stats, 'stored_tree', wraps=stats.stored_tree) as lookup:
+            tree = self.plant('R1', self.acacia, seedlings=3)
+            self.assertEqual(lookup.call_count, 0)
+            tree.latitude = -1.29
+            tree.save(update_fields=['latitude'])
+            self.assertEqual(lookup.call_count, 0)
+
+            # deferred fields keep their stored values; the row is read once
+            partial = Tree.objects.only('id', 'status').get(pk=tree.pk)
+            partial.status = 'dead'
+            partial.save()
+            self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(self.counts(), {(self.acacia.pk, 'dead', jan, self.ben.pk): (1, 3)})
+
+        # fields outside update_fields aren't written, so they don't count
+        tree.status, tree.number_of_seedlings = 'alive', 7
+        tree.save(update_fields=['status'])
+        self.assertEqual(self.counts(), {(self.acacia.pk, 'alive', jan, self.ben.pk): (1, 3)})
+        self.assertEqual(stats.drift(), 0)
+
+    def test_trees_without_species_share_one_group(self):
+        self.plant('R1')
+        self.plant('R2')
+        self.assertEqual(TreeStatsRollup.objects.count(), 1)
+        self.assertEqual(TreeStatsRollup.objects.get().tree_count, 2)
+
+    def test_deleting_species_or_beneficiary_keeps_counts_consistent(self):
+        self.plant('R1', self.acacia)
+        self.plant('R2', self.neem)
+        self.acacia.delete()
+        self.assertEqual(stats.drift(), 0)
+        self.assertEqual(TreeStatsRollup.objects.get(species__isnull=True).tree_count, 1)
+        self.ben.delete()
+        self.assertEqual(stats.drift(), 0)
+        self.assertFalse(TreeStatsRollup.objects.exists())
+
+    def test_bulk_import_is_counted(self):
+        rows = [{'tree_id': f'B{i}', 'planting_date': '2024-03-05', 'beneficiary': str(self.ben.pk),
+                 'species': 'neem', 'number_of_seedlings': '2'} for i in range(30)]
+        result = importer.import_rows(rows, finalize=False)
+        self.assertEqual(result['created'], 30)
+        self.assertEqual(self.counts(), {(self.neem.pk, 'alive', datetime.date(2024, 3, 1), self.ben.pk): (30, 60)})
+
+    def test_rebuild_command_repairs_drift(self):
+        self.plant('R1', self.acacia)
+        self.plant('R2', self.neem, status='dead')
+        TreeStatsRollup.objects.filter(species=self.neem).delete()
+        TreeStatsRollup.objects.filter(species=self.acacia).update(tree_count=7)
+
+        out = StringIO()
+        call_command('rebuild_tree_stats', '--dry-run', stdout=out)
+        self.assertIn('2 groups out of date', out.getvalue())
+        call_command('rebuild_tree_stats', stdout=StringIO())
+        self.assertEqual(stats.drift(), 0)
+
+    def test_stats_endpoints_read_the_rollup(self):
+        for i in range(6):
+            self.plant(f'A{i}', self.acacia, status='dead' if i < 2 else 'alive', seedlings=2)
+        self.plant('N1', self.neem, date='2023-11-02')
+
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/trees/stats/').json()
+        self.assertEqual(data['total'], 7)
+        self.assertEqual(data['by_species'][0], {'species__name': 'Acacia', 'count': 6})
+        self.assertEqual({r['status']: r['count'] for r in data['by_status']}, {'alive': 5, 'dead': 2})
+
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/reports/summary/').json()
+        self.assertEqual((data['total_trees'], data['alive'], data['dead']), (7, 5, 2))
+        self.assertEqual(data['survival_rate_percent'], 71.43)
@@ -35,3 +35,129 @@ class TreeBulkAPITest(TestCase):
         resp = self.client.post(url, data, content_type='application/json')
         # may fail if beneficiary id 1 doesn't exist; ensure we at least get a response status
         self.assertIn(resp.status_code, (200,201,207,400,403))
+
+
+class GrowthAnalyticsTest(TestCase):
+    def setUp(self):
+        ben = Beneficiary.objects.create(name='Growth Ben')
+        self.acacia = TreeSpecies.objects.create(name='Acacia')
+        grevillea = TreeSpecies.objects.create(name='Grevillea')
+        self.t1 = Tree.objects.create(tree_id='G1', species=self.acacia, planting_date='2024-01-01', beneficiary=ben)
+        self.t2 = Tree.objects.create(tree_id='G2', species=self.acacia, planting_date='2024-01-01', beneficiary=ben)
+        self.t3 = Tree.objects.create(tree_id='G3', species=grevillea, planting_date='2024-01-01', beneficiary=ben)
+        TreeUpdate.objects.create(tree=self.t1, date='2024-01-11', status='alive', height_cm=50, canopy_cm=10)
+        TreeUpdate.objects.create(tree=self.t1, date='2024-01-21', status='alive', height_cm=70, canopy_cm=20)
+        TreeUpdate.objects.create(tree=self.t2, date='2024-01-11', status='alive', height_cm=40)
+        TreeUpdate.objects.create(tree=self.t2, date='2024-01-31', status='alive', height_cm=80)
+        TreeUpdate.objects.create(tree=self.t3, date='2024-01-11', status='alive', height_cm=30)
+
+    def test_deltas_in_one_query(self):
+        from trees.growth import growth_deltas
+        with self.assertNumQueries(1):
+            rows = list(growth_deltas(TreeUpdate.objects.filter(tree__species=self.acacia)))
+        self.assertEqual(len(rows), 4)
+        by_height = {r['height_cm']: r for r in rows}
+        self.assertIsNone(by_height[50]['height_growth_per_day'])
+        self.assertEqual(by_height[70]['height_growth_per_day'], 2.0)
+        self.assertEqual(by_height[70]['canopy_growth_per_day'], 1.0)
+        self.assertEqual(by_height[80]['days_since_previous'], 20)
+
+    def test_stored_rates_follow_edits(self):
+        later = TreeUpdate.objects.get(tree=self.t1, height_cm=70)
+        with self.assertNumQueries(0):
+            self.assertEqual(later.growth_rate_per_day, 2.0)
+        # a measurement inserted in between changes the later update's rate
+        TreeUpdate.objects.create(tree=self.t1, date='2024-01-16', status='alive', height_cm=65)
+        later.refresh_from_db()
+        self.assertEqual(later.growth_rate_per_day, 1.0)
+        TreeUpdate.objects.get(tree=self.t1, height_cm=65).delete()
+        later.refresh_from_db()
+        self.assertEqual(later.growth_rate_per_day, 2.0)
+
+    def test_refresh_is_coalesced_and_skipped_for_deleted_trees(self):
+        from unittest import mock
+        from core.bulk import bulk_operation
+        with mock.patch('trees.growth.refresh_growth') as refresh:
+            with self.captureOnCommitCallbacks(execute=True), bulk_operation():
+                for height in (55, 60, 65):
+                    TreeUpdate.objects.create(tree=self.t1, date='2024-01-15', status='alive', height_cm=height)
+                TreeUpdate.objects.create(tree=self.t2, date='2024-02-10', status='alive', height_cm=90)
+            refresh.assert_called_once_with([self.t1.pk, self.t2.pk])
+            refresh.reset_mock()
+            self.t1.delete()
+            refresh.assert_not_called()
+            TreeUpdate.objects.filter(tree=self.t2, height_cm=90).delete()
+            refresh.assert_called_once_with([self.t2.pk])
+
+    def test_api_returns_the_stored_rates(self):
+        self.client.force_login(get_user_model().objects.create_superuser('grower', 'g@example.com', 'pass'))
+        resp = self.client.post('/api/tree-updates/', {'tree': self.t3.pk, 'date': '2024-01-21', 'status': 'alive',
+                                                       'height_cm': 50}, content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['height_growth_per_day'], 2.0)
+
+    def test_species_curves_api(self):
+        resp = self.client.get('/api/trees/growth/', {'bucket_days': 15})
+        self.assertEqual(resp.status_code, 200)
+        curves = {c['species']: c['curve'] for c in resp.json()['species']}
+        self.assertEqual(curves['Acacia'][0], {
+            'age_days': 0, 'samples': 2, 'avg_height_cm': 45.0, 'avg_canopy_cm': 10.0, 'avg_diameter_cm': None,
+            'avg_height_growth_per_day': None, 'avg_canopy_growth_per_day': None, 'avg_diameter_growth_per_day': None,
+        })
+        self.assertEqual(curves['Acacia'][1]['avg_height_growth_per_day'], 2.0)
+        self.assertEqual(len(curves['Grevillea']), 1)
+
+        resp = self.client.get(f'/api/trees/{self.t2.pk}/growth/')
+        self.assertEqual([u['height_growth_per_day'] for u in resp.json()['updates']], [None, 2.0])
+
+    def test_fallback_matches_window(self):
+        from unittest import mock
+        from django.db import connection
+        from trees.growth import growth_deltas
+        window = list(growth_deltas())
+        with mock.patch.object(connection.features, 'supports_over_clause', False):
+            shifted = list(growth_deltas())
+        self.assertEqual(window, shifted)
+
+
+class RemindMissingUpdatesTest(TestCase):
+    def setUp(self):
+        import datetime
+        from django.utils import timezone
+        User = get_user_model()
+        self.officer = User.objects.create_user('officer', 'Officer@Example.com', 'pass')
+        other = User.objects.create_user('other', 'other@example.com', 'pass')
+        school = Beneficiary.objects.create(name='Stale School', contact_email='officer@example.com')
+        church = Beneficiary.objects.create(name='Stale Church', contact_email='officer@example.com')
+        nobody = Beneficiary.objects.create(name='No Contact')
+        today = timezone.localdate()
+        old = today - datetime.timedelta(days=90)
+        recent = today - datetime.timedelta(days=5)
+
+        def tree(tree_id, ben, last=None, status='alive'):
+            t = Tree.objects.create(tree_id=tree_id, planting_date=old, beneficiary=ben, status=status)
+            if last:
+                TreeUpdate.objects.create(tree=t, date=old, status=status)
+                TreeUpdate.objects.create(tree=t, date=last, status=status)
+            return t
+
+        tree('S-stale', school, last=today - datetime.timedelta(days=40))
+        tree('S-never', school)
+        tree('S-fresh', school, last=recent)  # has an old update too, but is current
+        tree('S-dead', school, status='dead')
+        tree('C-stale', church, last=today - datetime.timedelta(days=60))
+        tree('N-stale', nobody)
+        self.other = other
+
+    def test_one_digest_per_recipient(self):
+        from notifications.models import Notification
+        from trees.tasks import remind_missing_updates
+        with self.assertNumQueries(5):
+            result = remind_missing_updates(days_without=30)
+        self.assertEqual(result, {'count': 4, 'recipients': 1, 'notifications_created': 1, 'unassigned': 1})
+        digest = Notification.objects.get(recipient=self.officer)
+        self.assertEqual(digest.metadata['tree_count'], 3)
+        self.assertEqual(sorted(digest.metadata['trees']), ['C-stale', 'S-never', 'S-stale'])
+        self.assertFalse(Notification.objects.filter(recipient=self.other).exists())
+        # a second run on the same day does not repeat the digest
+        self.assertEqual(remind_missing_updates(days_without=30)['notifications_created'], 0)
@@ -1,13 +1,22 @@
+import datetime
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Tree, TreeUpdate, TreeSpecies
-from .serializers import TreeSerializer, TreeUpdateSerializer, TreeSpeciesSerializer, TreeBulkCreateSerializer
-from django.db.models import Count
+from .models import DuplicateCandidate, Tree, TreeUpdate, TreeSpecies, TreeCampaign, TreeImportJob, TreeStatsRollup
+from .serializers import (
+    DuplicateCandidateSerializer, TreeSerializer, TreeUpdateSerializer, TreeSpeciesSerializer, TreeCampaignSerializer,
+    TreeBulkCreateSerializer, TreeImportJobSerializer,
+)
+from .tasks import dispatch_tree_import
+from django.conf import settings
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-import csv
-import io
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.utils.cache import patch_cache_control
+from . import carbon, dedup, export, growth, importer, ingest, lineage, mapping
+from core.fieldsets import SparseFieldsetMixin
+from core.pagination import SelectablePagination
 
 
 class IsStaffOrReadOnly(permissions.BasePermission):
@@ -29,9 +38,11 @@ class IsStaffOrReadOnly(permissions.BasePermission):
         except Exception:
             return False
 
-class TreeViewSet(viewsets.ModelViewSet):
-    queryset = Tree.objects.all()
+class TreeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Tree.objects.order_by('pk')
     serializer_class = TreeSerializer
+    pagination_class = SelectablePagination
+    cursor_ordering = ('planting_date', 'id')
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     @action(detail=False, methods=['post'], url_path='bulk_create')
@@ -49,93 +60,318 @@ class TreeViewSet(viewsets.ModelViewSet):
                 return Response({'detail': 'forbidden'}, status=status.HTTP_403_FORBIDDEN)
         except Exception:
             return Response({'detail': 'forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        # support file upload with dry_run
+        # support file upload with dry_run. Rows are streamed from the upload
+        # and processed in chunks by trees.importer so large sheets never sit
+        # in memory as a whole.
         dry = request.query_params.get('dry_run') in ('1', 'true', 'True')
         file = request.FILES.get('file')
-        rows = []
-        errors = []
         if file:
-            name = getattr(file, 'name', '')
-            try:
-                if name.lower().endswith('.csv'):
-                    content = file.read().decode('utf-8')
-                    reader = csv.DictReader(io.StringIO(content))
-                    for idx, r in enumerate(reader, start=1):
-                        rows.append(r)
-                elif name.lower().endswith(('.xls', '.xlsx')):
-                    # delay importing openpyxl until actually needed so the
-                    # module is not required at import-time for the app to start.
-                    try:
-                        import openpyxl
-                    except Exception:
-                        return Response({'detail': 'openpyxl not available on server'}, status=status.HTTP_400_BAD_REQUEST)
-                    wb = openpyxl.load_workbook(file)
-                    ws = wb.active
-                    headers = [c.value for c in next(ws.iter_rows(min_row=1,max_row=1))]
-                    for row in ws.iter_rows(min_row=2):
-                        obj = {headers[i]: (row[i].value) for i in range(len(headers))}
-                        rows.append(obj)
-                else:
-                    return Response({'detail':'unsupported file type'}, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as exc:
-                return Response({'detail': 'parse error', 'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            if file.name.lower().endswith(('.xls', '.xlsx')):
+                try:
+                    import openpyxl  # noqa: F401
+                except Exception:
+                    return Response({'detail': 'openpyxl not available on server'}, status=status.HTTP_400_BAD_REQUEST)
+            elif not file.name.lower().endswith('.csv'):
+                return Response({'detail': 'unsupported file type'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not dry:
+                # uploads are imported by a background job; the client polls
+                # /api/tree-imports/<id>/ for progress and error rows
+                job = TreeImportJob(created_by=user)
+                job.file.save(file.name, file, save=False)
+                job.save()
+                dispatch_tree_import(job)
+                return Response(TreeImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+            def rows():
+                file.seek(0)
+                return importer.iter_upload_rows(file)
         else:
             # fallback to JSON body
-            rows = request.data.get('trees', [])
+            def rows():
+                return request.data.get('trees', [])
 
-        # basic validation: ensure beneficiary and planting_date
-        for idx, r in enumerate(rows, start=1):
-            if not r.get('beneficiary'):
-                errors.append({'row': idx, 'error':'missing beneficiary'})
-            if not r.get('planting_date'):
-                errors.append({'row': idx, 'error':'missing planting_date'})
+        try:
+            report = importer.validate_rows(rows())
+        except importer.UnsupportedFileType:
+            return Response({'detail': 'unsupported file type'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as exc:
+            return Response({'detail': 'parse error', 'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if errors:
-            return Response({'valid': False, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if report['errors']:
+            return Response({'valid': False, 'errors': report['errors']}, status=status.HTTP_400_BAD_REQUEST)
 
         if dry:
-            return Response({'valid': True, 'rows_parsed': len(rows), 'sample': rows[:3]})
-
-        created = []
-        for r in rows:
-            try:
-                t = Tree.objects.create(tree_id=r.get('tree_id') or None, species_id=r.get('species'), planting_date=r.get('planting_date'), beneficiary_id=r.get('beneficiary'))
-                created.append(t)
-            except Exception as exc:
-                errors.append({'row': r, 'error': str(exc)})
+            return Response({'valid': True, 'rows_parsed': report['rows_parsed'], 'sample': report['sample']})
 
-        if errors:
-            return Response({'created': len(created), 'errors': errors}, status=status.HTTP_207_MULTI_STATUS)
+        result = importer.import_rows(rows())
+        if result['errors']:
+            return Response({'created': result['created'], 'errors': result['errors']}, status=status.HTTP_207_MULTI_STATUS)
 
-        return Response({'created': len(created)}, status=status.HTTP_201_CREATED)
+        return Response({'created': result['created']}, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
-        # simple aggregations
-        total = Tree.objects.count()
-        by_species = Tree.objects.values('species__name').annotate(count=Count('id')).order_by('-count')[:10]
-        by_status = Tree.objects.values('status').annotate(count=Count('id'))
+        # aggregated from the incrementally maintained rollup (trees.stats)
+        groups = TreeStatsRollup.objects.filter(tree_count__gt=0)
+        total = groups.aggregate(total=Sum('tree_count'))['total'] or 0
+        by_species = groups.values('species__name').annotate(count=Sum('tree_count')).order_by('-count')[:10]
+        by_status = groups.values('status').annotate(count=Sum('tree_count')).order_by('status')
         return Response({'total': total, 'by_species': list(by_species), 'by_status': list(by_status)})
 
     @action(detail=False, methods=['get'], url_path='map')
     def map(self, request):
-        qs = Tree.objects.exclude(latitude__isnull=True, longitude__isnull=True)
-        data = [{'id': t.pk, 'lat': t.latitude, 'lng': t.longitude, 'species': str(t.species), 'status': t.status} for t in qs]
-        return Response({'points': data})
+        """Map data for a viewport.
+
+        Query params: ``bbox`` (west,south,east,north; default the whole
+        world), ``zoom`` (0-22, default 0) and optional ``status``,
+        ``species``, ``beneficiary`` and ``campaign`` filters. Returns grid
+        clusters with status breakdowns at low zoom and individual points
+        once zoomed in far enough (see trees.mapping).
+        """
+        params = request.query_params
+        filters = {}
+        if params.get('status'):
+            filters['status'] = params['status']
+        try:
+            bbox = mapping.parse_bbox(params.get('bbox'))
+            zoom = int(params.get('zoom', 0))
+            for param in ('species', 'beneficiary', 'campaign'):
+                if params.get(param):
+                    filters[f'{param}_id'] = int(params[param])
+        except ValueError:
+            return Response({'detail': 'invalid bbox, zoom or filter'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(mapping.map_data(bbox, zoom, filters))
+
+    @action(detail=False, methods=['get'], url_path='growth')
+    def growth(self, request):
+        """Per-species growth curves (average size and growth by tree age).
+
+        Optional filters: ``species``, ``campaign``, ``beneficiary``, ``tree``;
+        ``bucket_days`` sets the age bucket width (default 30).
+        """
+        params = request.query_params
+        qs = TreeUpdate.objects.all()
+        try:
+            for param in ('species', 'campaign', 'beneficiary', 'tree'):
+                if params.get(param):
+                    qs = qs.filter(**{f'tree__{param}_id' if param != 'tree' else 'tree_id': int(params[param])})
+            bucket_days = int(params.get('bucket_days', 30))
+            if bucket_days < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'detail': 'invalid filter or bucket_days'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'bucket_days': bucket_days, 'species': growth.species_curves(qs, bucket_days)})
+
+    @action(detail=True, methods=['get'], url_path='growth', url_name='growth-history')
+    def growth_history(self, request, pk=None):
+        """Every update of one tree with its change per day since the previous one."""
+        tree = self.get_object()
+        updates = list(growth.growth_deltas(TreeUpdate.objects.filter(tree=tree), extra_fields=('status',)))
+        return Response({'tree': tree.tree_id, 'updates': updates})
+
+    @action(detail=False, methods=['get'], url_path='carbon')
+    def carbon_totals(self, request):
+        """Estimated CO2 of the inventory with campaign/beneficiary/species/region breakdowns.
+
+        Served from the latest stored snapshot (see trees.carbon).
+        """
+        snapshot = carbon.current_snapshot()
+        if snapshot is None:
+            return Response({'detail': 'no carbon snapshot yet'}, status=status.HTTP_404_NOT_FOUND)
+        fields = ('co2_kg', 'projected_co2_kg', 'horizon_years', 'trees', 'seedlings', 'trees_without_rate',
+                  'by_campaign', 'by_beneficiary', 'by_species', 'by_region')
+        return Response({'as_of': snapshot.date, **{f: getattr(snapshot, f) for f in fields}})
+
+    @action(detail=False, methods=['get'], url_path='carbon/history')
+    def carbon_history(self, request):
+        """Daily stored totals; optional ``start``/``end`` dates (YYYY-MM-DD)."""
+        try:
+            start, end = (datetime.date.fromisoformat(request.query_params[p]) if request.query_params.get(p) else None
+                          for p in ('start', 'end'))
+        except ValueError:
+            return Response({'detail': 'invalid start or end'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'history': carbon.history(start, end)})
+
+    @action(detail=True, methods=['get'], url_path='carbon', url_name='carbon-detail')
+    def tree_carbon(self, request, pk=None):
+        """Cumulative and projected CO2 of one tree."""
+        tree = self.get_object()
+        data = carbon.estimate(Tree.objects.filter(pk=tree.pk), breakdowns=False)
+        return Response({'tree': tree.tree_id, **data})
+
+    @action(detail=False, methods=['get'], url_path='export/csv', permission_classes=[permissions.IsAuthenticated])
+    def export_csv(self, request):
+        """Stream the filtered inventory as CSV (filters: see trees.export.filter_trees)."""
+        try:
+            qs = export.filter_trees(request.query_params)
+        except ValueError:
+            return Response({'detail': 'invalid filter or date'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(export.iter_csv(qs), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{export.filename("csv")}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='export/xlsx', permission_classes=[permissions.IsAuthenticated])
+    def export_xlsx(self, request):
+        """The filtered inventory as an XLSX workbook (filters: see trees.export.filter_trees)."""
+        try:
+            qs = export.filter_trees(request.query_params)
+        except ValueError:
+            return Response({'detail': 'invalid filter or date'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            import openpyxl  # noqa: F401
+        except Exception:
+            return Response({'detail': 'openpyxl not available on server'}, status=status.HTTP_400_BAD_REQUEST)
+        return FileResponse(
+            export.write_xlsx(qs), as_attachment=True, filename=export.filename('xlsx'),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    @action(detail=True, methods=['get'], url_path='lineage', url_name='lineage')
+    def tree_lineage(self, request, pk=None):
+        """The tree's planting position: original tree, replacement chain and current tip."""
+        tree = self.get_object()
+        return Response({'tree': tree.tree_id, **lineage.lineage(tree)})
+
+    @action(detail=False, methods=['get'], url_path='effective-survival')
+    def effective_survival(self, request):
+        """Survival per planting position, counting replanted positions as surviving.
+
+        Optional filters on the original trees: ``species``, ``campaign``,
+        ``beneficiary``, ``planted_from`` and ``planted_to`` (YYYY-MM-DD).
+        """
+        params = request.query_params
+        qs = Tree.objects.all()
+        try:
+            for param in ('species', 'campaign', 'beneficiary'):
+                if params.get(param):
+                    qs = qs.filter(**{f'{param}_id': int(params[param])})
+            if params.get('planted_from'):
+                qs = qs.filter(planting_date__gte=datetime.date.fromisoformat(params['planted_from']))
+            if params.get('planted_to'):
+                qs = qs.filter(planting_date__lte=datetime.date.fromisoformat(params['planted_to']))
+        except ValueError:
+            return Response({'detail': 'invalid filter or date'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(lineage.effective_survival(qs))
+
 
 class TreeUpdateViewSet(viewsets.ModelViewSet):
-    queryset = TreeUpdate.objects.all()
+    queryset = TreeUpdate.objects.prefetch_related('media')
     serializer_class = TreeUpdateSerializer
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-date', '-id')
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._read_rates(serializer.instance)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._read_rates(serializer.instance)
+
+    @staticmethod
+    def _read_rates(update):
+        # the post_save receiver stores the rates without touching the instance
+        update.refresh_from_db(fields=list(growth.RATE_FIELDS))
+
     @action(detail=False, methods=['post'], url_path='add')
     def add_update(self, request):
         ser = TreeUpdateSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
         obj = ser.save()
+        self._read_rates(obj)
         return Response(TreeUpdateSerializer(obj).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='batch', permission_classes=[permissions.IsAuthenticated])
+    def batch(self, request):
+        """Store many updates at once, e.g. a device's offline measurements.
+
+        Body: ``{"updates": [{"client_key", "tree_id", "status", "date"?,
+        "height_cm"?, "canopy_cm"?, "diameter_cm"?, "notes"?, "media"?: [ids]}]}``.
+        Every item needs a unique ``client_key`` so the batch can be retried
+        safely; see trees.ingest for the per-item results.
+        """
+        items = request.data.get('updates') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'updates must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > ingest.MAX_BATCH_SIZE:
+            return Response({'detail': f'at most {ingest.MAX_BATCH_SIZE} updates per batch'}, status=status.HTTP_400_BAD_REQUEST)
+        results = ingest.ingest_updates(items)
+        counts = {name: sum(1 for r in results if r['status'] == name) for name in ('created', 'duplicate', 'error')}
+        return Response(
+            {'created': counts['created'], 'duplicates': counts['duplicate'], 'errors': counts['error'], 'results': results},
+            status=status.HTTP_207_MULTI_STATUS if counts['error'] else status.HTTP_200_OK,
+        )
+
 class TreeSpeciesViewSet(viewsets.ModelViewSet):
     queryset = TreeSpecies.objects.all()
     serializer_class = TreeSpeciesSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+
+class TreeCampaignViewSet(viewsets.ReadOnlyModelViewSet):
+    """Public campaign progress for the landing page.
+
+    Counters are denormalized on the campaign (trees.campaigns), so each
+    response is a plain read of the campaign rows; responses may be cached
+    by browsers and proxies for ``CAMPAIGN_PROGRESS_MAX_AGE`` seconds.
+    """
+    queryset = TreeCampaign.objects.order_by('-start_date', '-id')
+    serializer_class = TreeCampaignSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 200:
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'CAMPAIGN_PROGRESS_MAX_AGE', 60))
+        return response
+
+
+class DuplicateCandidateViewSet(viewsets.ReadOnlyModelViewSet):
+    """Review queue of likely duplicate trees (trees.dedup).
+
+    Lists pending pairs by default (``?status=dismissed`` for the others).
+    Tree managers resolve a pair with ``merge`` or ``dismiss``.
+    """
+    queryset = DuplicateCandidate.objects.select_related('tree', 'duplicate_of', 'reviewed_by')
+    serializer_class = DuplicateCandidateSerializer
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            qs = qs.filter(status=self.request.query_params.get('status') or 'pending')
+        return qs
+
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Fold the newer tree into the one it duplicates and delete it."""
+        candidate = self.get_object()
+        if candidate.status != 'pending':
+            return Response({'detail': f'candidate is {candidate.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dedup.merge(candidate, request.user))
+
+    @action(detail=True, methods=['post'])
+    def dismiss(self, request, pk=None):
+        """Mark the pair as two distinct trees; it won't be queued again."""
+        candidate = self.get_object()
+        dedup.dismiss(candidate, request.user)
+        return Response(self.get_serializer(candidate).data)
+
+
+class TreeImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress and error rows of background tree imports."""
+    queryset = TreeImportJob.objects.select_related('created_by').all()
+    serializer_class = TreeImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        user = self.request.user
+        try:
+            if user.has_perm('trees.manage_trees') or 'Admins' in set(user.groups.values_list('name', flat=True)):
+                return qs
+        except Exception:
+            pass
+        return qs.filter(created_by=user)